@@ -0,0 +1,114 @@
+"""
+api/authentication.py - JWT authentication with an in-process user cache
+revoked through the shared cache
+"""
+
+import copy
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Hashable, Optional
+
+from django.conf import settings
+from django.core.cache import cache
+from rest_framework_simplejwt.authentication import JWTAuthentication
+from rest_framework_simplejwt.settings import api_settings
+
+
+class UserCache:
+    """
+    Small thread-safe TTL + LRU cache of user objects.
+
+    Keys are ``(user_id, token_version, generation)`` tuples so a password
+    change (which changes the version claim of newly issued tokens) never
+    serves a user cached for an older token, and a revoked generation is
+    never served again.
+    """
+
+    def __init__(self, ttl: float, max_size: int) -> None:
+        self.ttl = ttl
+        self.max_size = max_size
+        self._lock = threading.Lock()
+        self._entries: "OrderedDict[Hashable, tuple]" = OrderedDict()
+
+    def get(self, key: Hashable) -> Optional[Any]:
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return None
+            expires_at, value = entry
+            if expires_at < time.monotonic():
+                del self._entries[key]
+                return None
+            self._entries.move_to_end(key)
+            return value
+
+    def set(self, key: Hashable, value: Any) -> None:
+        with self._lock:
+            self._entries[key] = (time.monotonic() + self.ttl, value)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_size:
+                self._entries.popitem(last=False)
+
+    def invalidate_user(self, user_id: Any) -> None:
+        """Drop every cached entry for the user, whatever its token version"""
+        user_id = str(user_id)
+        with self._lock:
+            for key in [key for key in self._entries if key[0] == user_id]:
+                del self._entries[key]
+
+    def clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
+
+
+user_cache = UserCache(
+    ttl=getattr(settings, "JWT_USER_CACHE_TTL", 60),
+    max_size=getattr(settings, "JWT_USER_CACHE_SIZE", 1024),
+)
+
+
+def _generation_key(user_id: Any) -> str:
+    return f"jwt-user-generation:{user_id}"
+
+
+def revoke_cached_user(user_id: Any) -> None:
+    """Make every worker drop its cached copy of the user"""
+    key = _generation_key(user_id)
+    # Generations never expire: falling back to 0 could revive an entry
+    # some worker cached before the first revocation
+    if not cache.add(key, 1, timeout=None):
+        cache.incr(key)
+    user_cache.invalidate_user(user_id)
+
+
+class CachedJWTAuthentication(JWTAuthentication):
+    """
+    JWTAuthentication that skips the per-request ``User`` query.
+
+    Token signatures and expiry are still verified on every request; only the
+    user lookup is cached. A miss falls back to the stock lookup, which also
+    enforces the is_active and password-version (CHECK_REVOKE_TOKEN) checks
+    before anything is cached.
+
+    Saving or deleting a user bumps its generation in the shared cache (see
+    api/signals.py). Each request reads the generation, one cache round trip
+    instead of a ``User`` query, so every worker stops serving the old entry
+    at once.
+    """
+
+    def get_user(self, validated_token):
+        user_id = validated_token.get(api_settings.USER_ID_CLAIM)
+        version = validated_token.get(api_settings.REVOKE_TOKEN_CLAIM)
+        if user_id is None or version is None:
+            return super().get_user(validated_token)
+
+        generation = cache.get(_generation_key(user_id), 0)
+        key = (str(user_id), version, generation)
+        user = user_cache.get(key)
+        if user is None:
+            user = super().get_user(validated_token)
+            user_cache.set(key, user)
+        # Each request gets its own instance so per-request attribute caching
+        # on request.user can't leak between concurrent requests.
+        return copy.copy(user)
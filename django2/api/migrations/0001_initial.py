@@ -0,0 +1,50 @@
+# Generated by Django 6.0 on 2026-10-19 09:02
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    initial = True
+
+    dependencies = []
+
+    operations = [
+        migrations.CreateModel(
+            name="ThrottleCounter",
+            fields=[
+                (
+                    "key",
+                    models.CharField(max_length=200, primary_key=True, serialize=False),
+                ),
+                ("count", models.PositiveIntegerField(default=0)),
+                ("expires_at", models.DateTimeField(db_index=True)),
+            ],
+        ),
+        migrations.CreateModel(
+            name="AdmissionSlot",
+            fields=[
+                (
+                    "id",
+                    models.BigAutoField(
+                        auto_created=True,
+                        primary_key=True,
+                        serialize=False,
+                        verbose_name="ID",
+                    ),
+                ),
+                ("operation", models.CharField(max_length=32)),
+                ("slot", models.PositiveSmallIntegerField()),
+                ("holder", models.CharField(blank=True, max_length=32)),
+                ("expires_at", models.DateTimeField(blank=True, null=True)),
+            ],
+            options={
+                "ordering": ("operation", "slot"),
+                "constraints": [
+                    models.UniqueConstraint(
+                        fields=("operation", "slot"), name="unique_admission_slot"
+                    )
+                ],
+            },
+        ),
+    ]
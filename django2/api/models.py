@@ -0,0 +1,40 @@
+from django.db import models
+
+
+class ThrottleCounter(models.Model):
+    """
+    Requests counted against one rate limit in one fixed window (see
+    api.throttling). ``key`` names the budget, the client (or "all" for
+    the global limit) and the window; rows are deleted once it has passed.
+    """
+
+    key = models.CharField(max_length=200, primary_key=True)
+    count = models.PositiveIntegerField(default=0)
+    expires_at = models.DateTimeField(db_index=True)
+
+    def __str__(self) -> str:
+        return f"{self.key}: {self.count}"
+
+
+class AdmissionSlot(models.Model):
+    """
+    One of the slots an expensive operation (a backup, a restore, a heavy
+    search) needs to run. A slot is taken while ``expires_at`` is in the
+    future; the lease frees it should its holder die without releasing it.
+    """
+
+    operation = models.CharField(max_length=32)
+    slot = models.PositiveSmallIntegerField()
+    holder = models.CharField(max_length=32, blank=True)
+    expires_at = models.DateTimeField(null=True, blank=True)
+
+    class Meta:
+        ordering = ("operation", "slot")
+        constraints = [
+            models.UniqueConstraint(
+                fields=("operation", "slot"), name="unique_admission_slot"
+            )
+        ]
+
+    def __str__(self) -> str:
+        return f"{self.operation} #{self.slot}"
@@ -0,0 +1,66 @@
+"""
+api/renderers.py - orjson and MessagePack renderers
+
+Both produce the same values as DRF's JSONRenderer: serializers already
+turn amounts into strings, datetimes and other types go through DRF's own
+encoder, and any raw Decimal that reaches the renderer is written as a
+string too, so amounts never lose precision as floats.
+"""
+
+import decimal
+
+import msgpack
+import orjson
+from rest_framework.renderers import BaseRenderer, JSONRenderer
+from rest_framework.utils.encoders import JSONEncoder
+
+
+class DecimalStringEncoder(JSONEncoder):
+    def default(self, obj):
+        if isinstance(obj, decimal.Decimal):
+            return str(obj)
+        return super().default(obj)
+
+
+_default = DecimalStringEncoder().default
+
+
+class FastJSONRenderer(JSONRenderer):
+    """
+    JSONRenderer on orjson. Output is byte-for-byte what JSONRenderer gives
+    for compact UTF-8 JSON; indented output (`Accept: application/json;
+    indent=4`, the browsable API) is left to JSONRenderer.
+    """
+
+    encoder_class = DecimalStringEncoder
+    # Non-string keys are written as strings, like json.dumps does: DRF's
+    # ListField and DictField errors are keyed by int index
+    options = orjson.OPT_PASSTHROUGH_DATETIME | orjson.OPT_NON_STR_KEYS
+
+    def render(self, data, accepted_media_type=None, renderer_context=None):
+        if data is None:
+            return b""
+        indent = self.get_indent(accepted_media_type, renderer_context or {})
+        if indent is not None or self.ensure_ascii or not self.compact:
+            return super().render(data, accepted_media_type, renderer_context)
+
+        # Same U+2028/U+2029 escaping as JSONRenderer
+        return (
+            orjson.dumps(data, default=_default, option=self.options)
+            .replace(b"\xe2\x80\xa8", b"\\u2028")
+            .replace(b"\xe2\x80\xa9", b"\\u2029")
+        )
+
+
+class MessagePackRenderer(BaseRenderer):
+    """Selected with `Accept: application/msgpack` or `?format=msgpack`"""
+
+    media_type = "application/msgpack"
+    format = "msgpack"
+    charset = None
+    render_style = "binary"
+
+    def render(self, data, accepted_media_type=None, renderer_context=None):
+        if data is None:
+            return b""
+        return msgpack.packb(data, default=_default, use_bin_type=True)
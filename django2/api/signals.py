@@ -0,0 +1,19 @@
+"""
+api/signals.py - Keep the JWT user cache in step with user changes
+"""
+
+from django.conf import settings
+from django.db import transaction
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+
+from .authentication import revoke_cached_user
+
+
+@receiver(post_save, sender=settings.AUTH_USER_MODEL)
+@receiver(post_delete, sender=settings.AUTH_USER_MODEL)
+def invalidate_cached_user(sender, instance, **kwargs):
+    """Deactivation, password changes, permission edits: never serve stale"""
+    # After commit, otherwise a concurrent request could re-cache the old row
+    user_id = instance.pk
+    transaction.on_commit(lambda: revoke_cached_user(user_id))
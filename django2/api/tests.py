@@ -0,0 +1,92 @@
+from types import SimpleNamespace
+from unittest import mock
+
+from django.contrib.auth.models import AnonymousUser, User
+from django.core.cache import cache
+from django.test import RequestFactory, TestCase, override_settings
+
+from . import throttling
+from .models import AdmissionSlot, ThrottleCounter
+from .throttling import HEAVY, BudgetThrottle, Busy
+
+RATES = {
+    "cheap": "3/min",
+    "cheap_global": "5/min",
+    "heavy": "2/min",
+    "heavy_global": "none",
+}
+
+
+@mock.patch.object(BudgetThrottle, "THROTTLE_RATES", RATES)
+class BudgetThrottleTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.factory = RequestFactory()
+        self.view = SimpleNamespace()
+
+    def allow(self, ip="10.0.0.1", user=None, view=None):
+        request = self.factory.get("/", REMOTE_ADDR=ip)
+        request.user = user or AnonymousUser()
+        throttle = BudgetThrottle()
+        allowed = throttle.allow_request(request, view or self.view)
+        return allowed, throttle.wait()
+
+    def test_cheap_rate_per_client_in_the_cache(self):
+        for _ in range(3):
+            self.assertEqual(self.allow(), (True, None))
+        allowed, wait = self.allow()
+        self.assertFalse(allowed)
+        self.assertTrue(0 < wait <= 60)
+        # Another client has its own budget
+        self.assertTrue(self.allow(ip="10.0.0.2")[0])
+        self.assertFalse(ThrottleCounter.objects.exists())
+
+    def test_users_are_counted_apart_from_their_ip(self):
+        user = User.objects.create_user("cook")
+        for _ in range(3):
+            self.assertTrue(self.allow(user=user)[0])
+        self.assertFalse(self.allow(user=user)[0])
+        self.assertTrue(self.allow()[0])
+
+    def test_global_rate_spans_clients(self):
+        for number in range(5):
+            self.assertTrue(self.allow(ip=f"10.0.1.{number}")[0])
+        self.assertFalse(self.allow(ip="10.0.1.9")[0])
+
+    def test_client_over_its_rate_doesnt_use_the_global_one(self):
+        for _ in range(10):
+            self.allow()
+        # 3 counted globally, so 2 more clients still fit
+        self.assertTrue(self.allow(ip="10.0.2.1")[0])
+        self.assertTrue(self.allow(ip="10.0.2.2")[0])
+        self.assertFalse(self.allow(ip="10.0.2.3")[0])
+
+    def test_heavy_budget_is_counted_in_the_database(self):
+        view = SimpleNamespace(throttle_budget=lambda request: HEAVY)
+        self.assertTrue(self.allow(view=view)[0])
+        self.assertTrue(self.allow(view=view)[0])
+        self.assertFalse(self.allow(view=view)[0])
+        self.assertEqual(ThrottleCounter.objects.get().count, 3)
+        # The cheap budget is untouched
+        self.assertTrue(self.allow()[0])
+
+
+@override_settings(ADMISSION_SLOTS={"backup": 1})
+class AdmissionSlotTests(TestCase):
+    def setUp(self):
+        throttling._slots_created.clear()
+
+    def test_slot_is_exclusive_until_released(self):
+        release = throttling.acquire("backup")
+        with self.assertRaises(Busy):
+            throttling.acquire("backup")
+        release()
+        throttling.acquire("backup")()
+        self.assertFalse(
+            AdmissionSlot.objects.filter(expires_at__isnull=False).exists()
+        )
+
+    def test_unlimited_operations_take_no_slot(self):
+        throttling.acquire("restore")()
+        throttling.acquire("restore")()
+        self.assertFalse(AdmissionSlot.objects.exists())
@@ -0,0 +1,206 @@
+"""
+api/throttling.py - admission control for the API
+
+Two budgets: "cheap" for ordinary requests and "heavy" for the expensive
+ones (backups, restores, imports, multi-ingredient searches, exports),
+which a view picks per request through its ``throttle_budget(request)``
+method; my_recipes.async_views, which aren't DRF views, apply the same
+checks in their jwt_required decorator. Each
+budget has a per-client and a global request rate (DEFAULT_THROTTLE_RATES
+scopes "cheap", "cheap_global", "heavy", "heavy_global"), counted in fixed
+windows that every worker process and host shares. The cheap budget, hit
+by nearly every request, is counted with cache.incr() in the shared cache
+(settings.CACHES), keeping the primary database out of the request path;
+the rare heavy requests are counted in ThrottleCounter rows, which a cache
+restart can't reset. A request over either rate gets 429 with Retry-After
+set to the end of the window.
+
+On top of the rates, slot() (or acquire() for a slot held past the view,
+as streamed responses do) caps how many of an operation run at once,
+whoever started them: at most ADMISSION_SLOTS[operation], each holding an
+AdmissionSlot row for the duration. When all are taken the request gets
+503 with Retry-After ADMISSION_RETRY_AFTER.
+
+Counters and slots are written on the primary with an explicit alias, so
+they don't pin the request's reads there (recipes.db.router).
+"""
+
+import math
+import random
+import time
+import uuid
+from contextlib import contextmanager
+from datetime import datetime, timedelta, timezone as dt_timezone
+from typing import Callable, Iterator, Set
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import connections
+from django.db.models import Q
+from django.utils import timezone
+from rest_framework.exceptions import Throttled
+from rest_framework.throttling import SimpleRateThrottle
+
+from recipes.db.router import PRIMARY
+
+from .models import AdmissionSlot, ThrottleCounter
+
+CHEAP, HEAVY = "cheap", "heavy"
+
+# Seconds between deletions of counters whose window has passed
+CLEANUP_INTERVAL = 60
+
+_last_cleanup = 0.0
+_slots_created: Set[tuple] = set()
+
+
+class Busy(Throttled):
+    status_code = 503
+    default_detail = "Too many of these requests are running."
+    default_code = "busy"
+
+
+def _hit(key: str, expires_at: datetime) -> int:
+    """Count one request against ``key``; returns the count so far"""
+    connection = connections[PRIMARY]
+    quote = connection.ops.quote_name
+    table = quote(ThrottleCounter._meta.db_table)
+    # One statement, so concurrent requests never lose an increment
+    with connection.cursor() as cursor:
+        cursor.execute(
+            f"INSERT INTO {table} ({quote('key')}, {quote('count')}, "
+            f"{quote('expires_at')}) VALUES (%s, 1, %s) "
+            f"ON CONFLICT ({quote('key')}) DO UPDATE "
+            f"SET {quote('count')} = {table}.{quote('count')} + 1 "
+            f"RETURNING {quote('count')}",
+            [key, connection.ops.adapt_datetimefield_value(expires_at)],
+        )
+        return cursor.fetchone()[0]
+
+
+def _cache_hit(key: str, timeout: int) -> int:
+    """_hit for the cheap budget, counted in the shared cache"""
+    key = f"throttle:{key}"
+    # add() starts the window's counter; incr() is atomic on Redis
+    if cache.add(key, 1, timeout):
+        return 1
+    try:
+        return cache.incr(key)
+    except ValueError:
+        # Expired between add() and incr()
+        cache.add(key, 1, timeout)
+        return 1
+
+
+def _cleanup(now: float) -> None:
+    global _last_cleanup
+    if now - _last_cleanup < CLEANUP_INTERVAL:
+        return
+    _last_cleanup = now
+    ThrottleCounter.objects.using(PRIMARY).filter(
+        expires_at__lt=timezone.now()
+    ).delete()
+
+
+class BudgetThrottle(SimpleRateThrottle):
+    """
+    Per-client, then global, fixed-window rate of the view's budget.
+    Clients are users, or IP addresses for anonymous requests. A request
+    turned away by its client's rate doesn't count against the global one,
+    so one client flooding the API can't use up everyone's budget.
+    """
+
+    def __init__(self):
+        # Rates are looked up per request, by budget
+        self.retry_after = None
+
+    def allow_request(self, request, view) -> bool:
+        get_budget = getattr(view, "throttle_budget", None)
+        budget = get_budget(request) if get_budget else CHEAP
+        user = getattr(request, "user", None)
+        if user is not None and user.is_authenticated:
+            client = f"user{user.pk}"
+        else:
+            client = f"ip{self.get_ident(request)}"
+
+        now = time.time()
+        if budget == HEAVY:
+            _cleanup(now)
+        for scope, ident in ((budget, client), (f"{budget}_global", "all")):
+            rate = self.THROTTLE_RATES.get(scope)
+            if not rate or rate.lower() == "none":
+                continue
+            num_requests, duration = self.parse_rate(rate)
+            window = int(now // duration)
+            ends = (window + 1) * duration
+            key = f"{scope}:{ident}:{window}"
+            if budget == HEAVY:
+                count = _hit(
+                    key, datetime.fromtimestamp(ends, tz=dt_timezone.utc)
+                )
+            else:
+                count = _cache_hit(key, math.ceil(ends - now) + 1)
+            if count > num_requests:
+                self.retry_after = ends - now
+                return False
+        return True
+
+    def wait(self):
+        return self.retry_after
+
+
+def _ensure_slots(operation: str, limit: int) -> None:
+    if (operation, limit) in _slots_created:
+        return
+    AdmissionSlot.objects.using(PRIMARY).bulk_create(
+        [
+            AdmissionSlot(operation=operation, slot=number)
+            for number in range(limit)
+        ],
+        ignore_conflicts=True,
+    )
+    _slots_created.add((operation, limit))
+
+
+def acquire(operation: str) -> Callable[[], None]:
+    """
+    Take one of ``operation``'s ADMISSION_SLOTS, or raise Busy if they are
+    all taken. Returns the function that gives it back; for a slot held
+    past the request (a streamed response), the lease still frees it if
+    that never runs. A limit of 0 means unlimited.
+    """
+    limit = settings.ADMISSION_SLOTS.get(operation, 0)
+    if not limit:
+        return lambda: None
+    _ensure_slots(operation, limit)
+    slots = AdmissionSlot.objects.using(PRIMARY).filter(operation=operation)
+    holder = uuid.uuid4().hex
+    now = timezone.now()
+    free = Q(expires_at__isnull=True) | Q(expires_at__lt=now)
+    lease = now + timedelta(seconds=settings.ADMISSION_LEASE_SECONDS)
+    # Random order, so concurrent requests rarely race for the same row
+    for number in random.sample(range(limit), limit):
+        # Conditional UPDATE: only one request can take a free slot
+        if slots.filter(free, slot=number).update(
+            holder=holder, expires_at=lease
+        ):
+            break
+    else:
+        raise Busy(wait=settings.ADMISSION_RETRY_AFTER)
+
+    def release() -> None:
+        slots.filter(slot=number, holder=holder).update(
+            holder="", expires_at=None
+        )
+
+    return release
+
+
+@contextmanager
+def slot(operation: str) -> Iterator[None]:
+    """Hold one of ``operation``'s ADMISSION_SLOTS while the block runs"""
+    release = acquire(operation)
+    try:
+        yield
+    finally:
+        release()
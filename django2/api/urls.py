@@ -1,8 +1,10 @@
 from django.urls import include, path
-from my_recipes import api_views
+from my_recipes import api_views, async_views
 from rest_framework import routers
 from rest_framework_simplejwt.views import TokenObtainPairView, TokenRefreshView
 
+from . import views
+
 router = routers.DefaultRouter()
 
 router.register(r"recipes", api_views.RecipeViewSet)
@@ -12,4 +14,36 @@ urlpatterns = [
     path("", include(router.urls)),
     path("token/", TokenObtainPairView.as_view(), name="token_obtain_pair"),
     path("token/refresh/", TokenRefreshView.as_view(), name="token_refresh"),
+    path("db-stats/", views.db_stats, name="db_stats"),
+    # Async read-only endpoints (non-blocking when served over ASGI)
+    path(
+        "async/recipes/",
+        async_views.recipe_list,
+        name="async_recipe_list",
+    ),
+    path(
+        "async/recipes/export/",
+        async_views.recipe_export,
+        name="async_recipe_export",
+    ),
+    path(
+        "async/recipes/events/",
+        async_views.recipe_events,
+        name="async_recipe_events",
+    ),
+    path(
+        "async/recipes/events/ticket/",
+        async_views.recipe_events_ticket,
+        name="async_recipe_events_ticket",
+    ),
+    path(
+        "async/recipes/<int:pk>/",
+        async_views.recipe_detail,
+        name="async_recipe_detail",
+    ),
+    path(
+        "async/ingredients/",
+        async_views.ingredient_list,
+        name="async_ingredient_list",
+    ),
 ]
@@ -1,3 +1,31 @@
-from django.shortcuts import render
+from django.db import connections
+from rest_framework.decorators import api_view, permission_classes
+from rest_framework.permissions import IsAdminUser
+from rest_framework.request import Request
+from rest_framework.response import Response
 
-# Create your views here.
+from my_recipes.filter_cache import filter_cache
+from recipes.db.postgresql.base import connection_wait_stats
+
+
+@api_view(["GET"])
+@permission_classes([IsAdminUser])
+def db_stats(request: Request):
+    """
+    Connection acquisition timings and psycopg pool statistics for the worker
+    process that serves this request (each gunicorn worker has its own pool),
+    and the hit rate of its recipe filter cache.
+    """
+    pools = {}
+    for alias in connections:
+        pool = getattr(connections[alias], "pool", None)
+        if pool is not None:
+            pools[alias] = pool.get_stats()
+
+    return Response(
+        {
+            "connection_waits": connection_wait_stats.snapshot(),
+            "pools": pools,
+            "filter_cache": filter_cache.stats(),
+        }
+    )
@@ -0,0 +1,92 @@
+"""
+Gunicorn configuration for the production serving profile.
+
+Loaded by wait_for_db.sh when DJANGO_SERVER_MODE=prod. Every value can be
+overridden through the environment so the same image can be tuned per host
+without a rebuild.
+
+For more information on these settings, see
+https://docs.gunicorn.org/en/stable/settings.html
+"""
+
+import os
+
+
+def _available_cpus() -> int:
+    """CPUs this container may actually run on (respects cpusets/affinity)."""
+    try:
+        return len(os.sched_getaffinity(0))
+    except AttributeError:
+        return os.cpu_count() or 1
+
+
+# "wsgi" serves recipes.wsgi with threaded workers, "asgi" serves recipes.asgi
+# through uvicorn workers (needed for async views and streaming responses).
+SERVER_INTERFACE = os.getenv("DJANGO_SERVER_INTERFACE", "wsgi")
+
+bind = os.getenv("GUNICORN_BIND", "0.0.0.0:8000")
+
+if SERVER_INTERFACE == "asgi":
+    wsgi_app = "recipes.asgi:application"
+    worker_class = "uvicorn_worker.UvicornWorker"
+else:
+    wsgi_app = "recipes.wsgi:application"
+    # gthread (unlike the plain sync worker) honours keepalive, which lets
+    # nginx reuse upstream connections instead of reconnecting per request.
+    worker_class = "gthread"
+    threads = int(os.getenv("GUNICORN_THREADS", 4))
+
+# Classic (2 x cores) + 1 sizing: enough processes to keep every core busy
+# while some workers are blocked on Postgres.
+workers = int(os.getenv("GUNICORN_WORKERS", _available_cpus() * 2 + 1))
+
+# Import Django once in the master and fork workers from it, so the loaded
+# code and settings are shared copy-on-write instead of duplicated per worker.
+preload_app = os.getenv("GUNICORN_PRELOAD", "true").lower() == "true"
+
+# Recycle workers after a bounded number of requests so slow leaks (large
+# restore payloads, OCR buffers) can't accumulate. Jitter keeps all workers
+# from restarting at the same moment.
+max_requests = int(os.getenv("GUNICORN_MAX_REQUESTS", 1000))
+max_requests_jitter = int(os.getenv("GUNICORN_MAX_REQUESTS_JITTER", 100))
+
+# Backups and restores can legitimately take a while; in-flight requests get
+# graceful_timeout to finish when a worker is recycled or the pod is stopped.
+timeout = int(os.getenv("GUNICORN_TIMEOUT", 60))
+graceful_timeout = int(os.getenv("GUNICORN_GRACEFUL_TIMEOUT", 30))
+
+# Must stay above the upstream keepalive_timeout in gateway/nginx.conf (60s)
+# so nginx, not gunicorn, closes idle connections and never reuses a socket
+# the backend has just dropped.
+keepalive = int(os.getenv("GUNICORN_KEEPALIVE", 75))
+
+# Heartbeat files on tmpfs; the container's overlay filesystem can stall
+# workers long enough to trip the timeout.
+worker_tmp_dir = "/dev/shm" if os.path.isdir("/dev/shm") else None
+
+# nginx is the only client, trust its X-Forwarded-* headers.
+forwarded_allow_ips = "*"
+
+accesslog = "-"
+errorlog = "-"
+loglevel = os.getenv("GUNICORN_LOG_LEVEL", "info")
+
+
+def when_ready(server):
+    """Master, before forking: import URLconf/views once, shared by workers."""
+    if preload_app:
+        from recipes.health import warm_up_imports
+
+        warm_up_imports()
+
+
+def post_worker_init(worker):
+    """Each worker opens its database connections before taking traffic."""
+    from recipes.health import warm_up_database, warm_up_imports
+
+    warm_up_imports()
+    try:
+        warm_up_database()
+    except Exception as e:
+        # /healthz/ keeps reporting unavailable until the database answers
+        worker.log.warning(f"Database warm-up failed: {e}")
@@ -1,5 +1,6 @@
-from django.contrib import admin
+from django.contrib import admin, messages
 
+from . import dedupe
 from .models import Ingredient, Recipe, RecipeIngredient, Step, StepIngredient
 
 
@@ -30,7 +31,47 @@ class RecipeAdmin(admin.ModelAdmin):
 
 @admin.register(Ingredient)
 class IngredientAdmin(admin.ModelAdmin):
-    pass
+    search_fields = ["name"]
+    actions = ["merge_near_duplicates", "merge_into_most_used"]
+
+    def _merge(self, request, groups, names):
+        if not groups:
+            self.message_user(request, "No duplicates to merge")
+            return
+        repointed, deleted = dedupe.merge(groups)
+        merged = "; ".join(
+            f"{', '.join(names[i] for i in group.duplicates)} -> "
+            f"{names[group.canonical]}"
+            for group in groups
+        )
+        self.message_user(
+            request,
+            f"Merged {deleted} ingredients ({merged}), repointed "
+            f"{repointed} recipe ingredients",
+            messages.SUCCESS,
+        )
+
+    @admin.action(description="Merge near-duplicate names among selected")
+    def merge_near_duplicates(self, request, queryset):
+        names, usage = dedupe.load_vocabulary(
+            queryset.values_list("id", flat=True)
+        )
+        self._merge(
+            request,
+            dedupe.find_groups(names, usage, dedupe.DEFAULT_THRESHOLD),
+            names,
+        )
+
+    @admin.action(description="Merge selected into the most used one")
+    def merge_into_most_used(self, request, queryset):
+        names, usage = dedupe.load_vocabulary(
+            queryset.values_list("id", flat=True)
+        )
+        ids = sorted(
+            names, key=lambda i: (-usage.get(i, 0), len(names[i]), names[i], i)
+        )
+        groups = [dedupe.MergeGroup(ids[0], ids[1:])] if len(ids) > 1 else []
+        self._merge(request, groups, names)
 
 
 @admin.register(Step)
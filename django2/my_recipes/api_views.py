@@ -1,8 +1,12 @@
+from collections import defaultdict
+from contextlib import nullcontext
+from decimal import Decimal
 from logging import getLogger
 from pathlib import Path
+from typing import List
 
 from django.conf import settings
-from django.http import FileResponse
+from django.http import FileResponse, StreamingHttpResponse
 from django_filters import rest_framework as filters
 from rest_framework import status, viewsets
 from rest_framework.decorators import action
@@ -10,13 +14,31 @@ from rest_framework.permissions import IsAuthenticated
 from rest_framework.request import Request
 from rest_framework.response import Response
 
+from api import throttling
+from my_recipes import (
+    duplicates,
+    facets,
+    ingredient_parser,
+    shopping,
+    sync,
+    units,
+)
 from my_recipes.backup import RecipeBackup
+from my_recipes.backup_store import BackupStore
+from my_recipes.bulk_import import RecipeBulkImport
+from my_recipes.filter_cache import cache_key, filter_cache
+from my_recipes.ocr_import import OCRImport
 
-from .models import Ingredient, Recipe
+from .models import Ingredient, Recipe, RecipeChange
 from .serializers import (
+    IngredientParseSerializer,
     IngredientSerializer,
+    RecipeBatchSerializer,
     RecipeManageSerializer,
+    RecipeScaleSerializer,
+    ShoppingListSerializer,
     RecipeSerializer,
+    field_selection,
 )
 
 logger = getLogger(__name__)
@@ -54,6 +76,40 @@ class RecipeViewSet(viewsets.ModelViewSet):
     ordering_fields = ["created_at", "modified_at", "name"]
     serializer_class = RecipeSerializer
     permission_classes = [IsAuthenticated]
+    # Counted against the heavy request budget (api.throttling)
+    heavy_actions = (
+        "backup_recipes",
+        "restore_recipes",
+        "download_backup",
+        "bulk_import",
+        "ocr_import",
+    )
+
+    def throttle_budget(self, request: Request) -> str:
+        if self.action in self.heavy_actions or (
+            self.action == "list" and self.heavy_search(request)
+        ):
+            return throttling.HEAVY
+        return throttling.CHEAP
+
+    def heavy_search(self, request: Request) -> bool:
+        """Many ingredients ANDed together, or facets over the whole set"""
+        params = request.query_params
+        return (
+            len(set(params.getlist("ingredients")))
+            >= settings.HEAVY_SEARCH_MIN_INGREDIENTS
+            or params.get("facets") == "ingredients"
+        )
+
+    def get_queryset(self):
+        queryset = super().get_queryset()
+        # Only for reads: updates re-serialize the instance after saving, and
+        # relations prefetched before the save would be stale.
+        if self.action in ("list", "retrieve", "batch", "changes", "scale"):
+            queryset = RecipeSerializer.setup_eager_loading(
+                queryset, *field_selection(self.request)
+            )
+        return queryset
 
     def get_serializer_class(self):
         """
@@ -67,6 +123,58 @@ class RecipeViewSet(viewsets.ModelViewSet):
             return RecipeManageSerializer
         return RecipeSerializer
 
+    def list(self, request, *args, **kwargs):
+        """
+        The paginated list; with `?facets=ingredients` it also includes
+        `facets.ingredients`, the number of recipes in the whole filtered
+        set (not just this page) that use each ingredient.
+
+        The ordered ids of the filtered set come from my_recipes.filter_cache
+        when the same filters ran since the library last changed, so a
+        repeated search skips the ingredient joins and the COUNT and only
+        loads the recipes of the page.
+
+        Heavy searches (see heavy_search) that can't be answered from the
+        cache wait for one of the "search" admission slots.
+        """
+        recipe_ids = self.filtered_ids(request)
+        page = self.paginate_queryset(recipe_ids)
+        shown = recipe_ids if page is None else page
+        recipes = self.get_queryset().in_bulk(shown)
+        # A recipe deleted since its id was cached is left out
+        serializer = self.get_serializer(
+            [recipes[pk] for pk in shown if pk in recipes], many=True
+        )
+        if page is None:
+            response = Response(serializer.data)
+        else:
+            response = self.get_paginated_response(serializer.data)
+        if request.query_params.get("facets") == "ingredients":
+            recipes = self.filter_queryset(self.get_queryset())
+            with throttling.slot("search"):
+                counts = facets.ingredient_counts(recipes)
+            response.data["facets"] = {"ingredients": counts}
+        return response
+
+    def filtered_ids(self, request: Request) -> List[int]:
+        """Ids of every recipe matching the list filters, in list order"""
+        key = cache_key(request.query_params)
+        if key is not None:
+            version = sync.latest_seq()
+            recipe_ids = filter_cache.get(key, version)
+            if recipe_ids is not None:
+                return recipe_ids
+        queryset = self.filter_queryset(Recipe.objects.all())
+        heavy = self.heavy_search(request)
+        with throttling.slot("search") if heavy else nullcontext():
+            # One row per match: a recipe listing an ingredient twice repeats
+            recipe_ids = list(
+                dict.fromkeys(queryset.values_list("id", flat=True))
+            )
+        if key is not None:
+            filter_cache.set(key, version, recipe_ids)
+        return recipe_ids
+
     def create(self, request, *args, **kwargs):
         """
         Override create to handle validation and response for new recipes.
@@ -94,8 +202,16 @@ class RecipeViewSet(viewsets.ModelViewSet):
 
             # Return using read serializer for full recipe data
             read_serializer = RecipeSerializer(recipe)
+            # Indexed when the save committed, so flags are already there
+            possible_duplicates = duplicates.flagged([recipe.id])
             return Response(
-                read_serializer.data, status=status.HTTP_201_CREATED
+                {
+                    **read_serializer.data,
+                    "possible_duplicates": possible_duplicates.get(
+                        recipe.id, []
+                    ),
+                },
+                status=status.HTTP_201_CREATED,
             )
         except Exception as e:
             return Response(
@@ -131,21 +247,301 @@ class RecipeViewSet(viewsets.ModelViewSet):
         read_serializer = RecipeSerializer(recipe)
         return Response(read_serializer.data, status=status.HTTP_200_OK)
 
+    @action(detail=False, methods=["get", "post"])
+    def batch(self, request: Request):
+        """
+        Retrieve many recipes in one request: GET `?ids=3,1,2` or POST
+        `{"ids": [3, 1, 2]}`. Recipes come back in the requested order
+        (duplicates dropped) and ids with no recipe are listed in `missing`.
+        """
+        if request.method == "GET":
+            ids = [
+                part.strip()
+                for value in request.query_params.getlist("ids")
+                for part in value.split(",")
+                if part.strip()
+            ]
+            serializer = RecipeBatchSerializer(data={"ids": ids})
+        else:
+            serializer = RecipeBatchSerializer(data=request.data)
+        if not serializer.is_valid():
+            return Response(
+                {"status": "failed", "error": serializer.errors}, status=400
+            )
+
+        ids = list(dict.fromkeys(serializer.validated_data["ids"]))
+        recipes = self.get_queryset().in_bulk(ids)
+        return Response(
+            {
+                "results": RecipeSerializer(
+                    [recipes[pk] for pk in ids if pk in recipes],
+                    many=True,
+                    context=self.get_serializer_context(),
+                ).data,
+                "missing": [pk for pk in ids if pk not in recipes],
+            }
+        )
+
+    @action(detail=False, methods=["post"])
+    def shopping_list(self, request: Request):
+        """
+        One shopping list for several recipes:
+        {"recipes": [{"id": 3, "factor": 2}, {"id": 7}]}. Amounts of an
+        ingredient are summed across recipes in a common unit; amounts in
+        units that don't convert stay on separate lines. A recipe listed
+        twice counts twice.
+        """
+        serializer = ShoppingListSerializer(data=request.data)
+        if not serializer.is_valid():
+            return Response(
+                {"status": "failed", "error": serializer.errors}, status=400
+            )
+        factors = defaultdict(Decimal)
+        for item in serializer.validated_data["recipes"]:
+            factors[item["id"]] += item["factor"]
+
+        found = set(
+            Recipe.objects.filter(id__in=factors.keys()).values_list(
+                "id", flat=True
+            )
+        )
+        return Response(
+            {
+                "items": shopping.shopping_list(
+                    {recipe_id: factors[recipe_id] for recipe_id in found}
+                ),
+                "missing": [
+                    recipe_id for recipe_id in factors if recipe_id not in found
+                ],
+            }
+        )
+
+    @action(detail=False, methods=["get"])
+    def changes(self, request: Request):
+        """
+        Delta sync feed. Without `since`, every recipe; with the `sync_token`
+        of a previous response, only recipes created, updated (`upsert`, with
+        the current recipe) or deleted (`delete`) since. Keep calling with
+        the new token while `has_more` is true.
+        """
+        try:
+            limit = min(
+                int(request.query_params.get("limit", settings.SYNC_PAGE_SIZE)),
+                settings.SYNC_PAGE_SIZE,
+            )
+        except ValueError:
+            limit = settings.SYNC_PAGE_SIZE
+        try:
+            changes, token, has_more = sync.read_changes(
+                request.query_params.get("since"), max(limit, 1)
+            )
+        except ValueError as e:
+            return Response({"status": "failed", "error": str(e)}, status=400)
+
+        upserted = [
+            recipe_id
+            for _, recipe_id, kind, _ in changes
+            if kind == RecipeChange.UPSERT
+        ]
+        recipes = self.get_queryset().in_bulk(upserted)
+        serializer_context = self.get_serializer_context()
+        results = []
+        for _, recipe_id, kind, changed_at in changes:
+            entry = {
+                "id": recipe_id,
+                "action": kind,
+                "changed_at": changed_at,
+            }
+            if kind == RecipeChange.UPSERT:
+                if recipe_id not in recipes:
+                    # Deleted after this read started; its tombstone follows
+                    continue
+                entry["recipe"] = RecipeSerializer(
+                    recipes[recipe_id], context=serializer_context
+                ).data
+            results.append(entry)
+
+        return Response(
+            {"changes": results, "sync_token": token, "has_more": has_more}
+        )
+
+    @action(detail=True, methods=["get"])
+    def similar(self, request: Request, pk=None):
+        """
+        Recipes with the most similar ingredients, best first, from the
+        precomputed lists (see my_recipes.similarity). Rare shared
+        ingredients count for more than common ones. `score` is the cosine
+        similarity, 0-1.
+        """
+        recipe = self.get_object()
+        neighbours = recipe.similar_recipes.select_related("similar").only(
+            "score", "recipe_id", "similar__id", "similar__name"
+        )
+        return Response(
+            {
+                "results": [
+                    {
+                        "id": neighbour.similar.id,
+                        "name": neighbour.similar.name,
+                        "score": round(neighbour.score, 4),
+                    }
+                    for neighbour in neighbours
+                ]
+            }
+        )
+
+    @action(detail=True, methods=["get"])
+    def duplicates(self, request: Request, pk=None):
+        """
+        Recipes flagged as near-duplicates of this one (see
+        my_recipes.duplicates), best first. `score` estimates the share of
+        step phrases and ingredients the two have in common, 0-1.
+        """
+        recipe = self.get_object()
+        return Response(
+            {"results": duplicates.flagged([recipe.id]).get(recipe.id, [])}
+        )
+
+    @action(detail=True, methods=["get"])
+    def scale(self, request: Request, pk=None):
+        """
+        The recipe resized by ?factor=, ?servings=&base_servings= or to
+        ?ingredient=<recipe ingredient id>&amount=[&unit=]. Amounts are moved
+        to the most readable unit (3 tsp -> 1 tbsp) and rounded to
+        measurable fractions; `display` has them as text ("1 1/2").
+        """
+        serializer = RecipeScaleSerializer(data=request.query_params)
+        if not serializer.is_valid():
+            return Response(
+                {"status": "failed", "error": serializer.errors}, status=400
+            )
+        params = serializer.validated_data
+        recipe = self.get_object()
+        rows = list(recipe.recipeingredient_set.all())
+
+        factor = params.get("factor")
+        if factor is None:
+            target = next(
+                (row for row in rows if row.id == params["ingredient"]), None
+            )
+            if target is None:
+                return Response(
+                    {
+                        "status": "failed",
+                        "error": "ingredient is not part of this recipe",
+                    },
+                    status=400,
+                )
+            base_unit, quantity = units.normalize(
+                params["amount"], params.get("unit", target.unit)
+            )
+            if (
+                quantity is None
+                or base_unit != target.normalized_unit
+                or not target.normalized_quantity
+            ):
+                return Response(
+                    {
+                        "status": "failed",
+                        "error": f"Can't convert {params.get('unit')!r} "
+                        f"to {target.unit!r}",
+                    },
+                    status=400,
+                )
+            factor = quantity / target.normalized_quantity
+            if factor > settings.RECIPE_SCALE_MAX_FACTOR:
+                return Response(
+                    {"status": "failed", "error": "Scale factor too large"},
+                    status=400,
+                )
+
+        scaled = units.scale_ingredients(rows, factor)
+        data = RecipeSerializer(
+            recipe, context=self.get_serializer_context()
+        ).data
+        # Pair output items with their rows by position rather than id, which
+        # ?fields= may leave out; the serializers list them in this order
+        pairs = []
+        if "ingredients" in data:
+            ordered = sorted(rows, key=lambda ri: (ri.ingredient.name, ri.id))
+            pairs += zip(data["ingredients"], ordered)
+        for step_data, step in zip(
+            data.get("recipe_steps", []), recipe.recipe_steps.all()
+        ):
+            pairs += (
+                (step_ingredient["ingredient"], step_ingredient_row.ingredient)
+                for step_ingredient, step_ingredient_row in zip(
+                    step_data.get("step_ingredients", []),
+                    step.stepingredient_set.all(),
+                )
+                if isinstance(step_ingredient.get("ingredient"), dict)
+            )
+        for item, row in pairs:
+            if "amount" in item:
+                item.update(scaled[row.id])
+        data["factor"] = f"{round(factor, 4).normalize():f}"
+        return Response(data)
+
+    @action(detail=False, methods=["post"])
+    def bulk_import(self, request: Request):
+        """
+        Create many recipes in one request. The body is a JSON array or
+        NDJSON (one object per line) of RecipeManageSerializer payloads, sent
+        raw or as a multipart `file`. Returns a result per item in input
+        order; 207 when only some of them were created.
+        """
+        if request.content_type.startswith("multipart/"):
+            stream = request.FILES.get("file")
+        else:
+            stream = request.stream
+        if stream is None:
+            return Response(
+                {"status": "failed", "error": "No recipes provided"},
+                status=400,
+            )
+
+        try:
+            results = RecipeBulkImport().run(stream)
+        except Exception as e:
+            logger.error(f"Error during bulk import: {str(e)}")
+            return Response({"status": "failed", "error": str(e)}, status=500)
+
+        created = sum(result["status"] == "created" for result in results)
+        if results and created == len(results):
+            outcome, code = "success", status.HTTP_200_OK
+        elif created:
+            outcome, code = "partial", status.HTTP_207_MULTI_STATUS
+        else:
+            outcome, code = "failed", status.HTTP_400_BAD_REQUEST
+        return Response(
+            {
+                "status": outcome,
+                "created": created,
+                "failed": len(results) - created,
+                "results": results,
+            },
+            status=code,
+        )
+
     @action(detail=False, methods=["post"])
     def backup_recipes(self, request: Request):
         recipe_ids = request.data.get("recipes", None)
         output_dir = settings.MEDIA_ROOT
         try:
-            RecipeBackup.backup_recipes(
-                recipe_ids=recipe_ids, output_dir=output_dir
-            )
+            with throttling.slot("backup"):
+                manifest_path = RecipeBackup.backup_recipes(
+                    recipe_ids=recipe_ids, output_dir=output_dir
+                )
             data, status = (
                 {
                     "status": "success",
                     "message": f"Recipes backed up to {output_dir}",
+                    "backup": Path(manifest_path).stem,
                 },
                 200,
             )
+        except throttling.Busy:
+            raise
         except Exception as e:
             data, status = {"status": "failed", "error": str(e)}, 500
 
@@ -153,33 +549,118 @@ class RecipeViewSet(viewsets.ModelViewSet):
 
     @action(detail=False, methods=["post"])
     def restore_recipes(self, request: Request):
+        """
+        Restore an uploaded `backup_file`, or with `backup` one of the
+        backups in the store (see `backups`)
+        """
         backup_file = request.FILES.get("backup_file")
+        backup_name = request.data.get("backup")
         overwrite = request.data.get("overwrite", False)
 
+        if backup_name and not backup_file:
+            manifest = BackupStore.default().find(backup_name)
+            if manifest is None:
+                return Response(
+                    {"status": "failed", "error": "Backup not found"},
+                    status=404,
+                )
+            backup_file = str(manifest.path)
         if not backup_file:
             return Response(
                 {"status": "failed", "error": "File missing"}, status=400
             )
         try:
-            recipes = RecipeBackup.restore_recipes(
-                input_file=backup_file, overwrite=overwrite
-            )
+            with throttling.slot("restore"):
+                recipes = RecipeBackup.restore_recipes(
+                    input_file=backup_file, overwrite=overwrite
+                )
+            flagged = duplicates.flagged(recipe.id for recipe in recipes)
             data, status = (
                 {
                     "status": "success",
                     "message": f"Restored {len(recipes)} recipes",
+                    "possible_duplicates": [
+                        {
+                            "id": recipe.id,
+                            "name": recipe.name,
+                            "duplicates": flagged[recipe.id],
+                        }
+                        for recipe in recipes
+                        if recipe.id in flagged
+                    ],
                 },
                 200,
             )
+        except throttling.Busy:
+            raise
         except Exception as e:
             data, status = {"error": str(e)}, 400
 
         return Response(data=data, status=status)
 
+    @action(detail=False, methods=["get"])
+    def backups(self, request: Request):
+        """The backups in the store, newest first"""
+        store = BackupStore.default()
+        backups = []
+        for manifest in store.manifests():
+            data = store.read_manifest(manifest.path)
+            backups.append(
+                {
+                    "name": manifest.name,
+                    "created": manifest.created.isoformat(),
+                    "count": data.get("count"),
+                    "partial": data.get("partial", False),
+                }
+            )
+        return Response(backups)
+
     @action(detail=False, methods=["get"])
     def download_backup(self, request: Request):
-        """Download the latest backup file from media root"""
+        """
+        Download the latest backup, or with `?backup=` a named one,
+        reassembled from the backup store into a single JSON file
+        """
         try:
+            store = BackupStore.default()
+            backup_name = request.query_params.get("backup")
+            if backup_name:
+                manifest = store.find(backup_name)
+            else:
+                manifest = store.latest()
+            if manifest is not None:
+                manifest_data = store.read_manifest(manifest.path)
+                # Checked before the 200 goes out; the stream can't report it
+                missing = store.missing(manifest_data)
+                if missing:
+                    logger.error(
+                        f"Backup {manifest.name} is missing "
+                        f"{len(missing)} stored recipes"
+                    )
+                    return Response(
+                        {
+                            "status": "failed",
+                            "error": f"Backup {manifest.name} is missing "
+                            f"{len(missing)} stored recipes",
+                        },
+                        status=500,
+                    )
+                logger.info(f"Sending backup: {manifest.name}")
+                response = StreamingHttpResponse(
+                    store.stream(manifest_data),
+                    content_type="application/json",
+                )
+                response["Content-Disposition"] = (
+                    f'attachment; filename="{manifest.name}.json"'
+                )
+                return response
+            if backup_name:
+                return Response(
+                    {"status": "failed", "error": "Backup not found"},
+                    status=404,
+                )
+
+            # Full backup files written before the store existed
             media_root = Path(settings.MEDIA_ROOT)
             logger.info("Searching for latest backup file in media root")
 
@@ -213,9 +694,98 @@ class RecipeViewSet(viewsets.ModelViewSet):
             logger.error(f"Error downloading backup: {str(e)}")
             return Response({"status": "failed", "error": str(e)}, status=500)
 
+    @action(detail=False, methods=["get", "post"])
+    def ocr_import(self, request: Request):
+        """
+        POST one or more `images` to queue them for OCR; GET with `?job=` to
+        poll. Finished jobs return a draft RecipeManageSerializer payload
+        for the client to review and POST to the create endpoint.
+        """
+        if request.method == "GET":
+            job = request.query_params.get("job")
+            if not job:
+                return Response(
+                    {"status": "failed", "error": "job parameter missing"},
+                    status=400,
+                )
+            result = OCRImport.status(job)
+            return Response(
+                result, status=404 if result["status"] == "unknown" else 200
+            )
+
+        images = request.FILES.getlist("images")
+        if not images:
+            return Response(
+                {"status": "failed", "error": "No images uploaded"}, status=400
+            )
+        # Checked before anything decodes the images
+        too_large = [
+            image.name
+            for image in images
+            if image.size > settings.OCR_MAX_UPLOAD_BYTES
+        ]
+        if too_large:
+            return Response(
+                {
+                    "status": "failed",
+                    "error": (
+                        f"Images larger than {settings.OCR_MAX_UPLOAD_BYTES} "
+                        f"bytes: {', '.join(too_large)}"
+                    ),
+                },
+                status=status.HTTP_413_REQUEST_ENTITY_TOO_LARGE,
+            )
+        try:
+            jobs = [OCRImport.submit(image.read()) for image in images]
+        except Exception as e:
+            logger.error(f"Error queueing OCR import: {str(e)}")
+            return Response({"status": "failed", "error": str(e)}, status=500)
+
+        return Response(
+            {"status": "success", "jobs": jobs},
+            status=status.HTTP_202_ACCEPTED,
+        )
+
 
 class IngredientViewSet(viewsets.ModelViewSet):
     queryset = Ingredient.objects.all()
     search_fields = ["name"]
+    # Stored counters, so sorting by popularity or listing unused
+    # ingredients (?recipe_count=0) needs no COUNT over recipe rows
+    ordering_fields = ["name", "recipe_count", "last_used_at"]
+    filterset_fields = {"recipe_count": ["exact", "lte", "gte"]}
     serializer_class = IngredientSerializer
     permission_classes = [IsAuthenticated]
+
+    def get_queryset(self):
+        queryset = super().get_queryset()
+        if self.action in ("list", "retrieve"):
+            queryset = IngredientSerializer.setup_eager_loading(
+                queryset, *field_selection(self.request)
+            )
+        return queryset
+
+    @action(detail=False, methods=["post"])
+    def parse(self, request: Request):
+        """
+        Parse free-text ingredient lines ("1 1/2 cups flour, sifted") into
+        name, amount and unit. Results keep the order of `lines`; blank lines
+        parse to null and lines without a quantity have a null amount.
+        """
+        serializer = IngredientParseSerializer(data=request.data)
+        if not serializer.is_valid():
+            return Response(
+                {"status": "failed", "error": serializer.errors}, status=400
+            )
+        lines = serializer.validated_data["lines"]
+        return Response(
+            {
+                "status": "success",
+                "results": [
+                    {"line": line, "parsed": parsed}
+                    for line, parsed in zip(
+                        lines, ingredient_parser.parse_many(lines)
+                    )
+                ],
+            }
+        )
@@ -2,5 +2,8 @@ from django.apps import AppConfig
 
 
 class MyRecipesConfig(AppConfig):
-    default_auto_field = 'django.db.models.BigAutoField'
-    name = 'my_recipes'
+    default_auto_field = "django.db.models.BigAutoField"
+    name = "my_recipes"
+
+    def ready(self):
+        from . import signals  # noqa: F401
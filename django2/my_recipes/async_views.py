@@ -0,0 +1,563 @@
+"""
+Async read-only recipe and ingredient endpoints.
+
+Plain Django async views (DRF views are synchronous) built on the async ORM.
+Served through recipes.asgi (DJANGO_SERVER_INTERFACE=asgi) they don't tie up
+a worker thread while waiting on the database; under WSGI they still work,
+Django just runs them in a thread.
+
+Responses match the DRF endpoints: the same serializers and JSON renderer,
+and the same {count, next, previous, results} page shape for lists.
+"""
+
+import functools
+import time
+from collections import deque
+from datetime import timedelta
+from logging import getLogger
+from types import SimpleNamespace
+from typing import AsyncIterator, Callable, Iterator, Optional
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.contrib.auth.models import User
+from django.core import signing
+from django.core.handlers.asgi import ASGIRequest
+from django.http import (
+    Http404,
+    HttpResponse,
+    StreamingHttpResponse,
+)
+from django.db.models import Max, Q
+from django.utils import timezone
+from django.views.decorators.http import require_GET
+from rest_framework.exceptions import (
+    APIException,
+    AuthenticationFailed,
+    Throttled,
+)
+from rest_framework.settings import api_settings
+from rest_framework.utils.urls import remove_query_param, replace_query_param
+
+from api import throttling
+from api.pagination import LargeResultsSetPagination
+from api.renderers import FastJSONRenderer
+
+from .events import broker, change_event
+from .models import Ingredient, Recipe, RecipeChange
+from .serializers import (
+    IngredientSerializer,
+    RecipeSerializer,
+    field_selection,
+)
+
+logger = getLogger(__name__)
+
+# Recipes serialized per query while streaming an export
+EXPORT_CHUNK_SIZE = 200
+
+# Salt of the stream tickets recipe_events_ticket signs
+EVENTS_TICKET_SALT = "my_recipes.recipe_events"
+
+RECIPE_ORDERING_FIELDS = ("created_at", "modified_at", "name")
+INGREDIENT_ORDERING_FIELDS = ("name", "recipe_count", "last_used_at")
+
+renderer = FastJSONRenderer()
+
+
+def _authenticate(request):
+    """Run the configured DRF authenticators against a plain HttpRequest."""
+    for authentication_class in api_settings.DEFAULT_AUTHENTICATION_CLASSES:
+        result = authentication_class().authenticate(request)
+        if result is not None:
+            return result[0]
+    return None
+
+
+def _ticket_user(request):
+    """
+    The user of a ?ticket= from recipe_events_ticket, None if there is none.
+    EventSource can't send an Authorization header, so event streams take
+    one of these instead: signed, scoped to the stream and short-lived.
+    """
+    ticket = request.GET.get("ticket")
+    if not ticket:
+        return None
+    try:
+        user_id = signing.TimestampSigner(salt=EVENTS_TICKET_SALT).unsign(
+            ticket, max_age=settings.SSE_TICKET_SECONDS
+        )
+    except signing.BadSignature:
+        raise AuthenticationFailed("Invalid or expired ticket.")
+    user = User.objects.filter(pk=user_id, is_active=True).first()
+    if user is None:
+        raise AuthenticationFailed("Invalid or expired ticket.")
+    return user
+
+
+def _cheap(request) -> str:
+    return throttling.CHEAP
+
+
+def _heavy(request) -> str:
+    return throttling.HEAVY
+
+
+def jwt_required(
+    view=None, *, allow_ticket: bool = False, budget: Callable = _cheap
+):
+    """
+    Async counterpart of permission_classes = [IsAuthenticated], plus the
+    BudgetThrottle DRF views get: ``budget(request)`` picks the budget the
+    request counts against. With allow_ticket, a stream ticket
+    (_ticket_user) is accepted too. Busy and Throttled raised by the view
+    become the same 503/429 responses as in DRF.
+    """
+    if view is None:
+        return functools.partial(
+            jwt_required, allow_ticket=allow_ticket, budget=budget
+        )
+    throttled_view = SimpleNamespace(throttle_budget=budget)
+
+    def authenticate(request):
+        user = _authenticate(request)
+        if user is None and allow_ticket:
+            user = _ticket_user(request)
+        return user
+
+    def allow(request) -> Optional[float]:
+        """None if the request is within its budget, else the wait"""
+        throttle = throttling.BudgetThrottle()
+        if throttle.allow_request(request, throttled_view):
+            return None
+        return throttle.wait()
+
+    @functools.wraps(view)
+    async def wrapper(request, *args, **kwargs):
+        try:
+            user = await sync_to_async(authenticate)(request)
+        except APIException as e:
+            return _render({"detail": str(e.detail)}, status=401)
+        if user is None:
+            return _render(
+                {"detail": "Authentication credentials were not provided."},
+                status=401,
+            )
+        request.user = user
+        try:
+            wait = await sync_to_async(allow)(request)
+            if wait is not None:
+                raise Throttled(wait)
+            return await view(request, *args, **kwargs)
+        except Throttled as e:
+            response = _render({"detail": str(e.detail)}, status=e.status_code)
+            if e.wait is not None:
+                response["Retry-After"] = str(e.wait)
+            return response
+
+    return wrapper
+
+
+def _render(data, status: int = 200) -> HttpResponse:
+    return HttpResponse(
+        renderer.render(data), content_type="application/json", status=status
+    )
+
+
+def _filter_recipes(request, queryset):
+    """Same query parameters as RecipeViewSet: search, ingredients, ordering."""
+    search = request.GET.get("search")
+    if search:
+        queryset = queryset.filter(name__icontains=search)
+
+    # AND logic, like RecipeFilterSet.filter_ingredients_all
+    for ingredient_id in request.GET.getlist("ingredients"):
+        if ingredient_id.isdigit():
+            queryset = queryset.filter(ingredients=ingredient_id)
+
+    ordering = [
+        field
+        for field in request.GET.get("ordering", "").split(",")
+        if field.lstrip("-") in RECIPE_ORDERING_FIELDS
+    ]
+    if ordering:
+        queryset = queryset.order_by(*ordering)
+    return queryset
+
+
+async def _paginate(request, queryset, serializer_class):
+    paginator = LargeResultsSetPagination()
+    try:
+        page_size = min(
+            int(request.GET.get(paginator.page_size_query_param)),
+            paginator.max_page_size,
+        )
+    except (TypeError, ValueError):
+        page_size = paginator.page_size
+    page_size = max(page_size, 1)
+    try:
+        page = max(int(request.GET.get(paginator.page_query_param, 1)), 1)
+    except ValueError:
+        page = 1
+
+    count = await queryset.acount()
+    offset = (page - 1) * page_size
+    if offset and offset >= count:
+        raise Http404("Invalid page.")
+    objects = [obj async for obj in queryset[offset : offset + page_size]]
+
+    url = request.build_absolute_uri()
+    next_url = previous_url = None
+    if offset + page_size < count:
+        next_url = replace_query_param(
+            url, paginator.page_query_param, page + 1
+        )
+    if page == 2:
+        previous_url = remove_query_param(url, paginator.page_query_param)
+    elif page > 2:
+        previous_url = replace_query_param(
+            url, paginator.page_query_param, page - 1
+        )
+
+    return {
+        "count": count,
+        "next": next_url,
+        "previous": previous_url,
+        "results": serializer_class(
+            objects, many=True, context={"request": request}
+        ).data,
+    }
+
+
+def _search_budget(request) -> str:
+    """Heavy for many ingredients ANDed together, as RecipeViewSet has it"""
+    if (
+        len(set(request.GET.getlist("ingredients")))
+        >= settings.HEAVY_SEARCH_MIN_INGREDIENTS
+    ):
+        return throttling.HEAVY
+    return throttling.CHEAP
+
+
+@require_GET
+@jwt_required(budget=_search_budget)
+async def recipe_list(request):
+    queryset = _filter_recipes(
+        request,
+        RecipeSerializer.setup_eager_loading(
+            Recipe.objects.all(), *field_selection(request)
+        ),
+    )
+    if request.GET.getlist("ingredients"):
+        queryset = queryset.distinct()
+    if _search_budget(request) == throttling.HEAVY:
+        release = await sync_to_async(throttling.acquire)("search")
+    else:
+        release = None
+    try:
+        data = await _paginate(request, queryset, RecipeSerializer)
+    except Http404 as e:
+        return _render({"detail": str(e)}, status=404)
+    finally:
+        if release is not None:
+            await sync_to_async(release)()
+    return _render(data)
+
+
+@require_GET
+@jwt_required
+async def recipe_detail(request, pk: int):
+    queryset = RecipeSerializer.setup_eager_loading(
+        Recipe.objects.filter(pk=pk), *field_selection(request)
+    )
+    recipe = [recipe async for recipe in queryset]
+    if not recipe:
+        return _render({"detail": "No Recipe matches the given query."}, 404)
+    return _render(
+        RecipeSerializer(recipe[0], context={"request": request}).data
+    )
+
+
+@require_GET
+@jwt_required
+async def ingredient_list(request):
+    queryset = IngredientSerializer.setup_eager_loading(
+        Ingredient.objects.all(), *field_selection(request)
+    )
+    search = request.GET.get("search")
+    if search:
+        queryset = queryset.filter(name__icontains=search)
+    ordering = [
+        field
+        for field in request.GET.get("ordering", "").split(",")
+        if field.lstrip("-") in INGREDIENT_ORDERING_FIELDS
+    ]
+    if ordering:
+        queryset = queryset.order_by(*ordering)
+    try:
+        data = await _paginate(request, queryset, IngredientSerializer)
+    except Http404 as e:
+        return _render({"detail": str(e)}, status=404)
+    return _render(data)
+
+
+def _export_queryset(last_id: int, chunk_size: int):
+    return RecipeSerializer.setup_eager_loading(
+        Recipe.objects.filter(id__gt=last_id).order_by("id")
+    )[:chunk_size]
+
+
+def _export_lines(chunk) -> bytes:
+    return b"".join(
+        renderer.render(item) + b"\n"
+        for item in RecipeSerializer(chunk, many=True).data
+    )
+
+
+async def _export_chunks(chunk_size: int) -> AsyncIterator[bytes]:
+    """
+    Yield the whole library as NDJSON, one chunk of recipes per query.
+
+    Keyset pagination on id keeps each query cheap and means only one chunk
+    is ever held in memory; no transaction stays open between chunks.
+    """
+    last_id = 0
+    exported = 0
+    while True:
+        chunk = [
+            recipe async for recipe in _export_queryset(last_id, chunk_size)
+        ]
+        if not chunk:
+            break
+        yield _export_lines(chunk)
+        exported += len(chunk)
+        last_id = chunk[-1].id
+    logger.info(f"Streamed export of {exported} recipes")
+
+
+def _export_chunks_sync(chunk_size: int) -> Iterator[bytes]:
+    """
+    _export_chunks for WSGI, which would collect an async iterator into a
+    list before sending any of it
+    """
+    last_id = 0
+    exported = 0
+    while True:
+        chunk = list(_export_queryset(last_id, chunk_size))
+        if not chunk:
+            break
+        yield _export_lines(chunk)
+        exported += len(chunk)
+        last_id = chunk[-1].id
+    logger.info(f"Streamed export of {exported} recipes")
+
+
+class _SlotStream:
+    """
+    Streaming content that gives back an admission slot when closed.
+
+    Django closes a response once the server is done with it, whether or not
+    the body was ever iterated, so a client that disconnects before the
+    first chunk doesn't keep the slot.
+    """
+
+    def __init__(self, chunks, release: Callable[[], None]) -> None:
+        self._chunks = chunks
+        self._release = release
+
+    def __iter__(self):
+        return iter(self._chunks)
+
+    def close(self) -> None:
+        release, self._release = self._release, None
+        if release is not None:
+            release()
+
+
+class _AsyncSlotStream(_SlotStream):
+    # Only __aiter__: StreamingHttpResponse tries iter() first
+    __iter__ = None
+
+    def __aiter__(self):
+        return aiter(self._chunks)
+
+
+@require_GET
+@jwt_required(budget=_heavy)
+async def recipe_export(request):
+    """
+    Stream every recipe as newline-delimited JSON (RecipeSerializer shape).
+    Counts against the heavy budget and holds a "search" admission slot
+    until the response is closed.
+    """
+    try:
+        chunk_size = min(
+            max(int(request.GET.get("chunk_size", EXPORT_CHUNK_SIZE)), 1),
+            1000,
+        )
+    except ValueError:
+        chunk_size = EXPORT_CHUNK_SIZE
+    # Taken here so a busy server answers 503 before streaming starts
+    release = await sync_to_async(throttling.acquire)("search")
+    if isinstance(request, ASGIRequest):
+        chunks = _AsyncSlotStream(_export_chunks(chunk_size), release)
+    else:
+        chunks = _SlotStream(_export_chunks_sync(chunk_size), release)
+    response = StreamingHttpResponse(
+        chunks, content_type="application/x-ndjson"
+    )
+    # Let nginx pass chunks through as they are produced
+    response["X-Accel-Buffering"] = "no"
+    return response
+
+
+def _sse(event: str, data, event_id: Optional[int] = None) -> bytes:
+    lines = [f"event: {event}".encode()]
+    if event_id is not None:
+        lines.append(f"id: {event_id}".encode())
+    lines.append(b"data: " + renderer.render(data))
+    return b"\n".join(lines) + b"\n\n"
+
+
+async def _logged_changes(after: int, since, limit: int):
+    """Change log rows past seq ``after``, or written since ``since``"""
+    condition = Q(seq__gt=after)
+    if since is not None:
+        condition |= Q(changed_at__gte=since)
+    queryset = (
+        RecipeChange.objects.filter(condition)
+        .order_by("seq")
+        .values_list("seq", "recipe_id", "action")[:limit]
+    )
+    return [row async for row in queryset]
+
+
+async def _last_change_seq() -> int:
+    result = await RecipeChange.objects.aaggregate(Max("seq"))
+    return result["seq__max"] or 0
+
+
+async def _change_events(cursor: int) -> AsyncIterator[bytes]:
+    """
+    Recipe change notifications as they are published, with a keepalive
+    comment after SSE_KEEPALIVE_SECONDS without any.
+
+    Subscribes on first iteration, not in the view: only a running
+    generator reaches the finally that unsubscribes, so a client gone
+    before the first chunk must not leave a subscription behind.
+
+    Starts by replaying the change log past ``cursor`` (the Last-Event-ID
+    of a reconnecting client). Every SSE_POLL_SECONDS, busy or not, it also
+    reads the log, which picks up writes committed by other workers; like
+    the delta sync feed it looks back SYNC_OVERLAP_SECONDS for late
+    commits. Events already sent are skipped by seq.
+    """
+    max_events = settings.SSE_CLIENT_BUFFER
+    subscription = broker.subscribe(max_events, settings.SSE_MAX_CLIENTS)
+    if subscription is None:
+        # Filled up since the view checked; EventSource retries after this
+        yield f"retry: {settings.SSE_KEEPALIVE_SECONDS * 1000}\n\n".encode()
+        return
+    overlap = timedelta(seconds=settings.SYNC_OVERLAP_SECONDS)
+    keepalive = settings.SSE_KEEPALIVE_SECONDS
+    poll_interval = settings.SSE_POLL_SECONDS
+    sent = deque(maxlen=max_events * 2)
+    polled_at = timezone.now()
+    next_poll = time.monotonic() + poll_interval
+    written = float("-inf")
+    try:
+        yield b"retry: 3000\n\n"
+        rows = await _logged_changes(cursor, None, max_events + 1)
+        if len(rows) > max_events:
+            # Too far behind to replay; the client catches up through sync
+            yield _sse("resync", {})
+            cursor = await _last_change_seq()
+            rows = []
+        events = [change_event(*row) for row in rows]
+
+        while True:
+            chunk = b""
+            for event in events:
+                cursor = max(cursor, event["version"])
+                if event["version"] not in sent:
+                    sent.append(event["version"])
+                    chunk += _sse("recipe", event, event["version"])
+            now = time.monotonic()
+            if chunk or now - written >= keepalive:
+                yield chunk or b": keepalive\n\n"
+                written = now
+
+            wait = min(next_poll, written + keepalive) - now
+            events = await subscription.get(max(wait, 0))
+            if subscription.overflowed:
+                subscription.overflowed = False
+                yield _sse("resync", {})
+                written = time.monotonic()
+                events = []
+            if time.monotonic() >= next_poll:
+                since, polled_at = polled_at - overlap, timezone.now()
+                rows = await _logged_changes(cursor, since, max_events)
+                events += [change_event(*row) for row in rows]
+                next_poll = time.monotonic() + poll_interval
+    finally:
+        broker.unsubscribe(subscription)
+
+
+@require_GET
+@jwt_required
+async def recipe_events_ticket(request):
+    """
+    A ticket for opening the event stream from a browser, valid for
+    SSE_TICKET_SECONDS: EventSource("/api/async/recipes/events/?ticket=...")
+    """
+    ticket = signing.TimestampSigner(salt=EVENTS_TICKET_SALT).sign(
+        str(request.user.pk)
+    )
+    response = _render(
+        {"ticket": ticket, "expires_in": settings.SSE_TICKET_SECONDS}
+    )
+    response["Cache-Control"] = "no-store"
+    return response
+
+
+@require_GET
+@jwt_required(allow_ticket=True)
+async def recipe_events(request):
+    """
+    Server-sent events stream of recipe changes: `recipe` events carrying
+    {"id", "version", "action"}, where version is the change seq usable as
+    Last-Event-ID, and `resync` when the client fell too far behind and
+    should catch up through GET /recipes/changes/. Authenticated with a
+    bearer token or, for EventSource, a ?ticket= from recipe_events_ticket.
+    """
+    if not isinstance(request, ASGIRequest):
+        # A WSGI worker would be held for the lifetime of the stream
+        return _render(
+            {
+                "status": "failed",
+                "error": "Event streams need DJANGO_SERVER_INTERFACE=asgi",
+            },
+            status=501,
+        )
+
+    last_event_id = request.headers.get("Last-Event-ID", "")
+    if last_event_id.isdigit():
+        cursor = int(last_event_id)
+    else:
+        cursor = await _last_change_seq()
+
+    # Advisory, the generator subscribes; this just answers 503 up front
+    if len(broker) >= settings.SSE_MAX_CLIENTS:
+        response = _render(
+            {"status": "failed", "error": "Too many event streams"},
+            status=503,
+        )
+        response["Retry-After"] = str(settings.SSE_KEEPALIVE_SECONDS)
+        return response
+
+    response = StreamingHttpResponse(
+        _change_events(cursor), content_type="text/event-stream"
+    )
+    response["Cache-Control"] = "no-cache"
+    response["X-Accel-Buffering"] = "no"
+    return response
@@ -9,6 +9,7 @@ from typing import Any, Dict, List, Optional
 from django.db import transaction
 
 from . import models
+from .backup_store import STORE_DIR, BackupStore, is_manifest, write_checksum
 
 logger = logging.getLogger(__name__)
 
@@ -81,6 +82,21 @@ class RecipeBackup:
         logger.info(f"Successfully serialized recipe: {recipe.name}")
         return backup_data
 
+    @staticmethod
+    def schema_limits() -> Dict[str, int]:
+        """Field sizes a backed up recipe must fit to restore (see backup_verify)"""
+        amount = models.RecipeIngredient._meta.get_field("amount")
+        return {
+            "name": models.Recipe._meta.get_field("name").max_length,
+            "ingredient_name": models.Ingredient._meta.get_field(
+                "name"
+            ).max_length,
+            "unit": models.RecipeIngredient._meta.get_field("unit").max_length,
+            "component": models.Step._meta.get_field("component").max_length,
+            "amount_digits": amount.max_digits,
+            "amount_places": amount.decimal_places,
+        }
+
     @staticmethod
     def backup_recipes(
         recipe_ids: Optional[List[int]] = None,
@@ -88,15 +104,16 @@ class RecipeBackup:
         output_dir: Optional[str] = None,
     ) -> str:
         """
-        Backup recipes to a JSON file.
+        Backup recipes into the backup store, or to a standalone JSON file.
 
         Args:
             recipe_ids: List of recipe IDs to backup. If None, backs up all recipes.
-            output_file: Path to output JSON file. If None, creates timestamped file.
-            output_dir: Path where JSON files should be saved
+            output_file: Path to a standalone JSON file to write instead of
+                storing the backup.
+            output_dir: Directory holding the backup store; MEDIA_ROOT if None.
 
         Returns:
-            Path to the created backup file
+            Path to the created manifest or backup file
         """
         logger.info("Starting backup process...")
         if recipe_ids:
@@ -109,6 +126,20 @@ class RecipeBackup:
         recipe_count = recipes.count()
         logger.info(f"Found {recipe_count} recipes to backup")
 
+        if output_file is None:
+            if output_dir is None:
+                store = BackupStore.default()
+            else:
+                store = BackupStore(Path(output_dir) / STORE_DIR)
+            logger.info(f"Writing backup to store: {store.root}")
+            manifest_path = store.save(
+                (RecipeBackup.backup_recipe(recipe) for recipe in recipes),
+                partial=bool(recipe_ids),
+            )
+            store.prune()
+            logger.info(f"Backup completed successfully: {manifest_path}")
+            return str(manifest_path)
+
         backup_data = {
             "timestamp": datetime.now().isoformat(),
             "count": recipe_count,
@@ -121,15 +152,6 @@ class RecipeBackup:
             f"Backup data prepared: {len(backup_data['recipes'])} recipes serialized"
         )
 
-        if output_file is None:
-            timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
-            if output_dir is not None:
-                output_file = f"{output_dir}/recipes_backup_{timestamp}.json"
-                logger.debug(f"Using output directory: {output_dir}")
-            else:
-                output_file = f"recipes_backup_{timestamp}.json"
-            logger.debug(f"Generated timestamped filename: {output_file}")
-
         output_path = Path(output_file)
         logger.debug(
             f"Creating output directories if needed: {output_path.parent}"
@@ -139,6 +161,7 @@ class RecipeBackup:
         logger.info(f"Writing backup to file: {output_path}")
         with open(output_path, "w") as f:
             json.dump(backup_data, f, indent=2)
+        write_checksum(output_path)
 
         logger.info(f"Backup completed successfully: {output_path}")
         return str(output_path)
@@ -293,7 +316,8 @@ class RecipeBackup:
         Restore recipes from a JSON backup file or file object.
 
         Args:
-            input_file: Either a file path (str) or an uploaded file object
+            input_file: Either a file path (str) or an uploaded file object,
+                holding a full backup or a backup store manifest
             overwrite: If True, overwrite existing recipes with same names
 
         Returns:
@@ -318,6 +342,15 @@ class RecipeBackup:
                 backup_data = json.load(f)
             logger.debug("Loaded backup data from file")
 
+        if is_manifest(backup_data):
+            # Uploaded manifests refer to the default store
+            if hasattr(input_file, "read"):
+                store = BackupStore.default()
+            else:
+                store = BackupStore.containing(input_file)
+            logger.debug(f"Reassembling backup from store: {store.root}")
+            backup_data = store.assemble(backup_data)
+
         backup_timestamp = backup_data.get("timestamp", "unknown")
         recipe_count = backup_data.get("count", 0)
         logger.info(
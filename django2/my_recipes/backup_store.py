@@ -0,0 +1,347 @@
+"""
+Content-addressed backup storage.
+
+A backup used to be one JSON file holding every recipe, so each backup cost
+the whole library again. The store keeps each recipe's serialized form
+(RecipeBackup.backup_recipe) once, in ``blobs/<h[:2]>/<h>.json`` where h is
+the SHA-256 of its canonical JSON, and a backup is a manifest listing those
+hashes, ``manifests/recipes_backup_<timestamp>.json``; the timestamp has
+microseconds and a manifest never replaces another. A recipe unchanged
+between backups costs one hash per manifest, so disk usage grows with edits,
+not with the number of backups.
+
+prune() applies the retention policy: it keeps the newest backup of each of
+the last BACKUP_KEEP_DAILY days and BACKUP_KEEP_WEEKLY ISO weeks that have
+one, plus the newest backup overall. Only full backups count: a backup of
+a few recipes (``"partial": true`` in its manifest) can't stand in for the
+library, so partial backups are never pruned. It then deletes the blobs
+that no remaining manifest lists and that weren't modified within
+GC_GRACE_SECONDS. Saving a backup refreshes the mtime of every blob it
+lists, so a prune running alongside a save skips nearly all of its blobs.
+Nothing locks the two against each other, though: a blob whose mtime the
+prune read just before the save touched it is still deleted, and missing()
+reports the loss.
+
+assemble() and stream() rebuild the single-file format, which is what
+download_backup serves and restore_recipes reads.
+
+Every manifest, and every standalone backup file, gets a ``<file>.sha256``
+next to it (sha256sum format), which verify_backup checks.
+"""
+
+import hashlib
+import json
+import os
+import threading
+import time
+from datetime import datetime, timedelta
+from logging import getLogger
+from pathlib import Path
+from typing import Any, Dict, Iterable, Iterator, List, NamedTuple, Optional
+
+from django.conf import settings
+
+logger = getLogger(__name__)
+
+STORE_DIR = "backup_store"
+NAME_PREFIX = "recipes_backup_"
+NAME_FORMAT = f"{NAME_PREFIX}%Y%m%d_%H%M%S_%f"
+# Names before microseconds were added; standalone backup files still use it
+LEGACY_NAME_FORMAT = f"{NAME_PREFIX}%Y%m%d_%H%M%S"
+MANIFEST_VERSION = 1
+# Blobs this recently written or referenced are kept by garbage collection
+GC_GRACE_SECONDS = 3600
+
+
+class Manifest(NamedTuple):
+    name: str
+    path: Path
+    created: datetime
+
+
+class PruneResult(NamedTuple):
+    removed: List[Manifest]
+    kept: List[Manifest]
+    blobs_removed: int
+    bytes_freed: int
+
+
+def canonical(recipe_data: Dict[str, Any]) -> bytes:
+    """The bytes a recipe is stored and hashed as"""
+    return json.dumps(
+        recipe_data, sort_keys=True, separators=(",", ":"), ensure_ascii=False
+    ).encode()
+
+
+def is_manifest(backup_data: Dict[str, Any]) -> bool:
+    """Whether loaded backup JSON is a manifest rather than a full backup"""
+    return "hashes" in backup_data
+
+
+def parse_name(name: str) -> Optional[datetime]:
+    """The creation time encoded in a backup name, None if it isn't one"""
+    for name_format in (NAME_FORMAT, LEGACY_NAME_FORMAT):
+        try:
+            return datetime.strptime(name, name_format)
+        except ValueError:
+            pass
+    return None
+
+
+def _temp_path(path: Path) -> Path:
+    return path.with_name(
+        f".{path.name}.{os.getpid()}.{threading.get_ident()}.tmp"
+    )
+
+
+def _write_atomic(path: Path, data: bytes) -> None:
+    path.parent.mkdir(parents=True, exist_ok=True)
+    temp = _temp_path(path)
+    temp.write_bytes(data)
+    os.replace(temp, path)
+
+
+def _write_new(path: Path, data: bytes) -> None:
+    """_write_atomic, but raises FileExistsError rather than replace a file"""
+    path.parent.mkdir(parents=True, exist_ok=True)
+    temp = _temp_path(path)
+    temp.write_bytes(data)
+    try:
+        # Unlike os.replace, link() fails if the name is taken
+        os.link(temp, path)
+    finally:
+        temp.unlink()
+
+
+def checksum_path(path: Any) -> Path:
+    path = Path(path)
+    return path.with_name(f"{path.name}.sha256")
+
+
+def file_sha256(path: Any) -> str:
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        while chunk := f.read(1 << 20):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+def write_checksum(path: Any, digest: Optional[str] = None) -> str:
+    """Record a file's SHA-256 next to it; returns the digest"""
+    digest = digest or file_sha256(path)
+    _write_atomic(
+        checksum_path(path), f"{digest}  {Path(path).name}\n".encode()
+    )
+    return digest
+
+
+def read_checksum(path: Any) -> Optional[str]:
+    """The recorded SHA-256 of a file, None if none was recorded"""
+    try:
+        return checksum_path(path).read_text().split()[0]
+    except (FileNotFoundError, IndexError):
+        return None
+
+
+class BackupStore:
+    """A backup store rooted at ``root`` (see the module docstring)"""
+
+    def __init__(self, root: Any) -> None:
+        self.root = Path(root)
+        self.blob_dir = self.root / "blobs"
+        self.manifest_dir = self.root / "manifests"
+
+    @classmethod
+    def default(cls) -> "BackupStore":
+        return cls(Path(settings.MEDIA_ROOT) / STORE_DIR)
+
+    @classmethod
+    def containing(cls, manifest_path: Any) -> "BackupStore":
+        """The store a manifest file belongs to"""
+        return cls(Path(manifest_path).resolve().parent.parent)
+
+    def blob_path(self, digest: str) -> Path:
+        return self.blob_dir / digest[:2] / f"{digest}.json"
+
+    def put(self, recipe_data: Dict[str, Any]) -> str:
+        """Store a serialized recipe unless already stored; returns its hash"""
+        data = canonical(recipe_data)
+        digest = hashlib.sha256(data).hexdigest()
+        path = self.blob_path(digest)
+        try:
+            # Marks the blob as in use for garbage collection
+            os.utime(path)
+        except FileNotFoundError:
+            _write_atomic(path, data)
+        return digest
+
+    def save(
+        self,
+        recipes: Iterable[Dict[str, Any]],
+        created: Optional[datetime] = None,
+        partial: bool = False,
+    ) -> Path:
+        """
+        Store the recipes and a manifest listing them, in order. ``partial``
+        marks a backup of selected recipes, which retention never counts.
+        """
+        created = created or datetime.now()
+        hashes = [self.put(recipe_data) for recipe_data in recipes]
+        manifest = {
+            "version": MANIFEST_VERSION,
+            "timestamp": created.isoformat(),
+            "count": len(hashes),
+            "hashes": hashes,
+        }
+        if partial:
+            manifest["partial"] = True
+        data = json.dumps(manifest, indent=1).encode()
+        while True:
+            path = self.manifest_dir / f"{created.strftime(NAME_FORMAT)}.json"
+            try:
+                _write_new(path, data)
+                break
+            except FileExistsError:
+                # Saved in the same microsecond, or an imported legacy
+                # backup of the same second: take the next free name
+                created += timedelta(microseconds=1)
+        write_checksum(path, hashlib.sha256(data).hexdigest())
+        return path
+
+    def manifests(self) -> List[Manifest]:
+        """Every backup in the store, newest first"""
+        found = []
+        for path in self.manifest_dir.glob(f"{NAME_PREFIX}*.json"):
+            created = parse_name(path.stem)
+            if created is not None:
+                found.append(Manifest(path.stem, path, created))
+        found.sort(key=lambda manifest: manifest.created, reverse=True)
+        return found
+
+    def find(self, name: str) -> Optional[Manifest]:
+        """A backup by name (with or without .json), None if not stored"""
+        name = Path(name).name.removesuffix(".json")
+        created = parse_name(name)
+        path = self.manifest_dir / f"{name}.json"
+        if created is None or not path.is_file():
+            return None
+        return Manifest(name, path, created)
+
+    def latest(self) -> Optional[Manifest]:
+        manifests = self.manifests()
+        return manifests[0] if manifests else None
+
+    def read_manifest(self, path: Any) -> Dict[str, Any]:
+        with open(path, "rb") as f:
+            return json.load(f)
+
+    def missing(self, manifest: Dict[str, Any]) -> List[str]:
+        """The hashes a manifest lists that have no stored recipe"""
+        return [
+            digest
+            for digest in manifest["hashes"]
+            if not self.blob_path(digest).is_file()
+        ]
+
+    def blob(self, digest: str) -> bytes:
+        """A stored recipe's bytes, checked against its hash"""
+        try:
+            data = self.blob_path(digest).read_bytes()
+        except FileNotFoundError:
+            raise ValueError(f"Backup store is missing recipe {digest}")
+        if hashlib.sha256(data).hexdigest() != digest:
+            raise ValueError(f"Recipe {digest} in the backup store is corrupt")
+        return data
+
+    def assemble(self, manifest: Dict[str, Any]) -> Dict[str, Any]:
+        """The full backup a manifest describes"""
+        return {
+            "timestamp": manifest.get("timestamp", "unknown"),
+            "count": manifest.get("count", len(manifest["hashes"])),
+            "recipes": [
+                json.loads(self.blob(digest)) for digest in manifest["hashes"]
+            ],
+        }
+
+    def stream(self, manifest: Dict[str, Any]) -> Iterator[bytes]:
+        """
+        assemble() as JSON, one recipe at a time. Check missing() first: a
+        missing or corrupt blob can only end the stream part way.
+        """
+        header = {
+            "timestamp": manifest.get("timestamp", "unknown"),
+            "count": manifest.get("count", len(manifest["hashes"])),
+        }
+        # The header object without its closing brace
+        yield json.dumps(header)[:-1].encode() + b', "recipes": ['
+        for index, digest in enumerate(manifest["hashes"]):
+            yield (b", " if index else b"") + self.blob(digest)
+        yield b"]}"
+
+    def retained(
+        self, manifests: List[Manifest], keep_daily: int, keep_weekly: int
+    ) -> List[Manifest]:
+        """The backups the retention policy keeps, newest first"""
+        kept, days, weeks = [], set(), set()
+        full_kept = False
+        for manifest in manifests:
+            if self.read_manifest(manifest.path).get("partial"):
+                kept.append(manifest)
+                continue
+            day = manifest.created.date()
+            week = day.isocalendar()[:2]
+            keep = not full_kept
+            if day not in days and len(days) < keep_daily:
+                days.add(day)
+                keep = True
+            if week not in weeks and len(weeks) < keep_weekly:
+                weeks.add(week)
+                keep = True
+            if keep:
+                kept.append(manifest)
+                full_kept = True
+        return kept
+
+    def prune(
+        self,
+        keep_daily: Optional[int] = None,
+        keep_weekly: Optional[int] = None,
+        dry_run: bool = False,
+    ) -> PruneResult:
+        """Delete the backups retention drops, then unreferenced blobs"""
+        if keep_daily is None:
+            keep_daily = settings.BACKUP_KEEP_DAILY
+        if keep_weekly is None:
+            keep_weekly = settings.BACKUP_KEEP_WEEKLY
+        manifests = self.manifests()
+        kept = self.retained(manifests, keep_daily, keep_weekly)
+        kept_names = {manifest.name for manifest in kept}
+        removed = [m for m in manifests if m.name not in kept_names]
+
+        referenced = set()
+        for manifest in kept:
+            referenced.update(self.read_manifest(manifest.path)["hashes"])
+        if not dry_run:
+            for manifest in removed:
+                manifest.path.unlink(missing_ok=True)
+                checksum_path(manifest.path).unlink(missing_ok=True)
+
+        blobs_removed = bytes_freed = 0
+        cutoff = time.time() - GC_GRACE_SECONDS
+        for path in self.blob_dir.glob("*/*.json"):
+            if path.stem in referenced:
+                continue
+            stat = path.stat()
+            if stat.st_mtime > cutoff:
+                continue
+            if not dry_run:
+                path.unlink(missing_ok=True)
+            blobs_removed += 1
+            bytes_freed += stat.st_size
+        if removed or blobs_removed:
+            logger.info(
+                f"Backup store: {'would prune' if dry_run else 'pruned'} "
+                f"{len(removed)} backups and {blobs_removed} recipe blobs "
+                f"({bytes_freed} bytes)"
+            )
+        return PruneResult(removed, kept, blobs_removed, bytes_freed)
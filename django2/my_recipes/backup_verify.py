@@ -0,0 +1,295 @@
+"""
+Backup verification: schema and consistency checks, and a streaming reader.
+
+A restorable recipe, as RecipeBackup.backup_recipe writes it and
+restore_recipe reads it::
+
+    {"name": str, "steps_json": any JSON,
+     "ingredients": [{"name": str, "amount": decimal, "unit": str|null}],
+     "steps": [{"order": int >= 0, "step": str, "component": str|null,
+                "ingredients": [{"ingredient_name": str,
+                                 "amount": decimal, "unit": str|null}]}]}
+
+Strings must fit their model fields and amounts the RecipeIngredient
+DecimalField (``limits``, from RecipeBackup.schema_limits()). Every step
+ingredient must also be one of the recipe's listed ingredients, with the
+same amount and unit: restore would otherwise invent a recipe ingredient
+the backup never had.
+
+The check_* functions are the worker entry points of the verify_backup
+command. Only backup_store is imported, which touches no Django settings
+here, so they run in spawned worker processes.
+"""
+
+import hashlib
+import json
+import re
+from decimal import Decimal, InvalidOperation
+from typing import IO, Any, Dict, Iterator, List, Optional, Tuple
+
+from .backup_store import BackupStore
+
+# Problems reported per file; the rest are only counted
+MAX_ERRORS = 20
+READ_SIZE = 1 << 16
+
+_RECIPES_KEY = re.compile(r'"recipes"\s*:\s*\[')
+_SEPARATOR = re.compile(r"[\s,]*")
+
+Problem = Tuple[int, str, str]
+
+
+def _text(value: Any, limit: int, required: bool = True) -> Optional[str]:
+    """What's wrong with a string field, None if nothing"""
+    if value is None:
+        return "missing" if required else None
+    if not isinstance(value, str):
+        return f"not a string ({type(value).__name__})"
+    if required and not value.strip():
+        return "empty"
+    if len(value) > limit:
+        return f"longer than {limit} characters"
+    return None
+
+
+def _amount(value: Any, limits: Dict[str, int]) -> Tuple[Any, Optional[str]]:
+    """(the amount as a Decimal, what's wrong with it)"""
+    if isinstance(value, bool) or not isinstance(value, (str, int, float)):
+        return None, f"not a number ({value!r})"
+    try:
+        amount = Decimal(str(value))
+    except InvalidOperation:
+        return None, f"not a number ({value!r})"
+    if not amount.is_finite():
+        return None, f"not finite ({value!r})"
+    places = limits["amount_places"]
+    whole_digits = len(str(abs(int(amount)))) if int(amount) else 0
+    if whole_digits > limits["amount_digits"] - places:
+        return None, f"too large ({value!r})"
+    if -amount.as_tuple().exponent > places:
+        return amount, f"more than {places} decimal places ({value!r})"
+    return amount, None
+
+
+def validate_recipe(recipe: Any, limits: Dict[str, int]) -> List[str]:
+    """Everything that would keep a backed up recipe from restoring as is"""
+    if not isinstance(recipe, dict):
+        return [f"not an object ({type(recipe).__name__})"]
+    errors = []
+    problem = _text(recipe.get("name"), limits["name"])
+    if problem:
+        errors.append(f"name: {problem}")
+
+    listed: Dict[str, List[Tuple[Any, Any]]] = {}
+    ingredients = recipe.get("ingredients", [])
+    if not isinstance(ingredients, list):
+        errors.append("ingredients: not a list")
+        ingredients = []
+    for index, item in enumerate(ingredients, 1):
+        where = f"ingredient {index}"
+        if not isinstance(item, dict):
+            errors.append(f"{where}: not an object")
+            continue
+        problem = _text(item.get("name"), limits["ingredient_name"])
+        if problem:
+            errors.append(f"{where} name: {problem}")
+        amount, problem = _amount(item.get("amount"), limits)
+        if problem:
+            errors.append(f"{where} amount: {problem}")
+        problem = _text(item.get("unit"), limits["unit"], required=False)
+        if problem:
+            errors.append(f"{where} unit: {problem}")
+        if isinstance(item.get("name"), str):
+            listed.setdefault(item["name"], []).append(
+                (amount, item.get("unit"))
+            )
+
+    steps = recipe.get("steps", [])
+    if not isinstance(steps, list):
+        errors.append("steps: not a list")
+        steps = []
+    for index, step in enumerate(steps, 1):
+        where = f"step {index}"
+        if not isinstance(step, dict):
+            errors.append(f"{where}: not an object")
+            continue
+        order = step.get("order")
+        if isinstance(order, bool) or not isinstance(order, int) or order < 0:
+            errors.append(f"{where} order: not a non-negative integer")
+        problem = _text(step.get("step"), float("inf"))
+        if problem:
+            errors.append(f"{where} text: {problem}")
+        problem = _text(
+            step.get("component"), limits["component"], required=False
+        )
+        if problem:
+            errors.append(f"{where} component: {problem}")
+        step_ingredients = step.get("ingredients", [])
+        if not isinstance(step_ingredients, list):
+            errors.append(f"{where} ingredients: not a list")
+            continue
+        for item in step_ingredients:
+            if not isinstance(item, dict):
+                errors.append(f"{where} ingredient: not an object")
+                continue
+            name = item.get("ingredient_name")
+            problem = _text(name, limits["ingredient_name"])
+            if problem:
+                errors.append(f"{where} ingredient name: {problem}")
+                continue
+            amount, problem = _amount(item.get("amount"), limits)
+            if problem:
+                errors.append(f"{where} '{name}' amount: {problem}")
+            if name not in listed:
+                errors.append(f"{where} uses '{name}', which isn't listed")
+            elif (amount, item.get("unit")) not in listed[name]:
+                errors.append(
+                    f"{where} uses '{name}' with an amount or unit the "
+                    "ingredient list doesn't have"
+                )
+    return errors
+
+
+def _problems(
+    recipes: Iterator[Tuple[int, Any]], limits: Dict[str, int]
+) -> Tuple[int, int, List[Problem]]:
+    """(recipes checked, problems found, the first MAX_ERRORS of them)"""
+    checked = found = 0
+    reported: List[Problem] = []
+    for index, recipe in recipes:
+        checked += 1
+        name = recipe.get("name") if isinstance(recipe, dict) else None
+        for error in validate_recipe(recipe, limits):
+            found += 1
+            if len(reported) < MAX_ERRORS:
+                reported.append((index, str(name), error))
+    return checked, found, reported
+
+
+class BackupReader:
+    """
+    Iterates over the recipes of a full backup file without loading it
+    whole. The other top-level fields are in ``header`` and the file's
+    SHA-256 in ``sha256`` once iteration ends. A file without a recipes
+    array (a store manifest) yields nothing and ends up entirely in
+    ``header``.
+    """
+
+    def __init__(self, stream: IO[bytes]) -> None:
+        self.stream = stream
+        self.header: Dict[str, Any] = {}
+        self.sha256: Optional[str] = None
+
+    def __iter__(self) -> Iterator[Any]:
+        digest = hashlib.sha256()
+        decoder = json.JSONDecoder()
+        text, eof = "", False
+
+        def read() -> bool:
+            nonlocal text
+            chunk = self.stream.read(READ_SIZE)
+            digest.update(chunk)
+            text += chunk.decode("utf-8")
+            return not chunk
+
+        # Chunks are decoded one by one, so none may end mid-character
+        self.stream = _Utf8Stream(self.stream)
+        while not (match := _RECIPES_KEY.search(text)) and not eof:
+            eof = read()
+        if match is None:
+            self.header = json.loads(text)
+            self.sha256 = digest.hexdigest()
+            return
+        head, text = text[: match.start()], text[match.end() :]
+
+        while True:
+            text = text[_SEPARATOR.match(text).end() :]
+            if text.startswith("]"):
+                text = text[1:]
+                break
+            try:
+                recipe, end = decoder.raw_decode(text)
+            except json.JSONDecodeError:
+                if eof:
+                    raise ValueError("Backup ends inside its recipe list")
+                eof = read()
+                continue
+            text = text[end:]
+            yield recipe
+
+        while not eof:
+            eof = read()
+        self.header = json.loads(head.rstrip().rstrip(",") + "}")
+        self.header.update(json.loads("{" + text.lstrip().lstrip(",")))
+        self.sha256 = digest.hexdigest()
+
+
+class _Utf8Stream:
+    """A byte stream whose reads never end inside a UTF-8 character"""
+
+    def __init__(self, stream: IO[bytes]) -> None:
+        self.stream = stream
+        self.pending = b""
+
+    def read(self, size: int) -> bytes:
+        chunk = self.stream.read(size)
+        data, self.pending = self.pending + chunk, b""
+        if not chunk:
+            return data
+        # Hold back a trailing partial character (continuation bytes are
+        # 10xxxxxx, a lead byte 11xxxxxx)
+        for back in range(1, min(4, len(data)) + 1):
+            byte = data[-back]
+            if byte & 0xC0 == 0xC0:
+                needed = 2 if byte < 0xE0 else 3 if byte < 0xF0 else 4
+                if needed > back:
+                    data, self.pending = data[:-back], data[-back:]
+                break
+            if byte & 0x80 == 0:
+                break
+        return data
+
+
+def check_file(path: str, limits: Dict[str, int]) -> Dict[str, Any]:
+    """
+    Worker: stream a full backup file and check every recipe. Returns the
+    counts, the first problems, the header and the file's SHA-256.
+    """
+    with open(path, "rb") as f:
+        reader = BackupReader(f)
+        checked, found, reported = _problems(enumerate(reader, 1), limits)
+    return {
+        "header": reader.header,
+        "sha256": reader.sha256,
+        "checked": checked,
+        "found": found,
+        "problems": reported,
+    }
+
+
+def check_blobs(
+    store_root: str,
+    hashes: List[str],
+    first_index: int,
+    limits: Dict[str, int],
+) -> Dict[str, Any]:
+    """
+    Worker: check a chunk of a manifest's recipes, each against its hash
+    (missing or corrupt blobs are problems too) and the schema.
+    """
+    store = BackupStore(store_root)
+    missing: List[Problem] = []
+
+    def recipes() -> Iterator[Tuple[int, Any]]:
+        for index, digest in enumerate(hashes, first_index):
+            try:
+                yield index, json.loads(store.blob(digest))
+            except ValueError as e:
+                missing.append((index, digest[:12], str(e)))
+
+    checked, found, reported = _problems(recipes(), limits)
+    return {
+        "checked": checked + len(missing),
+        "found": found + len(missing),
+        "problems": (missing + reported)[:MAX_ERRORS],
+    }
@@ -0,0 +1,366 @@
+"""Bulk creation of recipes from a JSON array or NDJSON stream."""
+
+import codecs
+import json
+import logging
+from itertools import chain
+from typing import Any, Dict, Iterator, List, Optional, Tuple
+
+from django.conf import settings
+from django.db import DatabaseError, transaction
+
+from . import duplicates, models, similarity, usage
+from .events import publish_on_commit
+from .serializers import RecipeManageSerializer
+
+logger = logging.getLogger(__name__)
+
+# Bytes read from the request per iteration
+READ_SIZE = 64 * 1024
+
+_WHITESPACE = " \t\r\n"
+# Characters that may follow a complete element of a JSON array
+_AFTER_VALUE = {",", "]", *_WHITESPACE}
+
+
+def _read_text(stream) -> Iterator[str]:
+    """Decode a binary stream in chunks without splitting UTF-8 sequences"""
+    decoder = codecs.getincrementaldecoder("utf-8")()
+    while True:
+        data = stream.read(READ_SIZE)
+        if not data:
+            break
+        if isinstance(data, str):
+            yield data
+        else:
+            yield decoder.decode(data)
+    tail = decoder.decode(b"", final=True)
+    if tail:
+        yield tail
+
+
+def _iter_ndjson(chunks: Iterator[str], head: str):
+    index = 0
+    buffer = ""
+    for chunk in chain((head,), chunks):
+        *lines, buffer = (buffer + chunk).split("\n")
+        for line in lines:
+            if line.strip():
+                yield index, *_loads(line)
+                index += 1
+    if buffer.strip():
+        yield index, *_loads(buffer)
+
+
+def _loads(line: str) -> Tuple[Any, Optional[str]]:
+    try:
+        return json.loads(line), None
+    except ValueError as e:
+        return None, f"Invalid JSON: {e}"
+
+
+def _iter_json_array(chunks: Iterator[str], buffer: str):
+    """
+    Yield the elements of a top-level JSON array one at a time.
+
+    Each element is decoded as soon as it is complete, so only one element
+    (plus the unread part of the current chunk) is held in memory.
+    """
+    decoder = json.JSONDecoder()
+    exhausted = False
+    position = buffer.index("[") + 1
+    index = 0
+    expect_value = True
+
+    while True:
+        # Skip whitespace and separators, reading more input as needed
+        while True:
+            while position < len(buffer) and buffer[position] in _WHITESPACE:
+                position += 1
+            if position < len(buffer) or exhausted:
+                break
+            try:
+                buffer = buffer[position:] + next(chunks)
+                position = 0
+            except StopIteration:
+                exhausted = True
+
+        if position >= len(buffer):
+            yield index, None, "Invalid JSON: unterminated array"
+            return
+        char = buffer[position]
+        if char == "]":
+            return
+        if not expect_value:
+            if char != ",":
+                yield index, None, f"Invalid JSON: expected ',' got {char!r}"
+                return
+            position += 1
+            expect_value = True
+            continue
+
+        try:
+            value, end = decoder.raw_decode(buffer, position)
+        except ValueError as e:
+            value = end = None
+            error = e
+        # A value cut off by the end of the buffer may fail to decode or
+        # decode short ("3" of "3.5"); only trust one followed by a separator
+        complete = end is not None and buffer[end : end + 1] in _AFTER_VALUE
+        if not complete and not exhausted:
+            try:
+                buffer = buffer[position:] + next(chunks)
+                position = 0
+            except StopIteration:
+                exhausted = True
+            continue
+        if end is None:
+            yield index, None, f"Invalid JSON: {error}"
+            return
+        yield index, value, None
+        index += 1
+        position = end
+        expect_value = False
+
+
+def iter_payloads(stream) -> Iterator[Tuple[int, Any, Optional[str]]]:
+    """
+    Yield (index, payload, parse_error) from a JSON array or NDJSON stream.
+
+    The format is sniffed from the first non-whitespace character. A
+    malformed NDJSON line only fails that item; a malformed array ends the
+    stream because there is no way to resynchronise.
+    """
+    chunks = _read_text(stream)
+    buffer = ""
+    for chunk in chunks:
+        buffer += chunk
+        if buffer.strip():
+            break
+    if not buffer.strip():
+        return
+    if buffer.lstrip().startswith("["):
+        yield from _iter_json_array(chunks, buffer)
+    else:
+        yield from _iter_ndjson(chunks, buffer)
+
+
+class RecipeBulkImport:
+    """
+    Creates many recipes from RecipeManageSerializer-shaped payloads.
+
+    Payloads are validated as they are read and written in chunks of
+    BULK_IMPORT_CHUNK_SIZE, one transaction and a handful of bulk INSERTs
+    per chunk, instead of a transaction and a query per ingredient for
+    every recipe. The ingredient vocabulary is loaded once up front and
+    extended with bulk inserts as new names appear.
+
+    If a chunk fails to write, its recipes are retried one transaction
+    each so a single bad item doesn't sink its neighbours.
+    """
+
+    def __init__(
+        self,
+        chunk_size: Optional[int] = None,
+        max_items: Optional[int] = None,
+    ):
+        self.chunk_size = chunk_size or settings.BULK_IMPORT_CHUNK_SIZE
+        self.max_items = max_items or settings.BULK_IMPORT_MAX_ITEMS
+        self.vocabulary: Dict[str, int] = {}
+        self.results: List[Dict[str, Any]] = []
+
+    def run(self, stream) -> List[Dict[str, Any]]:
+        """Import every payload in the stream; returns per-item results"""
+        self.vocabulary = dict(
+            models.Ingredient.objects.values_list("name", "id")
+        )
+        logger.info(
+            f"Bulk import started, {len(self.vocabulary)} known ingredients"
+        )
+
+        chunk: List[Tuple[int, Dict[str, Any]]] = []
+        for index, payload, error in iter_payloads(stream):
+            if index >= self.max_items:
+                self.results.append(
+                    {
+                        "index": index,
+                        "status": "failed",
+                        "error": f"Import limited to {self.max_items} "
+                        "recipes per request",
+                    }
+                )
+                break
+            if error:
+                self.results.append(
+                    {"index": index, "status": "failed", "error": error}
+                )
+                continue
+
+            serializer = RecipeManageSerializer(data=payload)
+            if not serializer.is_valid():
+                self.results.append(
+                    {
+                        "index": index,
+                        "status": "invalid",
+                        "errors": serializer.errors,
+                    }
+                )
+                continue
+
+            chunk.append((index, serializer.validated_data))
+            if len(chunk) >= self.chunk_size:
+                self.write_chunk(chunk)
+                chunk = []
+        if chunk:
+            self.write_chunk(chunk)
+
+        self.results.sort(key=lambda result: result["index"])
+        created = sum(r["status"] == "created" for r in self.results)
+        logger.info(
+            f"Bulk import finished: {created} created, "
+            f"{len(self.results) - created} failed"
+        )
+        return self.results
+
+    def resolve_ingredients(self, chunk) -> None:
+        """Add ids for ingredient names the vocabulary doesn't have yet"""
+        missing = {
+            ingredient["name"]
+            for _, data in chunk
+            for ingredient in data["ingredients"]
+        } - self.vocabulary.keys()
+        if not missing:
+            return
+        # Committed on its own: a failed chunk must not roll back names the
+        # vocabulary already holds ids for
+        with transaction.atomic():
+            models.Ingredient.objects.bulk_create(
+                [models.Ingredient(name=name) for name in missing],
+                ignore_conflicts=True,
+            )
+        self.vocabulary.update(
+            models.Ingredient.objects.filter(name__in=missing).values_list(
+                "name", "id"
+            )
+        )
+        logger.debug(f"Added {len(missing)} ingredients to the vocabulary")
+
+    def write_chunk(self, chunk: List[Tuple[int, Dict[str, Any]]]) -> None:
+        try:
+            self.resolve_ingredients(chunk)
+            with transaction.atomic():
+                recipes = self.create_recipes([data for _, data in chunk])
+        except (DatabaseError, KeyError) as e:
+            logger.warning(
+                f"Bulk write of {len(chunk)} recipes failed ({e!r}), "
+                "retrying one at a time"
+            )
+            for index, data in chunk:
+                # Resolved again per recipe: the chunk's names may not all
+                # have made it into the vocabulary
+                try:
+                    self.resolve_ingredients([(index, data)])
+                    with transaction.atomic():
+                        recipe = self.create_recipes([data])[0]
+                except DatabaseError as e:
+                    error = str(e)
+                except KeyError as e:
+                    error = f"Ingredient {e} could not be created"
+                else:
+                    self.results.append(self._created(index, recipe))
+                    continue
+                logger.error(f"Failed to import recipe {index}: {error}")
+                self.results.append(
+                    {"index": index, "status": "failed", "error": error}
+                )
+            return
+
+        self.results.extend(
+            self._created(index, recipe)
+            for (index, _), recipe in zip(chunk, recipes)
+        )
+        logger.info(f"Imported chunk of {len(recipes)} recipes")
+
+    @staticmethod
+    def _created(index: int, recipe: models.Recipe) -> Dict[str, Any]:
+        return {
+            "index": index,
+            "status": "created",
+            "id": recipe.id,
+            "name": recipe.name,
+        }
+
+    def create_recipes(
+        self, payloads: List[Dict[str, Any]]
+    ) -> List[models.Recipe]:
+        """Same rows as RecipeManageSerializer.create, in five bulk INSERTs"""
+        recipes = models.Recipe.objects.bulk_create(
+            [models.Recipe(name=data["name"]) for data in payloads]
+        )
+
+        recipe_ingredients = []
+        for recipe, data in zip(recipes, payloads):
+            recipe_ingredients.append(
+                [
+                    models.RecipeIngredient(
+                        recipe=recipe,
+                        ingredient_id=self.vocabulary[ingredient["name"]],
+                        amount=ingredient["amount"],
+                        unit=ingredient.get("unit", ""),
+                    )
+                    for ingredient in data["ingredients"]
+                ]
+            )
+        # bulk_create skips RecipeIngredient.save(), which normalizes
+        for rows in recipe_ingredients:
+            for row in rows:
+                row.normalize()
+        models.RecipeIngredient.objects.bulk_create(
+            [row for rows in recipe_ingredients for row in rows]
+        )
+        usage.add_recipes(
+            (row.recipe_id, row.ingredient_id)
+            for rows in recipe_ingredients
+            for row in rows
+        )
+
+        steps = []
+        for recipe, data in zip(recipes, payloads):
+            for step_data in data["steps"]:
+                steps.append(
+                    models.Step(
+                        recipe=recipe,
+                        order=step_data["order"],
+                        step=step_data["step"],
+                        component=step_data.get("component") or None,
+                    )
+                )
+        models.Step.objects.bulk_create(steps)
+
+        # Steps were created in payload order; hand them back out per recipe
+        steps_iter = iter(steps)
+        step_ingredients = []
+        for rows, data in zip(recipe_ingredients, payloads):
+            for step_data, step in zip(data["steps"], steps_iter):
+                step_ingredients.extend(
+                    models.StepIngredient(
+                        step=step, ingredient=rows[ref["ingredient_index"]]
+                    )
+                    for ref in step_data.get("ingredients", [])
+                )
+        models.StepIngredient.objects.bulk_create(step_ingredients)
+        # bulk_create sends no post_save, so log and publish the changes here
+        changes = models.RecipeChange.objects.bulk_create(
+            models.RecipeChange(
+                recipe_id=recipe.id, action=models.RecipeChange.UPSERT
+            )
+            for recipe in recipes
+        )
+        publish_on_commit(changes)
+        transaction.on_commit(
+            lambda: similarity.schedule_refresh(
+                touched=[recipe.id for recipe in recipes]
+            )
+        )
+        duplicates.index_on_commit(recipe.id for recipe in recipes)
+        return recipes
@@ -0,0 +1,227 @@
+"""
+Near-duplicate ingredient detection and merging.
+
+Recipes create ingredients from whatever name was typed, so "Onion",
+"onions" and "onion " end up as separate rows. Names are first normalized
+(case, accents, punctuation, plurals, word order), which catches most
+variants outright. Spelling variants ("mozarella", "mozzarella") are then
+found by the Jaccard similarity of the normalized names' character
+trigrams.
+
+Candidate pairs come from a trigram index with prefix filtering instead of
+comparing every pair of names: trigrams are ordered from rarest to most
+common, and two names can only reach the threshold if they share one of
+the rarest few trigrams of each (Chaudhuri et al., "A Primitive Operator
+for Similarity Joins"). Only those pairs are scored, so tens of thousands
+of names take seconds.
+
+Merging repoints RecipeIngredient rows to the group's canonical (most used)
+ingredient with a few bulk UPDATEs and deletes the others, in one
+transaction.
+"""
+
+import math
+import re
+import unicodedata
+from collections import Counter, defaultdict
+from typing import Dict, Iterable, List, NamedTuple, Optional, Set, Tuple
+
+from django.db import transaction
+from django.db.models import Case, Count, Value, When
+
+from . import similarity, usage
+from .events import publish_on_commit
+from .models import Ingredient, RecipeChange, RecipeIngredient
+
+# Ids per UPDATE/DELETE statement (SQLite variable limits)
+BATCH_SIZE = 500
+
+# "mozarella"/"mozzarella" score 0.73 and "zuchini"/"zucchini" 0.67, but
+# short names score lower: "chili"/"chilli" 0.57 is below the default and
+# already close to "olive"/"olive oil" at 0.56, which must not merge
+DEFAULT_THRESHOLD = 0.6
+
+_NOT_WORD = re.compile(r"[^\w\s]+|_")
+
+
+def _singular(word: str) -> str:
+    if len(word) <= 3 or word.endswith(("ss", "us", "is")):
+        return word
+    if word.endswith("ies"):
+        return word[:-3] + "y"
+    if word.endswith(("oes", "ches", "shes", "xes", "zes", "sses")):
+        return word[:-2]
+    if word.endswith("s"):
+        return word[:-1]
+    return word
+
+
+def normalize_name(name: str) -> str:
+    """'Onions, Yellow ' -> 'onion yellow'; equal keys are the same food"""
+    text = unicodedata.normalize("NFKD", name.lower())
+    text = "".join(char for char in text if not unicodedata.combining(char))
+    words = _NOT_WORD.sub(" ", text).split()
+    return " ".join(sorted(_singular(word) for word in words))
+
+
+def trigrams(key: str) -> Set[str]:
+    padded = f" {key} "
+    return {padded[i : i + 3] for i in range(len(padded) - 2)}
+
+
+def similar_pairs(
+    keys: Dict[int, str], threshold: float
+) -> Iterable[Tuple[int, int, float]]:
+    """
+    (a, b, jaccard) for every pair of keys whose trigram sets have a
+    Jaccard similarity of at least ``threshold`` (0 < threshold <= 1).
+    """
+    grams = {key_id: trigrams(key) for key_id, key in keys.items()}
+    frequency = Counter(
+        gram for gram_set in grams.values() for gram in gram_set
+    )
+
+    index: Dict[str, List[int]] = defaultdict(list)
+    for key_id, gram_set in sorted(grams.items(), key=lambda i: len(i[1])):
+        ordered = sorted(gram_set, key=lambda gram: (frequency[gram], gram))
+        # Two sets can only reach the threshold if their prefixes overlap
+        prefix = ordered[
+            : len(ordered) - math.ceil(threshold * len(ordered)) + 1
+        ]
+        candidates = set()
+        for gram in prefix:
+            candidates.update(index[gram])
+            index[gram].append(key_id)
+        for other in candidates:
+            other_grams = grams[other]
+            # Sizes alone rule out most candidates (indexed smaller first)
+            if len(other_grams) < threshold * len(gram_set):
+                continue
+            shared = len(gram_set & other_grams)
+            score = shared / (len(gram_set) + len(other_grams) - shared)
+            if score >= threshold:
+                yield other, key_id, score
+
+
+class MergeGroup(NamedTuple):
+    canonical: int
+    duplicates: List[int]
+
+
+def find_groups(
+    names: Dict[int, str], usage: Dict[int, int], threshold: float
+) -> List[MergeGroup]:
+    """
+    Proposed merges for ingredient id -> name. Names with the same
+    normalized key are grouped, then groups whose keys are similar enough
+    are joined. The canonical ingredient of a group is its most used one,
+    then the shortest name.
+    """
+    # "chick peas" and "chickpeas" share a key; trigrams use the spaced form
+    by_key: Dict[str, List[int]] = defaultdict(list)
+    spaced: Dict[str, str] = {}
+    for ingredient_id, name in names.items():
+        normalized = normalize_name(name)
+        key = normalized.replace(" ", "")
+        by_key[key].append(ingredient_id)
+        spaced.setdefault(key, normalized)
+    keys = list(by_key)
+
+    # Union-find over the distinct keys
+    parent = list(range(len(keys)))
+
+    def root(i: int) -> int:
+        while parent[i] != i:
+            parent[i] = parent[parent[i]]
+            i = parent[i]
+        return i
+
+    if threshold < 1:
+        pairs = similar_pairs(
+            {i: spaced[key] for i, key in enumerate(keys)}, threshold
+        )
+        for a, b, _ in pairs:
+            parent[root(a)] = root(b)
+
+    clusters: Dict[int, List[int]] = defaultdict(list)
+    for i, key in enumerate(keys):
+        clusters[root(i)].extend(by_key[key])
+
+    groups = []
+    for members in clusters.values():
+        if len(members) < 2:
+            continue
+        members.sort(
+            key=lambda i: (-usage.get(i, 0), len(names[i]), names[i], i)
+        )
+        groups.append(MergeGroup(members[0], members[1:]))
+    groups.sort(key=lambda group: names[group.canonical].lower())
+    return groups
+
+
+def load_vocabulary(
+    ingredient_ids: Optional[Iterable[int]] = None,
+) -> Tuple[Dict[int, str], Dict[int, int]]:
+    """(id -> name, id -> number of recipe rows) in two queries"""
+    ingredients = Ingredient.objects.all()
+    if ingredient_ids is not None:
+        ingredients = ingredients.filter(id__in=list(ingredient_ids))
+    names = dict(ingredients.values_list("id", "name"))
+    usage = dict(
+        RecipeIngredient.objects.values_list("ingredient_id")
+        .annotate(count=Count("id"))
+        .values_list("ingredient_id", "count")
+    )
+    return names, usage
+
+
+def merge(groups: List[MergeGroup]) -> Tuple[int, int]:
+    """
+    Repoint every recipe row of each group's duplicates to its canonical
+    ingredient and delete the duplicates, all or nothing. Returns (rows
+    repointed, ingredients deleted).
+    """
+    target = {
+        duplicate: group.canonical
+        for group in groups
+        for duplicate in group.duplicates
+    }
+    duplicates = list(target)
+    repointed = deleted = 0
+    with transaction.atomic():
+        recipe_ids = set()
+        for start in range(0, len(duplicates), BATCH_SIZE):
+            batch = duplicates[start : start + BATCH_SIZE]
+            rows = RecipeIngredient.objects.filter(ingredient_id__in=batch)
+            recipe_ids.update(rows.values_list("recipe_id", flat=True))
+            repointed += rows.update(
+                ingredient_id=Case(
+                    *[
+                        When(
+                            ingredient_id=duplicate,
+                            then=Value(target[duplicate]),
+                        )
+                        for duplicate in batch
+                    ]
+                )
+            )
+            deleted += (
+                Ingredient.objects.filter(id__in=batch)
+                .delete()[1]
+                .get(Ingredient._meta.label, 0)
+            )
+
+        # Queryset updates skip the usage signals; a recipe may have listed
+        # both names, so count the canonical ones again
+        usage.recount({group.canonical for group in groups})
+
+        # The recipes read differently now: tell sync clients and streams
+        changes = RecipeChange.objects.bulk_create(
+            RecipeChange(recipe_id=recipe_id, action=RecipeChange.UPSERT)
+            for recipe_id in sorted(recipe_ids)
+        )
+        publish_on_commit(changes)
+        transaction.on_commit(
+            lambda: similarity.schedule_refresh(touched=recipe_ids)
+        )
+    return repointed, deleted
@@ -0,0 +1,293 @@
+"""
+Near-duplicate recipe detection with MinHash and locality-sensitive hashing.
+
+Restores skip recipes by exact name only, so a retitled copy gets in again.
+A recipe is reduced to a set of shingles: every run of three words in its
+steps, plus its normalized ingredient names (my_recipes.dedupe). The
+Jaccard similarity of two such sets (shared shingles / all shingles) is
+estimated by MinHash: each of NUM_HASHES hash functions keeps the smallest
+hash of any shingle, and the fraction of positions where two signatures
+agree estimates the similarity.
+
+Each signature is cut into BANDS bands of ROWS values, and every band is
+hashed to a RecipeBucket key. Recipes agreeing on a whole band share a key,
+so candidates come from an indexed lookup of a recipe's keys rather than a
+scan of the library. With 32 bands of 4, a pair at 0.6 similarity shares a
+key 99% of the time; one at 0.3 does 23% of the time and is then rejected
+by comparing signatures. Pairs reaching DUPLICATE_RECIPE_THRESHOLD are
+stored as DuplicateRecipe rows.
+
+Recipes are indexed once their transaction commits, all recipes written by
+one transaction together (a restore is one batch), so copies within a
+single backup are caught too.
+"""
+
+import hashlib
+import random
+import re
+import struct
+import threading
+from collections import defaultdict
+from logging import getLogger
+from typing import Any, Dict, Iterable, List, Optional, Set, Tuple
+
+from django.conf import settings
+from django.db import transaction
+from django.db.models import Q
+
+from . import dedupe
+from .models import (
+    DuplicateRecipe,
+    RecipeBucket,
+    RecipeIngredient,
+    RecipeSignature,
+    Step,
+)
+
+logger = getLogger(__name__)
+
+NUM_HASHES = 128
+BANDS, ROWS = 32, 4
+SHINGLE_WORDS = 3
+
+# Ids per IN (...) query (SQLite variable limits)
+BATCH_SIZE = 500
+
+_MASK = (1 << 64) - 1
+# Fixed, so signatures stored by one process compare with another's.
+# Changing it or NUM_HASHES needs find_duplicate_recipes --reindex
+_random = random.Random(0x5EED)
+_HASHES = [
+    (_random.getrandbits(64) | 1, _random.getrandbits(64))
+    for _ in range(NUM_HASHES)
+]
+_PACKING = struct.Struct(f"<{NUM_HASHES}I")
+_WORD = re.compile(r"\w+")
+
+Signature = Tuple[int, ...]
+
+
+def _hash(text: str) -> int:
+    digest = hashlib.blake2b(text.encode(), digest_size=8).digest()
+    return int.from_bytes(digest, "little")
+
+
+def _batches(ids: List[Any]) -> Iterable[List[Any]]:
+    for start in range(0, len(ids), BATCH_SIZE):
+        yield ids[start : start + BATCH_SIZE]
+
+
+def shingles(steps: Iterable[str], ingredient_names: Iterable[str]) -> Set[str]:
+    """Three-word runs of each step, and each normalized ingredient name"""
+    found = set()
+    for step in steps:
+        words = _WORD.findall(step.lower())
+        if len(words) <= SHINGLE_WORDS:
+            if words:
+                found.add(" ".join(words))
+            continue
+        found.update(
+            " ".join(words[i : i + SHINGLE_WORDS])
+            for i in range(len(words) - SHINGLE_WORDS + 1)
+        )
+    # Prefixed so an ingredient never equals a run of step words
+    found.update(
+        f"\0{dedupe.normalize_name(name)}" for name in ingredient_names
+    )
+    return found
+
+
+def signature(shingle_set: Set[str]) -> Optional[Signature]:
+    """The MinHash signature of a shingle set, None for an empty one"""
+    if not shingle_set:
+        return None
+    hashes = [_hash(shingle) for shingle in shingle_set]
+    # Multiply-shift: the high 32 bits of a*h + b (mod 2**64)
+    return tuple(
+        min(((a * h + b) & _MASK) >> 32 for h in hashes) for a, b in _HASHES
+    )
+
+
+def buckets(sig: Signature) -> List[int]:
+    """The LSH key of each band, as signed 64-bit integers"""
+    keys = []
+    for band in range(BANDS):
+        values = sig[band * ROWS : (band + 1) * ROWS]
+        digest = hashlib.blake2b(
+            struct.pack(f"<I{ROWS}I", band, *values), digest_size=8
+        ).digest()
+        keys.append(int.from_bytes(digest, "little", signed=True))
+    return keys
+
+
+def estimate(a: Signature, b: Signature) -> float:
+    """Estimated Jaccard similarity of the sets behind two signatures"""
+    return sum(x == y for x, y in zip(a, b)) / NUM_HASHES
+
+
+def _load_signatures(recipe_ids: List[int]) -> Dict[int, Signature]:
+    """Signatures computed from the recipes' current steps and ingredients"""
+    steps: Dict[int, List[str]] = defaultdict(list)
+    names: Dict[int, List[str]] = defaultdict(list)
+    for batch in _batches(recipe_ids):
+        for recipe_id, text in Step.objects.filter(
+            recipe_id__in=batch
+        ).values_list("recipe_id", "step"):
+            steps[recipe_id].append(text)
+        for recipe_id, name in RecipeIngredient.objects.filter(
+            recipe_id__in=batch
+        ).values_list("recipe_id", "ingredient__name"):
+            names[recipe_id].append(name)
+    signatures = {}
+    for recipe_id in steps.keys() | names.keys():
+        sig = signature(shingles(steps[recipe_id], names[recipe_id]))
+        if sig:
+            signatures[recipe_id] = sig
+    return signatures
+
+
+def _match(
+    signatures: Dict[int, Signature],
+    keys: Dict[int, List[int]],
+    threshold: float,
+) -> Dict[Tuple[int, int], float]:
+    """(newer id, older id) -> score for indexed recipes above threshold"""
+    members: Dict[int, Set[int]] = defaultdict(set)
+    for batch in _batches(sorted({k for ks in keys.values() for k in ks})):
+        for key, recipe_id in RecipeBucket.objects.filter(
+            bucket__in=batch
+        ).values_list("bucket", "recipe_id"):
+            members[key].add(recipe_id)
+
+    candidates = {
+        recipe_id: set().union(*(members[key] for key in recipe_keys))
+        - {recipe_id}
+        for recipe_id, recipe_keys in keys.items()
+    }
+    known = dict(signatures)
+    others = set().union(*candidates.values()) - known.keys()
+    for batch in _batches(sorted(others)):
+        known.update(
+            (recipe_id, _PACKING.unpack(bytes(packed)))
+            for recipe_id, packed in RecipeSignature.objects.filter(
+                recipe_id__in=batch
+            ).values_list("recipe_id", "signature")
+        )
+
+    pairs = {}
+    for recipe_id, candidate_ids in candidates.items():
+        for other in candidate_ids:
+            pair = (max(recipe_id, other), min(recipe_id, other))
+            if pair in pairs or other not in known:
+                continue
+            score = estimate(known[recipe_id], known[other])
+            if score >= threshold:
+                pairs[pair] = score
+    return pairs
+
+
+def index(
+    recipe_ids: Iterable[int], threshold: Optional[float] = None
+) -> Dict[Tuple[int, int], float]:
+    """
+    (Re)compute the signatures and buckets of ``recipe_ids`` and flag
+    their near-duplicates among every indexed recipe, these included.
+    Returns the flagged pairs as (newer id, older id) -> score.
+    """
+    if threshold is None:
+        threshold = settings.DUPLICATE_RECIPE_THRESHOLD
+    ids = sorted(set(recipe_ids))
+    signatures = _load_signatures(ids)
+    keys = {recipe_id: buckets(sig) for recipe_id, sig in signatures.items()}
+
+    with transaction.atomic():
+        for batch in _batches(ids):
+            RecipeSignature.objects.filter(recipe_id__in=batch).delete()
+            RecipeBucket.objects.filter(recipe_id__in=batch).delete()
+            DuplicateRecipe.objects.filter(
+                Q(recipe_id__in=batch) | Q(duplicate_id__in=batch)
+            ).delete()
+        RecipeSignature.objects.bulk_create(
+            (
+                RecipeSignature(
+                    recipe_id=recipe_id, signature=_PACKING.pack(*sig)
+                )
+                for recipe_id, sig in signatures.items()
+            ),
+            batch_size=1000,
+        )
+        RecipeBucket.objects.bulk_create(
+            (
+                RecipeBucket(recipe_id=recipe_id, bucket=key)
+                for recipe_id, recipe_keys in keys.items()
+                for key in recipe_keys
+            ),
+            batch_size=1000,
+        )
+        pairs = _match(signatures, keys, threshold)
+        DuplicateRecipe.objects.bulk_create(
+            (
+                DuplicateRecipe(
+                    recipe_id=newer, duplicate_id=older, score=score
+                )
+                for (newer, older), score in pairs.items()
+            ),
+            batch_size=1000,
+        )
+    return pairs
+
+
+def flagged(recipe_ids: Iterable[int]) -> Dict[int, List[Dict[str, Any]]]:
+    """
+    recipe id -> [{"id", "name", "score"}] of the recipes flagged as its
+    near-duplicates, newer or older, best first. One query.
+    """
+    ids = set(recipe_ids)
+    rows = DuplicateRecipe.objects.filter(
+        Q(recipe_id__in=ids) | Q(duplicate_id__in=ids)
+    ).values_list(
+        "recipe_id", "recipe__name", "duplicate_id", "duplicate__name", "score"
+    )
+    found: Dict[int, List[Dict[str, Any]]] = defaultdict(list)
+    for recipe_id, recipe_name, duplicate_id, duplicate_name, score in rows:
+        for this, other, name in (
+            (recipe_id, duplicate_id, duplicate_name),
+            (duplicate_id, recipe_id, recipe_name),
+        ):
+            if this in ids:
+                found[this].append(
+                    {"id": other, "name": name, "score": round(score, 4)}
+                )
+    for duplicates in found.values():
+        duplicates.sort(key=lambda item: (-item["score"], item["id"]))
+    return dict(found)
+
+
+_local = threading.local()
+
+
+def _flush() -> None:
+    ids = getattr(_local, "pending", None)
+    _local.pending = set()
+    if not ids:
+        return
+    try:
+        pairs = index(ids)
+    except Exception as e:
+        logger.error(f"Duplicate recipe indexing failed: {e}")
+        return
+    for newer, older in pairs:
+        logger.info(f"Recipe {newer} looks like a duplicate of {older}")
+
+
+def index_on_commit(recipe_ids: Iterable[int]) -> None:
+    """
+    Index recipes once the current transaction commits. Recipes written in
+    the same transaction are indexed together by the first callback; ids
+    left over from a rolled back one are indexed (as missing) with the next.
+    """
+    pending = getattr(_local, "pending", None)
+    if pending is None:
+        pending = _local.pending = set()
+    pending.update(recipe_ids)
+    transaction.on_commit(_flush)
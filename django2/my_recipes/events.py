@@ -0,0 +1,117 @@
+"""
+Live recipe change notifications for the server-sent events stream.
+
+Committed recipe writes are published to an in-process broker that fans
+them out to every stream connected to this worker. Each stream has its own
+bounded buffer: a client that stops reading overflows only its own buffer,
+and is told to resync through the delta sync feed (my_recipes.sync)
+instead of holding an ever-growing backlog in memory.
+
+Writes are published from whichever thread committed them; each
+subscription is woken on its own event loop with call_soon_threadsafe.
+Other workers' writes don't reach this broker, so streams also poll the
+RecipeChange log every SSE_POLL_SECONDS (see async_views.recipe_events).
+"""
+
+import asyncio
+import threading
+from collections import deque
+from logging import getLogger
+from typing import Any, Dict, Iterable, List, Optional
+
+from django.db import transaction
+
+from .models import RecipeChange
+
+logger = getLogger(__name__)
+
+
+def change_event(seq: int, recipe_id: int, action: str) -> Dict[str, Any]:
+    """The notification sent to clients; the change seq is the version"""
+    return {"id": recipe_id, "version": seq, "action": action}
+
+
+class Subscription:
+    """One stream's buffer of pending events, read on its own event loop"""
+
+    def __init__(self, loop: asyncio.AbstractEventLoop, max_events: int):
+        self.loop = loop
+        self.max_events = max_events
+        self.overflowed = False
+        self._events: deque = deque()
+        self._ready = asyncio.Event()
+
+    def push(self, event: Dict[str, Any]) -> None:
+        # Runs on self.loop, so no locking is needed
+        if len(self._events) >= self.max_events:
+            self._events.clear()
+            self.overflowed = True
+        elif not self.overflowed:
+            self._events.append(event)
+        self._ready.set()
+
+    async def get(self, timeout: float) -> List[Dict[str, Any]]:
+        """Pending events, waiting up to ``timeout`` seconds for the first"""
+        try:
+            await asyncio.wait_for(self._ready.wait(), timeout)
+        except asyncio.TimeoutError:
+            return []
+        self._ready.clear()
+        events = list(self._events)
+        self._events.clear()
+        return events
+
+
+class ChangeBroker:
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._subscriptions: set = set()
+
+    def subscribe(
+        self, max_events: int, max_subscriptions: int
+    ) -> Optional[Subscription]:
+        """A new subscription, or None when the worker is at capacity"""
+        subscription = Subscription(asyncio.get_running_loop(), max_events)
+        with self._lock:
+            if len(self._subscriptions) >= max_subscriptions:
+                return None
+            self._subscriptions.add(subscription)
+        return subscription
+
+    def unsubscribe(self, subscription: Subscription) -> None:
+        with self._lock:
+            self._subscriptions.discard(subscription)
+
+    def publish(self, event: Dict[str, Any]) -> None:
+        with self._lock:
+            subscriptions = list(self._subscriptions)
+        for subscription in subscriptions:
+            try:
+                subscription.loop.call_soon_threadsafe(subscription.push, event)
+            except RuntimeError:
+                # Its event loop has shut down
+                self.unsubscribe(subscription)
+
+    def __len__(self) -> int:
+        return len(self._subscriptions)
+
+
+broker = ChangeBroker()
+
+
+def publish_on_commit(changes: Iterable[RecipeChange]) -> None:
+    """Publish change log rows once the transaction that wrote them commits"""
+    events = [
+        change_event(change.seq, change.recipe_id, change.action)
+        for change in changes
+        if change.seq is not None
+    ]
+    if not events:
+        return
+
+    def publish():
+        for event in events:
+            broker.publish(event)
+        logger.debug(f"Published {len(events)} recipe changes")
+
+    transaction.on_commit(publish)
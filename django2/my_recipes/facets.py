@@ -0,0 +1,38 @@
+"""
+Facet counts for a filtered recipe list: how many of the matching recipes
+use each ingredient, so a search UI can show what else narrowing by an
+ingredient would leave (and hide the choices that would leave nothing).
+
+All counts come from one grouped query, with the filtered recipe queryset
+as a subquery, however many ingredients there are.
+"""
+
+from typing import Any, Dict, List
+
+from django.db.models import Count, QuerySet
+
+from .models import RecipeIngredient
+
+
+def ingredient_counts(recipes: QuerySet) -> List[Dict[str, Any]]:
+    """
+    [{"id", "name", "count"}] for every ingredient used by at least one
+    recipe in ``recipes``, most used first.
+    """
+    rows = (
+        RecipeIngredient.objects.filter(
+            recipe_id__in=recipes.order_by().values("pk")
+        )
+        .values("ingredient_id", "ingredient__name")
+        # A recipe can list an ingredient twice (e.g. in two components)
+        .annotate(count=Count("recipe_id", distinct=True))
+        .order_by("-count", "ingredient__name")
+    )
+    return [
+        {
+            "id": row["ingredient_id"],
+            "name": row["ingredient__name"],
+            "count": row["count"],
+        }
+        for row in rows
+    ]
@@ -0,0 +1,98 @@
+"""
+Cache of filtered recipe id lists.
+
+The same ingredient combinations and searches come up again and again, and
+each one joins RecipeIngredient once per selected ingredient. The list
+endpoint instead looks the ordered ids of the whole filtered set up here,
+keyed on the sorted ingredient ids, the search term and the ordering, and
+only loads the recipes of the page it serves.
+
+Entries are stamped with the library version, the newest RecipeChange seq
+(my_recipes.sync.latest_seq): any write anywhere raises it, and an entry
+from an older version is never served. Reading it is one indexed MAX, and
+it is shared by every worker. A transaction that commits late can land
+behind a seq already read (see my_recipes.sync), so entries also expire
+after FILTER_CACHE_TTL seconds.
+"""
+
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Dict, Hashable, List, Optional, Tuple
+
+from django.conf import settings
+
+
+class FilterCache:
+    """Thread-safe TTL + LRU cache of recipe id lists, with hit statistics"""
+
+    def __init__(self, ttl: float, max_size: int, max_ids: int) -> None:
+        self.ttl = ttl
+        self.max_size = max_size
+        # Longer results aren't worth the memory
+        self.max_ids = max_ids
+        self._lock = threading.Lock()
+        self._entries: "OrderedDict[Hashable, tuple]" = OrderedDict()
+        self.hits = self.misses = self.stale = 0
+
+    def get(self, key: Hashable, version: int) -> Optional[List[int]]:
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                expires_at, entry_version, ids = entry
+                if entry_version == version and expires_at >= time.monotonic():
+                    self._entries.move_to_end(key)
+                    self.hits += 1
+                    return ids
+                del self._entries[key]
+                self.stale += 1
+            self.misses += 1
+            return None
+
+    def set(self, key: Hashable, version: int, ids: List[int]) -> None:
+        if len(ids) > self.max_ids:
+            return
+        with self._lock:
+            self._entries[key] = (time.monotonic() + self.ttl, version, ids)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_size:
+                self._entries.popitem(last=False)
+
+    def clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "hits": self.hits,
+                "misses": self.misses,
+                # Misses because the library changed or the entry expired
+                "stale": self.stale,
+                "hit_rate": round(self.hits / lookups, 4) if lookups else None,
+                "entries": len(self._entries),
+                "max_entries": self.max_size,
+            }
+
+
+filter_cache = FilterCache(
+    ttl=settings.FILTER_CACHE_TTL,
+    max_size=settings.FILTER_CACHE_SIZE,
+    max_ids=settings.FILTER_CACHE_MAX_IDS,
+)
+
+
+def cache_key(params: Any) -> Optional[Tuple]:
+    """
+    (ingredient ids, search, ordering) from list query parameters, or None
+    when an ingredient id isn't a number (the filter reports that).
+    """
+    ingredients = params.getlist("ingredients")
+    if not all(value.isdigit() for value in ingredients):
+        return None
+    return (
+        tuple(sorted({int(value) for value in ingredients})),
+        " ".join(params.get("search", "").lower().split()),
+        params.get("ordering", "").replace(" ", ""),
+    )
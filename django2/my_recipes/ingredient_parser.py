@@ -0,0 +1,214 @@
+"""
+Ingredient line parser.
+
+Turns free text such as "1 1/2 cups flour, sifted" or "½ tsp salt" into
+IngredientInputSerializer fields (name, amount, unit) plus the extras a
+client may want to show: the upper bound of a range and a preparation note.
+
+The whole grammar is a single regular expression compiled at import time
+from the unit alias table below, so parsing a line is one match and a few
+dictionary lookups. Standard library only.
+"""
+
+import re
+from decimal import ROUND_HALF_UP, Decimal, InvalidOperation
+from typing import Any, Dict, Iterable, List, Optional
+
+# Canonical unit -> spellings accepted for it (matched case-insensitively,
+# except CASE_SENSITIVE_UNITS). Plurals are listed rather than derived so
+# "cs" or "tspss" don't become units by accident.
+UNIT_ALIASES: Dict[str, List[str]] = {
+    "tsp": ["tsp", "tsps", "teaspoon", "teaspoons", "tspn"],
+    "tbsp": [
+        "tbsp",
+        "tbsps",
+        "tbs",
+        "tbl",
+        "tablespoon",
+        "tablespoons",
+    ],
+    "cup": ["cup", "cups", "c"],
+    "fl oz": ["fl oz", "fl. oz", "fluid ounce", "fluid ounces"],
+    "pint": ["pint", "pints", "pt", "pts"],
+    "quart": ["quart", "quarts", "qt", "qts"],
+    "gallon": ["gallon", "gallons", "gal"],
+    "ml": [
+        "ml",
+        "mls",
+        "millilitre",
+        "millilitres",
+        "milliliter",
+        "milliliters",
+    ],
+    "l": ["l", "litre", "litres", "liter", "liters"],
+    "oz": ["oz", "ozs", "ounce", "ounces"],
+    "lb": ["lb", "lbs", "pound", "pounds"],
+    "mg": ["mg", "milligram", "milligrams"],
+    "g": ["g", "gr", "gram", "grams", "gramme", "grammes"],
+    "kg": ["kg", "kgs", "kilo", "kilos", "kilogram", "kilograms"],
+    "pinch": ["pinch", "pinches"],
+    "dash": ["dash", "dashes"],
+    "clove": ["clove", "cloves"],
+    "can": ["can", "cans", "tin", "tins"],
+    "jar": ["jar", "jars"],
+    "package": ["package", "packages", "pkg", "packet", "packets"],
+    "stick": ["stick", "sticks"],
+    "slice": ["slice", "slices"],
+    "bunch": ["bunch", "bunches"],
+    "sprig": ["sprig", "sprigs"],
+    "head": ["head", "heads"],
+    "handful": ["handful", "handfuls"],
+    "piece": ["piece", "pieces", "pc", "pcs"],
+}
+
+# Cookbook shorthand where case carries the meaning: 1 T vs 1 t
+CASE_SENSITIVE_UNITS = {"T": "tbsp", "t": "tsp"}
+
+NUMBER_WORDS = {
+    "a": 1,
+    "an": 1,
+    "one": 1,
+    "two": 2,
+    "three": 3,
+    "four": 4,
+    "five": 5,
+    "six": 6,
+    "seven": 7,
+    "eight": 8,
+    "nine": 9,
+    "ten": 10,
+    "eleven": 11,
+    "twelve": 12,
+    "dozen": 12,
+}
+
+VULGAR_FRACTIONS = {
+    "½": "1/2",
+    "⅓": "1/3",
+    "⅔": "2/3",
+    "¼": "1/4",
+    "¾": "3/4",
+    "⅕": "1/5",
+    "⅖": "2/5",
+    "⅗": "3/5",
+    "⅘": "4/5",
+    "⅙": "1/6",
+    "⅚": "5/6",
+    "⅛": "1/8",
+    "⅜": "3/8",
+    "⅝": "5/8",
+    "⅞": "7/8",
+}
+
+_UNIT_LOOKUP = {
+    alias.lower(): unit
+    for unit, aliases in UNIT_ALIASES.items()
+    for alias in aliases
+}
+
+
+def _alternation(words: Iterable[str]) -> str:
+    # Longest first so "tbsp" wins over "t" and "fl oz" over "fl"
+    ordered = sorted(set(words), key=len, reverse=True)
+    return "|".join(re.escape(word).replace(r"\ ", r"\s+") for word in ordered)
+
+
+_QUANTITY = (
+    r"(?:\d+(?:\s+|-)\d+\s*/\s*\d+"  # mixed number: 1 1/2, 1-1/2
+    r"|\d+\s*/\s*\d+"  # fraction: 3/4
+    r"|\d{1,3}(?:,\d{3})+(?:\.\d+)?(?!\d)"  # thousands: 1,000 or 1,250.5
+    r"|\d*\.\d+|\d+"  # decimal or integer
+    rf"|(?:{_alternation(NUMBER_WORDS)})(?=\s))"  # a, one, dozen
+)
+
+GRAMMAR = re.compile(
+    rf"^\s*(?:(?P<low>{_QUANTITY})"
+    rf"(?:\s*(?:-|–|—|to|or)\s*(?P<high>{_QUANTITY}))?)?"
+    r"(?:\s*\((?P<size>[^)]*)\))?"  # 2 (14 oz) cans
+    rf"(?:\s*(?P<unit>{_alternation(_UNIT_LOOKUP)}"
+    rf"|{_alternation(CASE_SENSITIVE_UNITS)})\.?(?=[\s,]|$))?"
+    r"(?:\s+of\b)?"
+    r"\s*(?P<rest>.*?)\s*$",
+    re.IGNORECASE,
+)
+
+_FRACTION_GLYPHS = re.compile("|".join(VULGAR_FRACTIONS))
+_CENT = Decimal("0.01")
+
+
+def _normalize(line: str) -> str:
+    # "1½" -> "1 1/2"; U+2044 FRACTION SLASH -> "/"
+    line = _FRACTION_GLYPHS.sub(
+        lambda match: f" {VULGAR_FRACTIONS[match.group()]}", line
+    )
+    return line.replace("⁄", "/")
+
+
+def parse_quantity(text: str) -> Optional[Decimal]:
+    """'1 1/2', '1-1/2', '3/4', '.5', '1,000', 'a' -> Decimal, or None"""
+    word = NUMBER_WORDS.get(text.lower())
+    if word is not None:
+        return Decimal(word).quantize(_CENT, ROUND_HALF_UP)
+    text = re.sub(r"\s*/\s*", "/", text.strip())
+    text = re.sub(r"(?<=\d),(?=\d{3})", "", text)
+    total = Decimal(0)
+    try:
+        for part in re.split(r"\s+|-(?=\d+/)", text):
+            if "/" in part:
+                numerator, denominator = part.split("/")
+                total += Decimal(numerator) / Decimal(denominator)
+            else:
+                total += Decimal(part)
+        return total.quantize(_CENT, ROUND_HALF_UP)
+    except (InvalidOperation, ZeroDivisionError, ValueError):
+        # Includes amounts too long to quantize
+        return None
+
+
+def _format(amount: Optional[Decimal]) -> Optional[str]:
+    return None if amount is None else str(amount)
+
+
+def parse(line: str) -> Optional[Dict[str, Any]]:
+    """
+    Parse one ingredient line.
+
+    Returns None for blank lines. ``amount`` is None when the line has no
+    quantity ("salt to taste"); for ranges ("2-3 cloves") it is the lower
+    bound and ``amount_max`` the upper one. ``unit`` is the canonical unit
+    from UNIT_ALIASES, or "" for countable ingredients ("2 eggs").
+    """
+    if not line or not line.strip():
+        return None
+    match = GRAMMAR.match(_normalize(line))
+
+    low = high = None
+    if match["low"]:
+        low = parse_quantity(match["low"])
+        if match["high"]:
+            high = parse_quantity(match["high"])
+        if low is not None and high is not None and high < low:
+            # "2 to 1 cups": written backwards
+            low, high = high, low
+
+    unit = ""
+    if match["unit"]:
+        raw_unit = re.sub(r"\s+", " ", match["unit"])
+        unit = CASE_SENSITIVE_UNITS.get(raw_unit) or _UNIT_LOOKUP.get(
+            raw_unit.lower(), ""
+        )
+
+    name, _, note = match["rest"].partition(",")
+    notes = [part for part in (match["size"], note.strip()) if part]
+    return {
+        "name": name.strip(" .;:"),
+        "amount": _format(low),
+        "amount_max": _format(high),
+        "unit": unit,
+        "note": ", ".join(notes),
+    }
+
+
+def parse_many(lines: Iterable[str]) -> List[Optional[Dict[str, Any]]]:
+    """Parse a batch of lines, keeping their order"""
+    return [parse(line) for line in lines]
@@ -8,7 +8,7 @@ from my_recipes.backup import RecipeBackup
 
 
 class Command(BaseCommand):
-    help = "Backup recipes to a JSON file"
+    help = "Backup recipes to the backup store, or to a JSON file"
 
     def add_arguments(self, parser: Any) -> None:
         parser.add_argument(
@@ -20,7 +20,7 @@ class Command(BaseCommand):
         parser.add_argument(
             "--output",
             type=str,
-            help="Path to output JSON file. If not specified, creates a timestamped file.",
+            help="Path to output JSON file. If not specified, the backup goes to the backup store under MEDIA_ROOT.",
         )
 
     def handle(self, *args: Any, **options: Any) -> None:
@@ -0,0 +1,104 @@
+"""Management command to prepare the database before the server starts."""
+
+import os
+import time
+from contextlib import contextmanager
+from typing import Any, List, Tuple
+
+from django.contrib.auth import get_user_model
+from django.core.management import call_command
+from django.core.management.base import BaseCommand, CommandError
+from django.db import DEFAULT_DB_ALIAS, OperationalError, connections
+from django.db.migrations.executor import MigrationExecutor
+
+
+class Command(BaseCommand):
+    help = (
+        "Wait for the database, apply pending migrations and ensure the "
+        "superuser exists, reporting how long each startup phase took"
+    )
+
+    def add_arguments(self, parser: Any) -> None:
+        parser.add_argument(
+            "--timeout",
+            type=int,
+            default=60,
+            help="Seconds to wait for the database to accept connections",
+        )
+        parser.add_argument(
+            "--database",
+            default=DEFAULT_DB_ALIAS,
+            help="Database alias to bootstrap",
+        )
+
+    def handle(self, *args: Any, **options: Any) -> None:
+        self.phases: List[Tuple[str, float]] = []
+        connection = connections[options["database"]]
+        started = time.perf_counter()
+
+        with self.phase("wait for database"):
+            self.wait_for_database(connection, options["timeout"])
+
+        with self.phase("check migrations"):
+            executor = MigrationExecutor(connection)
+            plan = executor.migration_plan(
+                executor.loader.graph.leaf_nodes()
+            )
+
+        if plan:
+            self.stdout.write(f"{len(plan)} pending migration(s)")
+            with self.phase("migrate"):
+                call_command(
+                    "migrate",
+                    database=options["database"],
+                    interactive=False,
+                    verbosity=1,
+                )
+        else:
+            self.stdout.write("No pending migrations, skipping migrate")
+
+        with self.phase("ensure superuser"):
+            self.ensure_superuser()
+
+        for name, elapsed in self.phases:
+            self.stdout.write(f"  {name:<20} {elapsed * 1000:8.1f}ms")
+        self.stdout.write(
+            self.style.SUCCESS(
+                f"Bootstrap completed in {time.perf_counter() - started:.2f}s"
+            )
+        )
+
+    @contextmanager
+    def phase(self, name: str):
+        started = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.phases.append((name, time.perf_counter() - started))
+
+    def wait_for_database(self, connection, timeout: int) -> None:
+        deadline = time.monotonic() + timeout
+        attempt = 0
+        while True:
+            attempt += 1
+            try:
+                connection.ensure_connection()
+                return
+            except OperationalError as e:
+                if time.monotonic() >= deadline:
+                    raise CommandError(
+                        f"Database unavailable after {timeout}s: {e}"
+                    )
+                self.stdout.write(f"Waiting for database... attempt {attempt}")
+                time.sleep(1)
+
+    def ensure_superuser(self) -> None:
+        User = get_user_model()
+        username = os.getenv("DJ_SUPERUSER", "admin")
+        password = os.getenv("DJ_PASSWORD", "admin")
+
+        if User.objects.filter(username=username).exists():
+            self.stdout.write(f"Superuser '{username}' already exists")
+            return
+        User.objects.create_superuser(username, "admin@example.com", password)
+        self.stdout.write(f"Superuser '{username}' created successfully")
@@ -0,0 +1,66 @@
+"""Management command to find and merge near-duplicate ingredients."""
+
+import time
+from typing import Any
+
+from django.core.management.base import BaseCommand, CommandError
+
+from my_recipes import dedupe
+
+
+class Command(BaseCommand):
+    help = (
+        'Propose merge groups of near-duplicate ingredient names ("Onion", '
+        '"onions", "mozarella"/"mozzarella") and, with --apply, merge each '
+        "into its most used name"
+    )
+
+    def add_arguments(self, parser: Any) -> None:
+        parser.add_argument(
+            "--threshold",
+            type=float,
+            default=dedupe.DEFAULT_THRESHOLD,
+            help="Trigram Jaccard similarity (0-1] for spelling variants; "
+            "1 only merges names that normalize to the same text",
+        )
+        parser.add_argument(
+            "--apply",
+            action="store_true",
+            help="Merge the proposed groups (default: only list them)",
+        )
+
+    def handle(self, *args: Any, **options: Any) -> None:
+        threshold = options["threshold"]
+        if not 0 < threshold <= 1:
+            raise CommandError("--threshold must be above 0 and at most 1")
+
+        started = time.perf_counter()
+        names, usage = dedupe.load_vocabulary()
+        groups = dedupe.find_groups(names, usage, threshold)
+        elapsed_ms = (time.perf_counter() - started) * 1000
+
+        for group in groups:
+            duplicates = ", ".join(
+                f"{names[i]!r} ({usage.get(i, 0)})" for i in group.duplicates
+            )
+            self.stdout.write(
+                f"{names[group.canonical]!r} "
+                f"({usage.get(group.canonical, 0)}) <- {duplicates}"
+            )
+        duplicate_count = sum(len(group.duplicates) for group in groups)
+        self.stdout.write(
+            f"{len(groups)} groups, {duplicate_count} duplicates among "
+            f"{len(names)} ingredients ({elapsed_ms:.0f}ms)"
+        )
+
+        if not options["apply"]:
+            if groups:
+                self.stdout.write("Run again with --apply to merge them")
+            return
+        repointed, deleted = dedupe.merge(groups)
+        self.stdout.write(
+            self.style.SUCCESS(
+                f"Merged {deleted} ingredients, repointed {repointed} "
+                "recipe ingredients"
+            )
+        )
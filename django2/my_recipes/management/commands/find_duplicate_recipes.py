@@ -0,0 +1,62 @@
+"""Management command to report near-duplicate recipes."""
+
+import time
+from typing import Any
+
+from django.core.management.base import BaseCommand, CommandError
+
+from my_recipes import duplicates
+from my_recipes.models import DuplicateRecipe, Recipe
+
+
+class Command(BaseCommand):
+    help = (
+        "List the recipes flagged as near-duplicates of each other, "
+        "indexing any recipe that has no signature yet (e.g. after "
+        "migrating)"
+    )
+
+    def add_arguments(self, parser: Any) -> None:
+        parser.add_argument(
+            "--reindex",
+            action="store_true",
+            help="Recompute every signature and flag, not only missing ones",
+        )
+        parser.add_argument(
+            "--threshold",
+            type=float,
+            default=None,
+            help="Least estimated similarity (0-1] to flag while indexing "
+            "(default: DUPLICATE_RECIPE_THRESHOLD)",
+        )
+
+    def handle(self, *args: Any, **options: Any) -> None:
+        threshold = options["threshold"]
+        if threshold is not None and not 0 < threshold <= 1:
+            raise CommandError("--threshold must be above 0 and at most 1")
+
+        started = time.perf_counter()
+        recipes = Recipe.objects.all()
+        if not options["reindex"]:
+            recipes = recipes.filter(signature__isnull=True)
+        recipe_ids = list(recipes.values_list("id", flat=True))
+        if recipe_ids:
+            duplicates.index(recipe_ids, threshold)
+            self.stdout.write(
+                f"Indexed {len(recipe_ids)} recipes in "
+                f"{(time.perf_counter() - started) * 1000:.0f}ms"
+            )
+
+        pairs = DuplicateRecipe.objects.select_related(
+            "recipe", "duplicate"
+        ).order_by("-score", "recipe_id")
+        count = 0
+        for pair in pairs:
+            count += 1
+            self.stdout.write(
+                f"{pair.score:.2f}  '{pair.recipe.name}' (#{pair.recipe_id})"
+                f" ~ '{pair.duplicate.name}' (#{pair.duplicate_id})"
+            )
+        self.stdout.write(
+            self.style.SUCCESS(f"{count} near-duplicate pairs flagged")
+        )
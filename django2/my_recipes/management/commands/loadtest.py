@@ -0,0 +1,167 @@
+"""Management command to load test a running API server."""
+
+import json
+import statistics
+import time
+from concurrent.futures import ThreadPoolExecutor
+from http.client import HTTPConnection, HTTPException, HTTPSConnection
+from typing import Any, Dict, List, Optional
+from urllib.parse import urlsplit
+
+from django.core.management.base import BaseCommand, CommandError
+
+
+class Command(BaseCommand):
+    help = (
+        "Fire concurrent GET requests at a running server and report "
+        "requests/sec and latency percentiles. Run it against runserver and "
+        "gunicorn to compare serving profiles."
+    )
+
+    def add_arguments(self, parser: Any) -> None:
+        parser.add_argument(
+            "--url",
+            type=str,
+            default="http://localhost:8000/api/recipes/",
+            help="URL to request (default: recipe list endpoint)",
+        )
+        parser.add_argument(
+            "--requests",
+            type=int,
+            default=500,
+            help="Total number of requests to send",
+        )
+        parser.add_argument(
+            "--concurrency",
+            type=int,
+            default=10,
+            help="Number of concurrent client connections",
+        )
+        parser.add_argument(
+            "--username",
+            type=str,
+            help="Obtain a JWT for this user before the run",
+        )
+        parser.add_argument(
+            "--password",
+            type=str,
+            help="Password used with --username",
+        )
+
+    def handle(self, *args: Any, **options: Any) -> None:
+        url = urlsplit(options["url"])
+        if url.scheme not in ("http", "https"):
+            raise CommandError(f"Unsupported URL: {options['url']}")
+
+        headers = {}
+        if options.get("username"):
+            token = self._get_token(
+                url, options["username"], options.get("password") or ""
+            )
+            headers["Authorization"] = f"Bearer {token}"
+
+        total = options["requests"]
+        concurrency = max(1, min(options["concurrency"], total))
+        path = url.path + (f"?{url.query}" if url.query else "")
+        # Spread the requests evenly over one keep-alive connection per client
+        per_client = [
+            total // concurrency + (1 if i < total % concurrency else 0)
+            for i in range(concurrency)
+        ]
+
+        started = time.perf_counter()
+        with ThreadPoolExecutor(max_workers=concurrency) as pool:
+            results = list(
+                pool.map(
+                    lambda count: self._run_client(url, path, headers, count),
+                    per_client,
+                )
+            )
+        elapsed = time.perf_counter() - started
+
+        latencies = [lat for client in results for lat in client["latencies"]]
+        errors = sum(client["errors"] for client in results)
+        succeeded = sum(client["succeeded"] for client in results)
+        self._report(total, errors, succeeded, elapsed, latencies)
+
+    @staticmethod
+    def _connect(url):
+        connection_class = (
+            HTTPSConnection if url.scheme == "https" else HTTPConnection
+        )
+        return connection_class(url.hostname, url.port, timeout=30)
+
+    def _get_token(self, url, username: str, password: str) -> str:
+        connection = self._connect(url)
+        body = json.dumps({"username": username, "password": password})
+        connection.request(
+            "POST",
+            "/api/token/",
+            body=body,
+            headers={"Content-Type": "application/json"},
+        )
+        response = connection.getresponse()
+        payload = response.read()
+        connection.close()
+        if response.status != 200:
+            raise CommandError(f"Could not obtain token: {payload[:200]!r}")
+        return json.loads(payload)["access"]
+
+    def _run_client(
+        self, url, path: str, headers: Dict[str, str], count: int
+    ) -> Dict[str, Any]:
+        latencies: List[float] = []
+        errors = succeeded = 0
+        connection: Optional[HTTPConnection] = None
+        for _ in range(count):
+            if connection is None:
+                connection = self._connect(url)
+            started = time.perf_counter()
+            try:
+                connection.request("GET", path, headers=headers)
+                response = connection.getresponse()
+                response.read()
+                if response.status >= 400:
+                    errors += 1
+                else:
+                    succeeded += 1
+                if response.getheader("Connection", "").lower() == "close":
+                    connection.close()
+                    connection = None
+            # HTTPException: e.g. RemoteDisconnected from an overloaded server
+            except (OSError, HTTPException):
+                errors += 1
+                connection.close()
+                connection = None
+                continue
+            latencies.append(time.perf_counter() - started)
+        if connection is not None:
+            connection.close()
+        return {
+            "latencies": latencies,
+            "errors": errors,
+            "succeeded": succeeded,
+        }
+
+    def _report(
+        self,
+        total: int,
+        errors: int,
+        succeeded: int,
+        elapsed: float,
+        latencies: List[float],
+    ) -> None:
+        self.stdout.write(f"Requests:     {total} ({errors} errors)")
+        self.stdout.write(f"Elapsed:      {elapsed:.2f}s")
+        # Successful responses only: fast failures would inflate it
+        self.stdout.write(
+            self.style.SUCCESS(f"Requests/sec: {succeeded / elapsed:.1f}")
+        )
+        if len(latencies) >= 2:
+            cuts = statistics.quantiles(latencies, n=100, method="inclusive")
+            self.stdout.write(
+                f"Latency ms:   p50={cuts[49] * 1000:.1f} "
+                f"p95={cuts[94] * 1000:.1f} "
+                f"p99={cuts[98] * 1000:.1f} "
+                f"max={max(latencies) * 1000:.1f}"
+            )
@@ -0,0 +1,197 @@
+"""Management command to benchmark the OCR import pipeline."""
+
+import io
+import json
+import tempfile
+import textwrap
+import time
+from concurrent.futures import ProcessPoolExecutor
+from multiprocessing import get_context
+from pathlib import Path
+from typing import Any, Dict, List
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from PIL import Image, ImageDraw, ImageFont
+
+from my_recipes import ocr
+
+SAMPLES = Path(__file__).resolve().parents[2] / "fixtures" / "ocr_samples.json"
+
+PAGE_WIDTH = 1200
+MARGIN = 60
+FONT_SIZE = 28
+LINE_HEIGHT = 40
+
+
+def render_sample(sample: Dict[str, Any], variant: int = 0) -> bytes:
+    """
+    Typeset a fixture recipe as a page image: title across the top, then
+    either ingredients and directions side by side ("two_column") or stacked
+    ("single"), rotated by the sample's skew like a hand-held photo.
+    """
+    try:
+        font = ImageFont.load_default(size=FONT_SIZE)
+        title_font = ImageFont.load_default(size=FONT_SIZE + 12)
+    except TypeError:
+        # Pillow without FreeType: fixed bitmap font
+        font = title_font = ImageFont.load_default()
+
+    two_column = sample["layout"] == "two_column"
+    column_width = (PAGE_WIDTH - 3 * MARGIN) // 2 if two_column else None
+    wrap = 30 if two_column else 60
+
+    ingredients = ["Ingredients"] + sample["ingredients"]
+    directions = ["Directions"] + [
+        wrapped
+        for step in sample["steps"]
+        for wrapped in textwrap.wrap(step, wrap)
+    ]
+    if two_column:
+        body_lines = max(len(ingredients), len(directions))
+    else:
+        body_lines = len(ingredients) + len(directions) + 1
+    height = MARGIN * 3 + LINE_HEIGHT * 2 + body_lines * LINE_HEIGHT
+
+    page = Image.new("L", (PAGE_WIDTH, height), 255)
+    draw = ImageDraw.Draw(page)
+    draw.text((MARGIN, MARGIN), sample["name"], font=title_font, fill=0)
+    top = MARGIN * 2 + LINE_HEIGHT * 2
+
+    def draw_lines(x: int, y: int, lines: List[str]) -> int:
+        for line in lines:
+            draw.text((x, y), line, font=font, fill=0)
+            y += LINE_HEIGHT
+        return y
+
+    if two_column:
+        draw_lines(MARGIN, top, ingredients)
+        draw_lines(MARGIN * 2 + column_width, top, directions)
+    else:
+        y = draw_lines(MARGIN, top, ingredients)
+        draw_lines(MARGIN, y + LINE_HEIGHT, directions)
+
+    # Make every variant a distinct image (and cache key)
+    page.putpixel((variant % PAGE_WIDTH, height - 1), 254)
+    page = page.rotate(-sample["skew"], expand=True, fillcolor=255)
+    buffer = io.BytesIO()
+    page.save(buffer, format="PNG")
+    return buffer.getvalue()
+
+
+class Command(BaseCommand):
+    help = (
+        "Benchmark OCR import throughput on the bundled sample recipes: "
+        "single process vs the worker pool, and cached re-uploads"
+    )
+
+    def add_arguments(self, parser: Any) -> None:
+        parser.add_argument(
+            "--workers",
+            type=int,
+            default=getattr(settings, "OCR_WORKERS", 2),
+            help="Worker processes in the pool",
+        )
+        parser.add_argument(
+            "--copies",
+            type=int,
+            default=4,
+            help="Distinct renderings of every sample recipe",
+        )
+        parser.add_argument(
+            "--preprocess-only",
+            action="store_true",
+            help="Skip Tesseract; time preprocessing and layout only",
+        )
+        parser.add_argument(
+            "--save",
+            type=str,
+            help="Directory to write the rendered sample images to",
+        )
+
+    def handle(self, *args: Any, **options: Any) -> None:
+        samples = json.loads(SAMPLES.read_text())
+        images = [
+            render_sample(sample, variant)
+            for variant in range(options["copies"])
+            for sample in samples
+        ]
+        if options.get("save"):
+            out = Path(options["save"])
+            out.mkdir(parents=True, exist_ok=True)
+            for index, data in enumerate(images[: len(samples)]):
+                (out / f"sample_{index}.png").write_bytes(data)
+            self.stdout.write(f"Saved {len(samples)} sample images to {out}")
+
+        recognize = not options["preprocess_only"]
+        self.stdout.write(
+            f"{len(images)} images ({len(samples)} samples x "
+            f"{options['copies']}), Tesseract "
+            f"{'on' if recognize else 'off'}"
+        )
+
+        started = time.perf_counter()
+        results = [ocr.ocr_image(data, recognize) for data in images]
+        self.report("single process", len(images), started)
+
+        started = time.perf_counter()
+        with ProcessPoolExecutor(
+            max_workers=options["workers"], mp_context=get_context("spawn")
+        ) as pool:
+            list(pool.map(ocr.ocr_image, images, [recognize] * len(images)))
+        self.report(
+            f"pool ({options['workers']} workers)", len(images), started
+        )
+
+        if recognize:
+            with tempfile.TemporaryDirectory() as cache_dir:
+                for data in images:
+                    ocr.process_image(data, cache_dir)
+                started = time.perf_counter()
+                for data in images:
+                    ocr.process_image(data, cache_dir)
+                self.report("cached re-upload", len(images), started)
+            self.report_accuracy(samples, results[: len(samples)])
+
+        for phase in ("preprocess_ms", "layout_ms", "ocr_ms"):
+            values = [result["timings"][phase] for result in results]
+            self.stdout.write(
+                f"  avg {phase:<14} {sum(values) / len(values):8.1f}"
+            )
+        detected = [result["columns"] for result in results[: len(samples)]]
+        expected = [2 if s["layout"] == "two_column" else 1 for s in samples]
+        self.stdout.write(
+            f"  column detection {sum(d == e for d, e in zip(detected, expected))}"
+            f"/{len(samples)} correct"
+        )
+
+    def report(self, label: str, count: int, started: float) -> None:
+        elapsed = time.perf_counter() - started
+        self.stdout.write(
+            self.style.SUCCESS(
+                f"{label:<24} {count / elapsed:8.2f} images/sec "
+                f"({elapsed:.2f}s)"
+            )
+        )
+
+    def report_accuracy(self, samples, results) -> None:
+        """Share of fixture ingredient lines recovered exactly in the draft"""
+        found = total = 0
+        for sample, result in zip(samples, results):
+            draft = ocr.text_to_draft(result["text"])
+            parsed = {
+                (i["name"].lower(), i["amount"], i["unit"].lower())
+                for i in draft["ingredients"]
+            }
+            for line in sample["ingredients"]:
+                expected = ocr.parse_ingredient_line(line)
+                total += 1
+                found += (
+                    expected["name"].lower(),
+                    expected["amount"],
+                    expected["unit"].lower(),
+                ) in parsed
+        self.stdout.write(
+            f"  ingredient lines recovered {found}/{total} "
+            f"({100 * found / total:.0f}%)"
+        )
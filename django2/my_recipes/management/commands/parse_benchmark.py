@@ -0,0 +1,78 @@
+"""Management command to benchmark the ingredient line parser."""
+
+import json
+import time
+from pathlib import Path
+from typing import Any
+
+from django.core.management.base import BaseCommand
+
+from my_recipes import ingredient_parser
+
+CORPUS = (
+    Path(__file__).resolve().parents[2] / "fixtures" / "ingredient_lines.json"
+)
+FIELDS = ("name", "amount", "amount_max", "unit", "note")
+
+
+class Command(BaseCommand):
+    help = (
+        "Measure ingredient line parser throughput (lines/sec) and accuracy "
+        "against the labelled fixture corpus"
+    )
+
+    def add_arguments(self, parser: Any) -> None:
+        parser.add_argument(
+            "--repeat",
+            type=int,
+            default=200,
+            help="Times the corpus is parsed for the throughput run",
+        )
+        parser.add_argument(
+            "--corpus",
+            type=str,
+            default=str(CORPUS),
+            help="JSON list of {line, name, amount, amount_max, unit, note}",
+        )
+
+    def handle(self, *args: Any, **options: Any) -> None:
+        corpus = json.loads(Path(options["corpus"]).read_text())
+        lines = [row["line"] for row in corpus]
+
+        batch = lines * options["repeat"]
+        started = time.perf_counter()
+        ingredient_parser.parse_many(batch)
+        elapsed = time.perf_counter() - started
+        self.stdout.write(
+            self.style.SUCCESS(
+                f"Parsed {len(batch)} lines in {elapsed:.3f}s: "
+                f"{len(batch) / elapsed:,.0f} lines/sec"
+            )
+        )
+
+        exact = 0
+        field_hits = dict.fromkeys(FIELDS, 0)
+        for row, parsed in zip(corpus, ingredient_parser.parse_many(lines)):
+            parsed = parsed or {}
+            wrong = [f for f in FIELDS if parsed.get(f) != row.get(f)]
+            for field in FIELDS:
+                field_hits[field] += field not in wrong
+            if not wrong:
+                exact += 1
+                continue
+            self.stdout.write(
+                f"  MISS {row['line']!r}: "
+                + ", ".join(
+                    f"{f}={parsed.get(f)!r} (want {row.get(f)!r})"
+                    for f in wrong
+                )
+            )
+
+        self.stdout.write(
+            f"Exact matches: {exact}/{len(corpus)} "
+            f"({100 * exact / len(corpus):.1f}%)"
+        )
+        for field in FIELDS:
+            self.stdout.write(
+                f"  {field:<11} {100 * field_hits[field] / len(corpus):5.1f}%"
+            )
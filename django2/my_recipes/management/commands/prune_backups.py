@@ -0,0 +1,90 @@
+"""Management command to apply the backup retention policy."""
+
+import json
+from pathlib import Path
+from typing import Any
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+
+from my_recipes.backup_store import (
+    NAME_PREFIX,
+    BackupStore,
+    checksum_path,
+    parse_name,
+)
+
+
+class Command(BaseCommand):
+    help = (
+        "Delete the backups the retention policy drops and the stored "
+        "recipes no remaining backup lists"
+    )
+
+    def add_arguments(self, parser: Any) -> None:
+        parser.add_argument(
+            "--keep-daily",
+            type=int,
+            default=settings.BACKUP_KEEP_DAILY,
+            help="Days to keep the newest backup of",
+        )
+        parser.add_argument(
+            "--keep-weekly",
+            type=int,
+            default=settings.BACKUP_KEEP_WEEKLY,
+            help="Weeks to keep the newest backup of",
+        )
+        parser.add_argument(
+            "--import-legacy",
+            action="store_true",
+            help=(
+                "First move full backup files in MEDIA_ROOT into the store "
+                "(the files are deleted once stored)"
+            ),
+        )
+        parser.add_argument(
+            "--dry-run",
+            action="store_true",
+            help="Only report what would be deleted",
+        )
+
+    def handle(self, *args: Any, **options: Any) -> None:
+        store = BackupStore.default()
+        dry_run = options["dry_run"]
+        if options["import_legacy"]:
+            self.import_legacy(store, dry_run)
+
+        result = store.prune(
+            options["keep_daily"], options["keep_weekly"], dry_run=dry_run
+        )
+        for manifest in result.removed:
+            self.stdout.write(f"  - {manifest.name}")
+        verb = "Would delete" if dry_run else "Deleted"
+        self.stdout.write(
+            self.style.SUCCESS(
+                f"{verb} {len(result.removed)} backups and "
+                f"{result.blobs_removed} stored recipes "
+                f"({result.bytes_freed / 1024:.1f} KiB); "
+                f"{len(result.kept)} backups kept"
+            )
+        )
+
+    def import_legacy(self, store: BackupStore, dry_run: bool) -> None:
+        for path in sorted(
+            Path(settings.MEDIA_ROOT).glob(f"{NAME_PREFIX}*.json")
+        ):
+            created = parse_name(path.stem)
+            if created is None:
+                continue
+            if dry_run:
+                self.stdout.write(f"Would import {path.name}")
+                continue
+            try:
+                with open(path, "r") as f:
+                    recipes = json.load(f)["recipes"]
+            except (ValueError, KeyError) as e:
+                raise CommandError(f"Can't import {path.name}: {e}")
+            store.save(recipes, created=created)
+            path.unlink()
+            checksum_path(path).unlink(missing_ok=True)
+            self.stdout.write(f"Imported {path.name}")
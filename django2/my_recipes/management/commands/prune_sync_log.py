@@ -0,0 +1,20 @@
+"""Management command to compact the delta sync change log."""
+
+from typing import Any
+
+from django.core.management.base import BaseCommand
+
+from my_recipes import sync
+
+
+class Command(BaseCommand):
+    help = (
+        "Delete recipe change log rows superseded by a later change to the "
+        "same recipe. Safe to run at any time; sync tokens stay valid"
+    )
+
+    def handle(self, *args: Any, **options: Any) -> None:
+        deleted = sync.prune_superseded()
+        self.stdout.write(
+            self.style.SUCCESS(f"Pruned {deleted} superseded changes")
+        )
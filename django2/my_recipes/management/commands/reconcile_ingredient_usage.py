@@ -0,0 +1,59 @@
+"""Management command to check and repair the ingredient usage counters."""
+
+import time
+from typing import Any
+
+from django.core.management.base import BaseCommand
+
+from my_recipes import usage
+from my_recipes.models import Ingredient
+
+
+class Command(BaseCommand):
+    help = (
+        "Compare each ingredient's stored recipe count with its recipe rows "
+        "and repair any drift"
+    )
+
+    def add_arguments(self, parser: Any) -> None:
+        parser.add_argument(
+            "--dry-run",
+            action="store_true",
+            help="Only report drift, don't repair it",
+        )
+        parser.add_argument(
+            "--prune-unused",
+            action="store_true",
+            help="Then delete ingredients no recipe uses",
+        )
+
+    def handle(self, *args: Any, **options: Any) -> None:
+        dry_run = options["dry_run"]
+        started = time.perf_counter()
+        drift = usage.reconcile(apply=not dry_run)
+        for item in drift:
+            self.stdout.write(
+                f"'{item.name}' (#{item.id}): stored {item.stored}, "
+                f"used by {item.actual}"
+            )
+        verb = "found" if dry_run else "repaired"
+        self.stdout.write(
+            self.style.SUCCESS(
+                f"Drift {verb} on {len(drift)} ingredients "
+                f"({(time.perf_counter() - started) * 1000:.0f}ms)"
+            )
+        )
+
+        if options["prune_unused"]:
+            # The counter picks them out; the join guards against a recipe
+            # that started using one since
+            unused = Ingredient.objects.filter(
+                recipe_count=0, recipeingredient__isnull=True
+            )
+            if dry_run:
+                self.stdout.write(f"Would delete {unused.count()} unused")
+                return
+            deleted = unused.delete()[1].get(Ingredient._meta.label, 0)
+            self.stdout.write(
+                self.style.SUCCESS(f"Deleted {deleted} unused ingredients")
+            )
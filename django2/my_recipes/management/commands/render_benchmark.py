@@ -0,0 +1,103 @@
+"""Management command to benchmark response rendering and compression."""
+
+import gzip
+import time
+from typing import Any, Callable
+
+import brotli
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from rest_framework.renderers import JSONRenderer
+
+from api.renderers import FastJSONRenderer, MessagePackRenderer
+from my_recipes.models import Recipe
+from my_recipes.serializers import RecipeSerializer
+
+
+class Command(BaseCommand):
+    help = (
+        "Time the JSON and MessagePack renderers and gzip/brotli compression "
+        "on a recipe list page (1000 recipes by default)"
+    )
+
+    def add_arguments(self, parser: Any) -> None:
+        parser.add_argument(
+            "--recipes",
+            type=int,
+            default=1000,
+            help="Recipes on the page; existing recipes are repeated to fill it",
+        )
+        parser.add_argument(
+            "--repeat",
+            type=int,
+            default=20,
+            help="Timed iterations per renderer",
+        )
+
+    def handle(self, *args: Any, **options: Any) -> None:
+        recipes = list(
+            RecipeSerializer.setup_eager_loading(Recipe.objects.all())[
+                : options["recipes"]
+            ]
+        )
+        if not recipes:
+            raise CommandError("No recipes in the database to render")
+
+        started = time.perf_counter()
+        serialized = RecipeSerializer(recipes, many=True).data
+        self.stdout.write(
+            f"Serialized {len(recipes)} recipes in "
+            f"{(time.perf_counter() - started) * 1000:.1f}ms"
+        )
+        results = [
+            dict(item, id=index + 1)
+            for index in range(options["recipes"])
+            for item in [serialized[index % len(serialized)]]
+        ]
+        page = {
+            "count": len(results),
+            "next": None,
+            "previous": None,
+            "results": results,
+        }
+
+        repeat = options["repeat"]
+        rendered = {}
+        for label, renderer in (
+            ("DRF JSONRenderer", JSONRenderer()),
+            ("FastJSONRenderer", FastJSONRenderer()),
+            ("MessagePackRenderer", MessagePackRenderer()),
+        ):
+            body = renderer.render(page)
+            rendered[label] = body
+            self.report(label, body, repeat, lambda: renderer.render(page))
+        if rendered["DRF JSONRenderer"] != rendered["FastJSONRenderer"]:
+            self.stdout.write(self.style.WARNING("JSON renderers differ!"))
+
+        body = rendered["FastJSONRenderer"]
+        quality = settings.RESPONSE_BROTLI_QUALITY
+        self.report(
+            "gzip (level 6)",
+            gzip.compress(body, compresslevel=6, mtime=0),
+            repeat,
+            lambda: gzip.compress(body, compresslevel=6, mtime=0),
+        )
+        self.report(
+            f"brotli (quality {quality})",
+            brotli.compress(body, quality=quality),
+            repeat,
+            lambda: brotli.compress(body, quality=quality),
+        )
+
+    def report(
+        self, label: str, body: bytes, repeat: int, run: Callable[[], Any]
+    ) -> None:
+        started = time.perf_counter()
+        for _ in range(repeat):
+            run()
+        elapsed_ms = (time.perf_counter() - started) * 1000 / repeat
+        self.stdout.write(
+            self.style.SUCCESS(
+                f"{label:<24} {elapsed_ms:8.2f}ms {len(body) / 1024:10.1f} KiB"
+            )
+        )
@@ -4,6 +4,7 @@ from typing import Any
 
 from django.core.management.base import BaseCommand, CommandError
 
+from my_recipes import duplicates
 from my_recipes.backup import RecipeBackup
 
 
@@ -33,8 +34,16 @@ class Command(BaseCommand):
                     f"Successfully restored {len(recipes)} recipes:"
                 )
             )
+            flagged = duplicates.flagged(recipe.id for recipe in recipes)
             for recipe in recipes:
                 self.stdout.write(f"  - {recipe.name}")
+                for duplicate in flagged.get(recipe.id, []):
+                    self.stdout.write(
+                        self.style.WARNING(
+                            f"      looks like '{duplicate['name']}' "
+                            f"(#{duplicate['id']}, {duplicate['score']:.2f})"
+                        )
+                    )
         except FileNotFoundError:
             raise CommandError(
                 f"Backup file not found: {options['input_file']}"
@@ -0,0 +1,224 @@
+"""Management command to check that backups are complete and restorable."""
+
+import multiprocessing
+import os
+import time
+from collections import deque
+from concurrent.futures import Future, ProcessPoolExecutor
+from pathlib import Path
+from typing import Any, Deque, Dict, List, Tuple
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+
+from my_recipes import backup_verify
+from my_recipes.backup import RecipeBackup
+from my_recipes.backup_store import (
+    NAME_PREFIX,
+    BackupStore,
+    file_sha256,
+    read_checksum,
+    write_checksum,
+)
+
+
+class Command(BaseCommand):
+    help = (
+        "Check backups without restoring them: every recipe against the "
+        "backup schema, step ingredients against the listed ones, and each "
+        "file and stored recipe against its checksum"
+    )
+
+    def add_arguments(self, parser: Any) -> None:
+        parser.add_argument(
+            "backups",
+            nargs="*",
+            help=(
+                "Backup files, store manifests or stored backup names. "
+                "Defaults to every stored backup and every full backup "
+                "file in MEDIA_ROOT"
+            ),
+        )
+        parser.add_argument(
+            "--workers",
+            type=int,
+            default=os.cpu_count() or 1,
+            help="Worker processes (default: one per CPU)",
+        )
+        parser.add_argument(
+            "--chunk-size",
+            type=int,
+            default=500,
+            help="Stored recipes checked per task",
+        )
+
+    def handle(self, *args: Any, **options: Any) -> None:
+        targets = self.targets(options["backups"])
+        if not targets:
+            raise CommandError("No backups to verify")
+        limits = RecipeBackup.schema_limits()
+        chunk_size = max(1, options["chunk_size"])
+        workers = max(1, options["workers"])
+        started = time.perf_counter()
+
+        reports: Dict[Path, Dict[str, Any]] = {}
+        # Tasks in flight, oldest first: bounded, so a large store doesn't
+        # queue every chunk before the first result comes back
+        pending: Deque[Tuple[Path, Future]] = deque()
+        # spawn: the same clean workers my_recipes.ocr_import uses
+        with ProcessPoolExecutor(
+            max_workers=workers,
+            mp_context=multiprocessing.get_context("spawn"),
+        ) as pool:
+            for path, store in targets:
+                report = reports[path] = self.new_report()
+                if store is None:
+                    tasks = [(backup_verify.check_file, str(path), limits)]
+                else:
+                    tasks = self.manifest_tasks(
+                        report, store, path, limits, chunk_size
+                    )
+                for task in tasks:
+                    pending.append((path, pool.submit(*task)))
+                    while len(pending) > workers * 4:
+                        self.collect(reports, *pending.popleft())
+            while pending:
+                self.collect(reports, *pending.popleft())
+
+        failed = 0
+        for path, report in reports.items():
+            failed += self.finish(path, report)
+        elapsed = time.perf_counter() - started
+        checked = sum(report["checked"] for report in reports.values())
+        summary = (
+            f"Verified {len(reports) - failed} of {len(reports)} backups "
+            f"({checked} recipes) in {elapsed:.1f}s with {workers} workers"
+        )
+        if failed:
+            raise CommandError(summary)
+        self.stdout.write(self.style.SUCCESS(summary))
+
+    def targets(self, names: List[str]) -> List[Tuple[Path, Any]]:
+        """(path, its store or None for a full backup file) per backup"""
+        store = BackupStore.default()
+        if not names:
+            found = [(m.path, store) for m in reversed(store.manifests())]
+            found.extend(
+                (path, None)
+                for path in sorted(
+                    Path(settings.MEDIA_ROOT).glob(f"{NAME_PREFIX}*.json")
+                )
+            )
+            return found
+        found = []
+        for name in names:
+            path = Path(name)
+            if not path.is_file():
+                manifest = store.find(name)
+                if manifest is None:
+                    raise CommandError(f"Backup not found: {name}")
+                path = manifest.path
+            in_store = path.resolve().parent.name == "manifests"
+            found.append(
+                (path, BackupStore.containing(path) if in_store else None)
+            )
+        return found
+
+    @staticmethod
+    def new_report() -> Dict[str, Any]:
+        return {
+            "checked": 0,
+            "found": 0,
+            "problems": [],
+            "expected": None,
+            "sha256": None,
+        }
+
+    @staticmethod
+    def manifest_tasks(
+        report: Dict[str, Any],
+        store: BackupStore,
+        path: Path,
+        limits: Dict[str, int],
+        chunk_size: int,
+    ) -> List[Tuple]:
+        """Read a manifest here; its recipes are checked in chunks"""
+        report["sha256"] = file_sha256(path)
+        try:
+            manifest = store.read_manifest(path)
+            hashes = manifest["hashes"]
+        except (ValueError, KeyError) as e:
+            report["found"] += 1
+            report["problems"].append((0, path.name, f"bad manifest: {e}"))
+            return []
+        report["expected"] = manifest.get("count")
+        return [
+            (
+                backup_verify.check_blobs,
+                str(store.root),
+                hashes[start : start + chunk_size],
+                start + 1,
+                limits,
+            )
+            for start in range(0, len(hashes), chunk_size)
+        ]
+
+    @staticmethod
+    def collect(
+        reports: Dict[Path, Dict[str, Any]], path: Path, future: Future
+    ) -> None:
+        report = reports[path]
+        try:
+            result = future.result()
+        except Exception as e:
+            report["found"] += 1
+            report["problems"].append((0, path.name, f"unreadable: {e}"))
+            return
+        report["checked"] += result["checked"]
+        report["found"] += result["found"]
+        report["problems"].extend(result["problems"])
+        if "sha256" in result:
+            report["sha256"] = result["sha256"]
+            report["expected"] = result["header"].get("count")
+
+    def finish(self, path: Path, report: Dict[str, Any]) -> bool:
+        """Check the file's count and checksum and print it; True if bad"""
+        problems = report["problems"]
+        found = report["found"]
+        if report["expected"] is not None and (
+            report["expected"] != report["checked"]
+        ):
+            found += 1
+            problems.append(
+                (
+                    0,
+                    path.name,
+                    f"lists {report['expected']} recipes, "
+                    f"holds {report['checked']}",
+                )
+            )
+        recorded = read_checksum(path)
+        note = ""
+        if report["sha256"] is not None:
+            if recorded is None and not found:
+                write_checksum(path, report["sha256"])
+                note = " (checksum recorded)"
+            elif recorded is not None and recorded != report["sha256"]:
+                found += 1
+                problems.append((0, path.name, "checksum mismatch"))
+
+        if not found:
+            self.stdout.write(
+                f"OK    {path.name}: {report['checked']} recipes{note}"
+            )
+            return False
+        self.stdout.write(
+            self.style.ERROR(
+                f"FAIL  {path.name}: {found} problems in "
+                f"{report['checked']} recipes"
+            )
+        )
+        for index, name, error in problems[: backup_verify.MAX_ERRORS]:
+            where = f"recipe {index} ({name})" if index else name
+            self.stdout.write(f"      {where}: {error}")
+        return True
@@ -0,0 +1,53 @@
+# Generated by Django 6.0 on 2026-10-19 05:56
+
+import django.utils.timezone
+from django.db import migrations, models
+
+
+def backfill_changes(apps, schema_editor):
+    """Existing recipes enter the log so a first sync returns all of them"""
+    Recipe = apps.get_model("my_recipes", "Recipe")
+    RecipeChange = apps.get_model("my_recipes", "RecipeChange")
+    RecipeChange.objects.bulk_create(
+        RecipeChange(recipe_id=recipe_id, action="upsert")
+        for recipe_id in Recipe.objects.order_by("id").values_list(
+            "id", flat=True
+        )
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("my_recipes", "0003_step_component"),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name="RecipeChange",
+            fields=[
+                ("seq", models.BigAutoField(primary_key=True, serialize=False)),
+                ("recipe_id", models.BigIntegerField(db_index=True)),
+                (
+                    "action",
+                    models.CharField(
+                        choices=[
+                            ("upsert", "Created or updated"),
+                            ("delete", "Deleted"),
+                        ],
+                        max_length=6,
+                    ),
+                ),
+                (
+                    "changed_at",
+                    models.DateTimeField(
+                        db_index=True, default=django.utils.timezone.now
+                    ),
+                ),
+            ],
+            options={
+                "ordering": ("seq",),
+            },
+        ),
+        migrations.RunPython(backfill_changes, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,40 @@
+# Generated by Django 6.0 on 2026-10-19 06:03
+
+from django.db import migrations, models
+
+from my_recipes import units
+
+
+def normalize_amounts(apps, schema_editor):
+    RecipeIngredient = apps.get_model("my_recipes", "RecipeIngredient")
+    rows = list(RecipeIngredient.objects.only("id", "amount", "unit"))
+    for row in rows:
+        row.normalized_unit, row.normalized_quantity = units.normalize(
+            row.amount, row.unit
+        )
+    RecipeIngredient.objects.bulk_update(
+        rows, ["normalized_unit", "normalized_quantity"], batch_size=500
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("my_recipes", "0004_recipechange"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="recipeingredient",
+            name="normalized_quantity",
+            field=models.DecimalField(
+                blank=True, decimal_places=4, max_digits=14, null=True
+            ),
+        ),
+        migrations.AddField(
+            model_name="recipeingredient",
+            name="normalized_unit",
+            field=models.CharField(blank=True, max_length=20, null=True),
+        ),
+        migrations.RunPython(normalize_amounts, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,53 @@
+# Generated by Django 6.0 on 2026-10-19 06:06
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("my_recipes", "0005_recipeingredient_normalized"),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name="SimilarRecipe",
+            fields=[
+                (
+                    "id",
+                    models.BigAutoField(
+                        auto_created=True,
+                        primary_key=True,
+                        serialize=False,
+                        verbose_name="ID",
+                    ),
+                ),
+                ("score", models.FloatField()),
+                (
+                    "recipe",
+                    models.ForeignKey(
+                        on_delete=django.db.models.deletion.CASCADE,
+                        related_name="similar_recipes",
+                        to="my_recipes.recipe",
+                    ),
+                ),
+                (
+                    "similar",
+                    models.ForeignKey(
+                        on_delete=django.db.models.deletion.CASCADE,
+                        related_name="+",
+                        to="my_recipes.recipe",
+                    ),
+                ),
+            ],
+            options={
+                "ordering": ("recipe", "-score"),
+                "constraints": [
+                    models.UniqueConstraint(
+                        fields=("recipe", "similar"), name="unique_similar_recipe"
+                    )
+                ],
+            },
+        ),
+    ]
@@ -0,0 +1,47 @@
+# Generated by Django 6.0 on 2026-10-19 06:17
+
+from django.db import migrations, models
+from django.db.models import Count, Max
+
+
+def count_usage(apps, schema_editor):
+    Ingredient = apps.get_model("my_recipes", "Ingredient")
+    RecipeIngredient = apps.get_model("my_recipes", "RecipeIngredient")
+    usage = {
+        ingredient_id: (count, latest)
+        for ingredient_id, count, latest in RecipeIngredient.objects.values_list(
+            "ingredient_id"
+        )
+        .annotate(
+            count=Count("recipe_id", distinct=True),
+            latest=Max("recipe__modified_at"),
+        )
+        .values_list("ingredient_id", "count", "latest")
+    }
+    ingredients = list(Ingredient.objects.filter(id__in=usage.keys()))
+    for ingredient in ingredients:
+        ingredient.recipe_count, ingredient.last_used_at = usage[ingredient.id]
+    Ingredient.objects.bulk_update(
+        ingredients, ["recipe_count", "last_used_at"], batch_size=500
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("my_recipes", "0007_recipe_duplicates"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="ingredient",
+            name="last_used_at",
+            field=models.DateTimeField(blank=True, db_index=True, null=True),
+        ),
+        migrations.AddField(
+            model_name="ingredient",
+            name="recipe_count",
+            field=models.PositiveIntegerField(db_index=True, default=0),
+        ),
+        migrations.RunPython(count_usage, migrations.RunPython.noop),
+    ]
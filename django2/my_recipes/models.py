@@ -1,4 +1,7 @@
 from django.db import models
+from django.utils import timezone
+
+from . import units
 
 
 # Create your models here.
@@ -51,6 +54,10 @@ class Ingredient(models.Model):
     """An individual ingredient."""
 
     name = models.CharField(max_length=200, unique=True)
+    # Denormalized usage, kept current by every write path (see
+    # my_recipes.usage): recipes using it, and when one last started to
+    recipe_count = models.PositiveIntegerField(default=0, db_index=True)
+    last_used_at = models.DateTimeField(null=True, blank=True, db_index=True)
 
     class Meta:
         ordering = ("name",)
@@ -69,10 +76,26 @@ class RecipeIngredient(models.Model):
     ingredient = models.ForeignKey(Ingredient, on_delete=models.CASCADE)
     amount = models.DecimalField(max_digits=5, decimal_places=2)
     unit = models.CharField(max_length=200, null=True, blank=True)
+    # amount in the base unit of its dimension (ml, g, or the count unit
+    # itself, see my_recipes.units); null when the unit isn't recognised
+    normalized_unit = models.CharField(max_length=20, null=True, blank=True)
+    normalized_quantity = models.DecimalField(
+        max_digits=14, decimal_places=4, null=True, blank=True
+    )
 
     def __str__(self) -> str:
         return f"{self.recipe}: {self.ingredient} - {self.amount} {self.unit}"
 
+    def normalize(self) -> None:
+        """Derive the normalized fields from amount and unit"""
+        self.normalized_unit, self.normalized_quantity = units.normalize(
+            self.amount, self.unit
+        )
+
+    def save(self, *args, **kwargs):
+        self.normalize()
+        super().save(*args, **kwargs)
+
 
 class StepIngredient(models.Model):
     """A relationship entity between a Recipe Step and Ingredient.
@@ -82,3 +105,116 @@ class StepIngredient(models.Model):
 
     step = models.ForeignKey(Step, on_delete=models.CASCADE)
     ingredient = models.ForeignKey(RecipeIngredient, on_delete=models.CASCADE)
+
+
+class RecipeChange(models.Model):
+    """
+    Append-only log of recipe changes behind the delta sync feed.
+
+    ``seq`` only ever increases, so a client's position in the feed is the
+    last seq it has seen. Deletions stay in the log as tombstones, which is
+    why ``recipe_id`` is a plain integer rather than a foreign key.
+    """
+
+    UPSERT = "upsert"
+    DELETE = "delete"
+    ACTIONS = [(UPSERT, "Created or updated"), (DELETE, "Deleted")]
+
+    seq = models.BigAutoField(primary_key=True)
+    recipe_id = models.BigIntegerField(db_index=True)
+    action = models.CharField(max_length=6, choices=ACTIONS)
+    changed_at = models.DateTimeField(default=timezone.now, db_index=True)
+
+    class Meta:
+        ordering = ("seq",)
+
+    def __str__(self) -> str:
+        return f"#{self.seq} {self.action} recipe {self.recipe_id}"
+
+
+class SimilarRecipe(models.Model):
+    """
+    Precomputed "recipes like this one" entry: ``similar`` is one of the
+    nearest neighbours of ``recipe`` by ingredient profile (see
+    my_recipes.similarity), ``score`` their cosine similarity.
+    """
+
+    recipe = models.ForeignKey(
+        Recipe, on_delete=models.CASCADE, related_name="similar_recipes"
+    )
+    similar = models.ForeignKey(
+        Recipe, on_delete=models.CASCADE, related_name="+"
+    )
+    score = models.FloatField()
+
+    class Meta:
+        ordering = ("recipe", "-score")
+        constraints = [
+            models.UniqueConstraint(
+                fields=("recipe", "similar"), name="unique_similar_recipe"
+            )
+        ]
+
+    def __str__(self) -> str:
+        return f"{self.recipe_id} ~ {self.similar_id} ({self.score:.3f})"
+
+
+class RecipeSignature(models.Model):
+    """
+    MinHash signature of a recipe's steps and ingredients (see
+    my_recipes.duplicates): ``signature`` packs one 32-bit minimum per hash
+    function. Its LSH band keys are the recipe's RecipeBucket rows.
+    """
+
+    recipe = models.OneToOneField(
+        Recipe,
+        on_delete=models.CASCADE,
+        primary_key=True,
+        related_name="signature",
+    )
+    signature = models.BinaryField()
+
+    def __str__(self) -> str:
+        return f"Signature of recipe {self.recipe_id}"
+
+
+class RecipeBucket(models.Model):
+    """
+    One LSH band of a recipe's signature, hashed to a 64-bit key. Recipes
+    sharing a key are duplicate candidates, found with an indexed lookup.
+    """
+
+    recipe = models.ForeignKey(
+        Recipe, on_delete=models.CASCADE, related_name="+"
+    )
+    bucket = models.BigIntegerField(db_index=True)
+
+    def __str__(self) -> str:
+        return f"{self.bucket} <- recipe {self.recipe_id}"
+
+
+class DuplicateRecipe(models.Model):
+    """
+    A flagged near-duplicate pair: ``recipe`` is the newer one and
+    ``duplicate`` the older, ``score`` their estimated Jaccard similarity.
+    """
+
+    recipe = models.ForeignKey(
+        Recipe, on_delete=models.CASCADE, related_name="duplicates_flagged"
+    )
+    duplicate = models.ForeignKey(
+        Recipe, on_delete=models.CASCADE, related_name="duplicates_of"
+    )
+    score = models.FloatField()
+    flagged_at = models.DateTimeField(default=timezone.now)
+
+    class Meta:
+        ordering = ("recipe", "-score")
+        constraints = [
+            models.UniqueConstraint(
+                fields=("recipe", "duplicate"), name="unique_duplicate_recipe"
+            )
+        ]
+
+    def __str__(self) -> str:
+        return f"{self.recipe_id} ~ {self.duplicate_id} ({self.score:.3f})"
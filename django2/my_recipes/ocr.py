@@ -0,0 +1,380 @@
+"""
+OCR pipeline for recipe images: preprocessing, Tesseract and draft conversion.
+
+Follows the plan in docs/ocr-research.md: clean the image up with Pillow
+(grayscale, Otsu binarization, deskew), split multi-column layouts into
+separate regions, and OCR each region with the page segmentation mode that
+suits it (--psm 4 for columns, --psm 6 for full-width blocks).
+
+This module deliberately has no Django imports so it can run in the spawned
+worker processes of my_recipes.ocr_import.
+"""
+
+import hashlib
+import io
+import json
+import os
+import re
+import subprocess
+import time
+from collections import Counter
+from pathlib import Path
+from typing import Any, Dict, List, Optional, Tuple
+
+from PIL import Image, ImageOps
+
+from . import ingredient_parser
+
+TESSERACT_CMD = os.getenv("TESSERACT_CMD", "tesseract")
+
+# --psm 4: single column of variable-size text; --psm 6: one uniform block
+COLUMN_PSM = 4
+BLOCK_PSM = 6
+
+# Skew search range/step in degrees; photos of cookbooks are rarely worse
+MAX_SKEW = 6.0
+SKEW_STEP = 0.5
+# Width the skew estimate runs at; plenty to see text lines
+SKEW_SAMPLE_WIDTH = 400
+
+# Blank gap (fraction of page height) that separates horizontal bands, e.g.
+# a full-width title from the columns below it
+MIN_BAND_GAP_RATIO = 0.025
+# A vertical gutter must be this fraction of the page width to split columns
+MIN_GUTTER_RATIO = 0.03
+# ...and every resulting column at least this fraction of the page width
+MIN_COLUMN_RATIO = 0.15
+# White margin kept around each region; Tesseract misreads glyphs that touch
+# the image edge
+REGION_PADDING = 10
+
+Box = Tuple[int, int, int, int]
+
+
+def content_hash(data: bytes) -> str:
+    """Cache key / job id for an uploaded image"""
+    return hashlib.sha256(data).hexdigest()
+
+
+def otsu_threshold(image: Image.Image) -> int:
+    """Threshold maximising between-class variance of a grayscale histogram."""
+    histogram = image.histogram()[:256]
+    total = sum(histogram)
+    sum_all = sum(level * count for level, count in enumerate(histogram))
+
+    sum_background = 0
+    weight_background = 0
+    best_threshold, best_variance = 127, -1.0
+    for level, count in enumerate(histogram):
+        weight_background += count
+        if weight_background == 0:
+            continue
+        weight_foreground = total - weight_background
+        if weight_foreground == 0:
+            break
+        sum_background += level * count
+        mean_background = sum_background / weight_background
+        mean_foreground = (sum_all - sum_background) / weight_foreground
+        variance = (
+            weight_background
+            * weight_foreground
+            * (mean_background - mean_foreground) ** 2
+        )
+        if variance > best_variance:
+            best_threshold, best_variance = level, variance
+    return best_threshold
+
+
+def binarize(image: Image.Image) -> Image.Image:
+    """Grayscale image -> black text (0) on white (255)"""
+    threshold = otsu_threshold(image)
+    return image.point(lambda value: 255 if value > threshold else 0, mode="L")
+
+
+def _dark_counts(image: Image.Image) -> List[int]:
+    """Number of black pixels in every row of a binarized image."""
+    width = image.width
+    data = image.tobytes()
+    return [
+        data.count(0, offset, offset + width)
+        for offset in range(0, len(data), width)
+    ]
+
+
+def estimate_skew(image: Image.Image) -> float:
+    """
+    Angle (degrees) that best straightens the text lines.
+
+    Text lines produce sharp peaks in the horizontal projection profile when
+    they are level; the angle whose profile has the largest sum of squared
+    row-to-row differences wins.
+    """
+    scale = min(1.0, SKEW_SAMPLE_WIDTH / image.width)
+    sample = image.resize(
+        (max(1, int(image.width * scale)), max(1, int(image.height * scale)))
+    )
+    sample = binarize(sample)
+
+    best_angle, best_score = 0.0, -1
+    steps = int(MAX_SKEW / SKEW_STEP)
+    for step in range(-steps, steps + 1):
+        angle = step * SKEW_STEP
+        rotated = sample.rotate(angle, expand=True, fillcolor=255)
+        counts = _dark_counts(rotated)
+        score = sum((a - b) ** 2 for a, b in zip(counts, counts[1:]))
+        if score > best_score:
+            best_angle, best_score = angle, score
+    return best_angle
+
+
+def _runs(inked: List[bool], min_gap: int) -> List[Tuple[int, int]]:
+    """Spans of inked positions separated by blank gaps of min_gap or more"""
+    spans = []
+    start = None
+    blank = 0
+    for position, has_ink in enumerate(inked):
+        if has_ink:
+            if start is None:
+                start = position
+            blank = 0
+        elif start is not None:
+            blank += 1
+            if blank >= min_gap:
+                spans.append((start, position - blank + 1))
+                start = None
+    if start is not None:
+        spans.append((start, len(inked) - blank))
+    return spans
+
+
+def split_bands(image: Image.Image) -> List[Box]:
+    """Horizontal bands separated by tall blank gaps (title, body, ...)"""
+    width, height = image.size
+    noise = max(1, width // 200)
+    inked = [count > noise for count in _dark_counts(image)]
+    min_gap = max(2, int(height * MIN_BAND_GAP_RATIO))
+    return [(0, top, width, bottom) for top, bottom in _runs(inked, min_gap)]
+
+
+def split_columns(image: Image.Image) -> List[Box]:
+    """
+    Split a binarized band into column boxes along vertical white gutters.
+
+    Returns a single box spanning the band when no gutter is wide enough.
+    """
+    width, height = image.size
+    # Column-wise black pixel counts via the transposed image's rows
+    counts = _dark_counts(image.transpose(Image.Transpose.ROTATE_90))[::-1]
+    # Ignore speckle: a column is "empty" below 1% of the band height
+    noise = max(1, height // 100)
+    inked = [count > noise for count in counts]
+    min_gutter = max(2, int(width * MIN_GUTTER_RATIO))
+    min_column = int(width * MIN_COLUMN_RATIO)
+
+    boxes: List[Box] = []
+    for left, right in _runs(inked, min_gutter):
+        # Too narrow to be a column (a stray mark): fold into its neighbour
+        if boxes and right - left < min_column:
+            boxes[-1] = (boxes[-1][0], 0, right, height)
+        else:
+            boxes.append((left, 0, right, height))
+    if len(boxes) > 1 and boxes[0][2] - boxes[0][0] < min_column:
+        first = boxes.pop(0)
+        boxes[0] = (first[0], 0, boxes[0][2], height)
+    return boxes or [(0, 0, width, height)]
+
+
+def layout_regions(image: Image.Image) -> List[Tuple[Box, int]]:
+    """
+    Regions in reading order with the psm to OCR each one with.
+
+    Bands are read top to bottom, and the columns in a band left to right.
+    Columns get --psm 4, full-width bands --psm 6.
+    """
+    regions = []
+    for band in split_bands(image) or [(0, 0, *image.size)]:
+        columns = split_columns(image.crop(band))
+        psm = COLUMN_PSM if len(columns) > 1 else BLOCK_PSM
+        for left, _, right, _ in columns:
+            box = (
+                max(0, left - REGION_PADDING),
+                max(0, band[1] - REGION_PADDING),
+                min(image.width, right + REGION_PADDING),
+                min(image.height, band[3] + REGION_PADDING),
+            )
+            regions.append((box, psm))
+    return regions
+
+
+def preprocess(image: Image.Image) -> Tuple[Image.Image, float]:
+    """Orientation, grayscale, deskew and binarize; returns (image, skew)"""
+    image = ImageOps.exif_transpose(image).convert("L")
+    skew = estimate_skew(image)
+    if skew:
+        image = image.rotate(skew, expand=True, fillcolor=255)
+    return binarize(image), skew
+
+
+def run_tesseract(image: Image.Image, psm: int) -> str:
+    buffer = io.BytesIO()
+    image.save(buffer, format="PNG")
+    completed = subprocess.run(
+        [
+            TESSERACT_CMD,
+            "stdin",
+            "stdout",
+            "--oem",
+            "3",
+            "--psm",
+            str(psm),
+        ],
+        input=buffer.getvalue(),
+        capture_output=True,
+        check=True,
+        timeout=120,
+    )
+    return completed.stdout.decode("utf-8", errors="replace")
+
+
+def ocr_image(data: bytes, recognize: bool = True) -> Dict[str, Any]:
+    """
+    Run the full pipeline over raw image bytes.
+
+    With recognize=False only preprocessing and layout analysis run, which
+    is what the benchmark uses to time those phases on their own.
+    """
+    timings = {}
+    started = time.perf_counter()
+    image = Image.open(io.BytesIO(data))
+    image, skew = preprocess(image)
+    timings["preprocess_ms"] = (time.perf_counter() - started) * 1000
+
+    started = time.perf_counter()
+    layout = layout_regions(image)
+    timings["layout_ms"] = (time.perf_counter() - started) * 1000
+
+    started = time.perf_counter()
+    regions = []
+    for box, psm in layout:
+        text = run_tesseract(image.crop(box), psm) if recognize else ""
+        regions.append({"box": list(box), "psm": psm, "text": text})
+    timings["ocr_ms"] = (time.perf_counter() - started) * 1000
+
+    return {
+        "skew": skew,
+        # Regions of the same band share their top edge
+        "columns": max(Counter(box[1] for box, _ in layout).values()),
+        "regions": regions,
+        "text": "\n".join(region["text"].strip() for region in regions),
+        "timings": {name: round(ms, 1) for name, ms in timings.items()},
+    }
+
+
+def process_image(data: bytes, cache_dir: str) -> Dict[str, Any]:
+    """
+    Worker entry point: OCR an image unless its result is already cached.
+
+    Results are written to ``<cache_dir>/<sha256>.json`` (atomically, so
+    readers in other processes never see a partial file); failures go to
+    ``<sha256>.error.json`` and are retried on the next upload.
+    """
+    digest = content_hash(data)
+    cache = Path(cache_dir)
+    result_path = cache / f"{digest}.json"
+    if result_path.exists():
+        return json.loads(result_path.read_text())
+
+    try:
+        result = ocr_image(data)
+        result["draft"] = text_to_draft(result["text"])
+        target = result_path
+    except Exception as e:
+        result = {"error": f"{type(e).__name__}: {e}"}
+        target = cache / f"{digest}.error.json"
+
+    result["job"] = digest
+    tmp_path = target.with_suffix(f".{os.getpid()}.tmp")
+    tmp_path.write_text(json.dumps(result))
+    os.replace(tmp_path, target)
+    (cache / f"{digest}.pending").unlink(missing_ok=True)
+    return result
+
+
+# --- Draft conversion ---------------------------------------------------
+
+INGREDIENT_HEADERS = re.compile(r"^\s*ingredients?\s*:?\s*$", re.IGNORECASE)
+STEP_HEADERS = re.compile(
+    r"^\s*(directions|instructions|method|preparation|steps)\s*:?\s*$",
+    re.IGNORECASE,
+)
+STEP_NUMBER = re.compile(r"^\s*(\d{1,2})[.)]\s+")
+
+
+def parse_ingredient_line(line: str) -> Optional[Dict[str, str]]:
+    """'1 1/2 cups flour' -> IngredientInputSerializer fields, else None"""
+    parsed = ingredient_parser.parse(line)
+    if not parsed or parsed["amount"] is None or not parsed["name"]:
+        return None
+    return {
+        "name": parsed["name"],
+        "amount": parsed["amount"],
+        "unit": parsed["unit"],
+    }
+
+
+def text_to_draft(text: str) -> Dict[str, Any]:
+    """
+    Turn raw OCR text into a RecipeManageSerializer-shaped draft.
+
+    The first line is taken as the recipe name. "Ingredients" and
+    "Directions"-style headers split the sections when present; otherwise
+    lines that start with a quantity are ingredients and the rest are steps.
+    Steps link to every ingredient whose name they mention.
+    """
+    lines = [line.strip() for line in text.splitlines()]
+    lines = [line for line in lines if line]
+    if not lines:
+        return {"name": "", "ingredients": [], "steps": []}
+
+    name, body = lines[0], lines[1:]
+    ingredients: List[Dict[str, str]] = []
+    step_texts: List[str] = []
+    section = None
+    for line in body:
+        if INGREDIENT_HEADERS.match(line):
+            section = "ingredients"
+            continue
+        if STEP_HEADERS.match(line):
+            section = "steps"
+            continue
+
+        parsed = None
+        if section != "steps" and not STEP_NUMBER.match(line):
+            parsed = parse_ingredient_line(line)
+        if parsed:
+            ingredients.append(parsed)
+        elif section == "ingredients":
+            # Unquantified ingredient ("salt and pepper to taste")
+            ingredients.append({"name": line, "amount": "0.00", "unit": ""})
+        elif STEP_NUMBER.match(line) or not step_texts:
+            step_texts.append(STEP_NUMBER.sub("", line))
+        else:
+            # OCR wraps long steps over several lines
+            step_texts[-1] = f"{step_texts[-1]} {line}"
+
+    steps = []
+    for order, step in enumerate(step_texts, 1):
+        lowered = step.lower()
+        steps.append(
+            {
+                "order": order,
+                "step": step,
+                "component": None,
+                "ingredients": [
+                    {"ingredient_index": index}
+                    for index, ingredient in enumerate(ingredients)
+                    if ingredient["name"].lower() in lowered
+                ],
+            }
+        )
+    return {"name": name, "ingredients": ingredients, "steps": steps}
@@ -0,0 +1,158 @@
+"""Queue, worker pool and result cache for OCR recipe imports."""
+
+import functools
+import json
+import logging
+import multiprocessing
+import threading
+import time
+from concurrent.futures import Future, ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from pathlib import Path
+from typing import Any, Dict, Optional
+
+from django.conf import settings
+
+from . import ocr
+from .serializers import RecipeManageSerializer
+
+logger = logging.getLogger(__name__)
+
+
+class OCRImport:
+    """
+    Queues uploaded recipe images for OCR in a pool of worker processes.
+
+    Jobs are identified by the image's content hash and all state lives in
+    files under ``MEDIA_ROOT/ocr_cache``, so any web worker can answer a
+    status request and re-uploading an already processed image is free.
+    """
+
+    _executor: Optional[ProcessPoolExecutor] = None
+    _lock = threading.Lock()
+
+    @staticmethod
+    def cache_dir() -> Path:
+        path = Path(settings.MEDIA_ROOT) / "ocr_cache"
+        path.mkdir(parents=True, exist_ok=True)
+        return path
+
+    @classmethod
+    def executor(cls) -> ProcessPoolExecutor:
+        """Pool created on first use, in the process that serves uploads"""
+        with cls._lock:
+            if cls._executor is None:
+                workers = getattr(settings, "OCR_WORKERS", 2)
+                logger.info(f"Starting OCR pool with {workers} workers")
+                # spawn: workers start clean instead of inheriting a forked
+                # copy of a threaded server process
+                cls._executor = ProcessPoolExecutor(
+                    max_workers=workers,
+                    mp_context=multiprocessing.get_context("spawn"),
+                )
+            return cls._executor
+
+    @classmethod
+    def _discard(cls, executor: ProcessPoolExecutor) -> None:
+        """
+        Drop a broken pool (a worker was killed, e.g. out of memory) so the
+        next job starts a new one
+        """
+        with cls._lock:
+            if cls._executor is executor:
+                cls._executor = None
+        executor.shutdown(wait=False, cancel_futures=True)
+
+    @classmethod
+    def _log_failure(
+        cls, executor: ProcessPoolExecutor, job: str, future: Future
+    ) -> None:
+        error = future.exception()
+        if error is None:
+            return
+        logger.error(f"OCR worker failed: {error}")
+        if isinstance(error, BrokenProcessPool):
+            cls._discard(executor)
+            # Reported as failed rather than queued until it times out; the
+            # next upload of the image re-queues it
+            path = cls.cache_dir() / f"{job}.error.json"
+            path.write_text(json.dumps({"error": "OCR worker died"}))
+            (cls.cache_dir() / f"{job}.pending").unlink(missing_ok=True)
+
+    @classmethod
+    def _queue(cls, job: str, data: bytes, cache_dir: Path) -> None:
+        executor = cls.executor()
+        try:
+            future = executor.submit(ocr.process_image, data, str(cache_dir))
+        except BrokenProcessPool:
+            logger.warning("OCR pool is broken, starting a new one")
+            cls._discard(executor)
+            executor = cls.executor()
+            future = executor.submit(ocr.process_image, data, str(cache_dir))
+        future.add_done_callback(
+            functools.partial(cls._log_failure, executor, job)
+        )
+
+    @classmethod
+    def submit(cls, data: bytes) -> Dict[str, Any]:
+        """Queue an image unless it is cached or already queued"""
+        job = ocr.content_hash(data)
+        status = cls.status(job)
+        if status["status"] in ("done", "queued"):
+            logger.info(f"OCR job {job} already {status['status']}")
+            return status
+
+        cache_dir = cls.cache_dir()
+        (cache_dir / f"{job}.error.json").unlink(missing_ok=True)
+        (cache_dir / f"{job}.pending").touch()
+        cls._queue(job, data, cache_dir)
+        logger.info(f"Queued OCR job {job}")
+        return {"job": job, "status": "queued"}
+
+    @classmethod
+    def status(cls, job: str) -> Dict[str, Any]:
+        """
+        done (with the draft), failed, queued, or unknown.
+
+        A job still pending after OCR_JOB_TIMEOUT seconds is reported as
+        failed (its worker died) and is re-queued by the next upload.
+        """
+        cache_dir = cls.cache_dir()
+        result_path = cache_dir / f"{job}.json"
+        if result_path.exists():
+            result = json.loads(result_path.read_text())
+            return {
+                "job": job,
+                "status": "done",
+                "columns": result["columns"],
+                "text": result["text"],
+                **cls.validate_draft(result["draft"]),
+            }
+
+        error_path = cache_dir / f"{job}.error.json"
+        if error_path.exists():
+            error = json.loads(error_path.read_text())["error"]
+            return {"job": job, "status": "failed", "error": error}
+
+        pending_path = cache_dir / f"{job}.pending"
+        if pending_path.exists():
+            age = time.time() - pending_path.stat().st_mtime
+            if age > getattr(settings, "OCR_JOB_TIMEOUT", 600):
+                return {"job": job, "status": "failed", "error": "Timed out"}
+            return {"job": job, "status": "queued"}
+
+        return {"job": job, "status": "unknown"}
+
+    @staticmethod
+    def validate_draft(draft: Dict[str, Any]) -> Dict[str, Any]:
+        """
+        Check a draft against RecipeManageSerializer. The draft is returned
+        either way; the errors tell the client what to fix before saving it.
+        """
+        serializer = RecipeManageSerializer(data=draft)
+        valid = serializer.is_valid()
+        return {
+            "draft": draft,
+            "draft_valid": valid,
+            "draft_errors": {} if valid else serializer.errors,
+        }
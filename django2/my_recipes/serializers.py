@@ -1,6 +1,10 @@
+from decimal import Decimal
 from logging import getLogger
+from typing import Callable, Dict, Optional, Tuple
 
+from django.conf import settings
 from django.db import transaction
+from django.db.models import Prefetch
 from rest_framework import serializers
 
 from my_recipes.models import (
@@ -14,13 +18,85 @@ from my_recipes.models import (
 logger = getLogger(__name__)
 
 
-class RecipeIngredientSerializer(serializers.ModelSerializer):
+FieldTree = Dict[str, "FieldTree"]
+
+
+def _field_tree(value: str) -> FieldTree:
+    """'id,recipe_steps.order' -> {"id": {}, "recipe_steps": {"order": {}}}"""
+    tree: FieldTree = {}
+    for path in value.split(","):
+        node = tree
+        for part in path.strip().split("."):
+            if part:
+                node = node.setdefault(part, {})
+    return tree
+
+
+def field_selection(request) -> Tuple[FieldTree, FieldTree]:
+    """
+    The ?fields= and ?expand= trees of a read request. An empty fields tree
+    (at any level) means every field; paths are dotted through nested
+    serializers, e.g. ?fields=name,recipe_steps.step
+    """
+    if request is None or request.method not in ("GET", "HEAD"):
+        return {}, {}
+    params = getattr(request, "query_params", request.GET)
+    return (
+        _field_tree(params.get("fields", "")),
+        _field_tree(params.get("expand", "")),
+    )
+
+
+def _wants(name: str, fields: FieldTree) -> bool:
+    return not fields or name in fields
+
+
+class DynamicFieldsMixin:
+    """
+    Sparse fieldsets and expansion for read serializers.
+
+    The serializer built for a request (the one given a context) trims its
+    fields to ?fields= and swaps in ``expandable_fields`` named by ?expand=,
+    then passes the nested parts of both down to nested serializers. Nested
+    serializers are never built with a context, so they only ever apply what
+    their parent hands them.
+    """
+
+    # Field name -> factory for its expanded form
+    expandable_fields: Dict[str, Callable[[], serializers.Field]] = {}
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        fields, expand = field_selection(self.context.get("request"))
+        if fields or expand:
+            self.select_fields(fields, expand)
+
+    def select_fields(self, fields: FieldTree, expand: FieldTree) -> None:
+        for name in expand.keys() & self.expandable_fields.keys():
+            self.fields[name] = self.expandable_fields[name]()
+        if fields:
+            for name in list(self.fields):
+                if name not in fields and name not in expand:
+                    self.fields.pop(name)
+        for name, field in self.fields.items():
+            nested = getattr(field, "child", field)
+            if isinstance(nested, DynamicFieldsMixin):
+                nested.select_fields(fields.get(name, {}), expand.get(name, {}))
+
+
+class RecipeIngredientSerializer(
+    DynamicFieldsMixin, serializers.ModelSerializer
+):
+    expandable_fields = {
+        "ingredient": lambda: IngredientSerializer(read_only=True),
+    }
+
     class Meta:
         model = RecipeIngredient
         fields = ["id", "amount", "unit", "ingredient"]
 
 
-class StepIngredientSerializer(serializers.ModelSerializer):
+class StepIngredientSerializer(DynamicFieldsMixin, serializers.ModelSerializer):
     ingredient = RecipeIngredientSerializer(read_only=True)
 
     class Meta:
@@ -28,7 +104,7 @@ class StepIngredientSerializer(serializers.ModelSerializer):
         fields = ["id", "ingredient"]
 
 
-class StepSerializer(serializers.ModelSerializer):
+class StepSerializer(DynamicFieldsMixin, serializers.ModelSerializer):
     step_ingredients = StepIngredientSerializer(
         source="stepingredient_set", many=True, read_only=True
     )
@@ -38,35 +114,140 @@ class StepSerializer(serializers.ModelSerializer):
         fields = ["id", "order", "step", "component", "step_ingredients"]
 
 
-class RecipeSerializer(serializers.ModelSerializer):
+class RecipeSerializer(DynamicFieldsMixin, serializers.ModelSerializer):
     ingredients = serializers.SerializerMethodField()
     recipe_steps = StepSerializer(many=True, read_only=True)
 
+    @staticmethod
+    def setup_eager_loading(
+        queryset,
+        fields: Optional[FieldTree] = None,
+        expand: Optional[FieldTree] = None,
+    ):
+        """
+        Prefetch everything this serializer reads, so a page of recipes costs
+        a fixed number of queries instead of several per recipe.
+
+        Given the request's field_selection(), only what will be rendered is
+        loaded: ?fields=id,name is a single query.
+        """
+        fields, expand = fields or {}, expand or {}
+        if fields:
+            queryset = queryset.only(
+                "id", *[name for name in ("name",) if name in fields]
+            )
+
+        lookups = []
+        if _wants("ingredients", fields):
+            lookups.append(
+                Prefetch(
+                    "recipeingredient_set",
+                    queryset=RecipeIngredient.objects.select_related(
+                        "ingredient"
+                    ),
+                )
+            )
+        if _wants("recipe_steps", fields):
+            lookups.append("recipe_steps")
+            step_fields = fields.get("recipe_steps", {})
+            if _wants("step_ingredients", step_fields):
+                step_ingredients = StepIngredient.objects.all()
+                if _wants(
+                    "ingredient", step_fields.get("step_ingredients", {})
+                ):
+                    step_ingredients = step_ingredients.select_related(
+                        "ingredient"
+                    )
+                    step_expand = expand.get("recipe_steps", {})
+                    if "ingredient" in step_expand.get(
+                        "step_ingredients", {}
+                    ).get("ingredient", {}):
+                        step_ingredients = step_ingredients.select_related(
+                            "ingredient__ingredient"
+                        )
+                lookups.append(
+                    Prefetch(
+                        "recipe_steps__stepingredient_set",
+                        queryset=step_ingredients,
+                    )
+                )
+        return queryset.prefetch_related(*lookups)
+
+    # Keys kept in each `ingredients` item; empty for all of them
+    ingredient_fields: FieldTree = {}
+
+    def select_fields(self, fields: FieldTree, expand: FieldTree) -> None:
+        # `ingredients` is a method field, so nested selection happens here
+        self.ingredient_fields = fields.get("ingredients", {})
+        super().select_fields(fields, expand)
+
     def get_ingredients(self, obj: Recipe):
-        return [
+        recipe_ingredients = obj.recipeingredient_set.all()
+        if "recipeingredient_set" not in getattr(
+            obj, "_prefetched_objects_cache", {}
+        ):
+            recipe_ingredients = recipe_ingredients.select_related(
+                "ingredient"
+            )
+        # Ordered by ingredient name, like the Ingredient model
+        items = [
             {
                 "id": ri.id,
                 "amount": str(ri.amount),
                 "unit": ri.unit,
-                "name": ingredient.name,
+                "name": ri.ingredient.name,
             }
-            for ingredient in obj.ingredients.all().distinct()
-            for ri in RecipeIngredient.objects.filter(
-                recipe=obj, ingredient=ingredient
+            for ri in sorted(
+                recipe_ingredients, key=lambda ri: (ri.ingredient.name, ri.id)
             )
         ]
+        if self.ingredient_fields:
+            items = [
+                {k: v for k, v in item.items() if k in self.ingredient_fields}
+                for item in items
+            ]
+        return items
 
     class Meta:
         model = Recipe
         fields = ("id", "name", "ingredients", "recipe_steps")
 
 
-class IngredientSerializer(serializers.ModelSerializer):
+class RecipeSummarySerializer(serializers.ModelSerializer):
     class Meta:
-        model = Ingredient
+        model = Recipe
         fields = ("id", "name")
 
 
+class IngredientSerializer(DynamicFieldsMixin, serializers.ModelSerializer):
+    # ?expand=recipes lists the recipes using each ingredient
+    expandable_fields = {
+        "recipes": lambda: RecipeSummarySerializer(
+            source="recipe_set", many=True, read_only=True
+        ),
+    }
+
+    @staticmethod
+    def setup_eager_loading(
+        queryset,
+        fields: Optional[FieldTree] = None,
+        expand: Optional[FieldTree] = None,
+    ):
+        if expand and "recipes" in expand:
+            queryset = queryset.prefetch_related(
+                Prefetch(
+                    "recipe_set", queryset=Recipe.objects.only("id", "name")
+                )
+            )
+        return queryset
+
+    class Meta:
+        model = Ingredient
+        fields = ("id", "name", "recipe_count", "last_used_at")
+        # Maintained by the recipe write paths (my_recipes.usage)
+        read_only_fields = ("recipe_count", "last_used_at")
+
+
 # New serializers for creation (NOT ModelSerializers - custom structure):
 class IngredientInputSerializer(serializers.Serializer):
     """Input serializer for ingredient data during recipe creation"""
@@ -78,6 +259,113 @@ class IngredientInputSerializer(serializers.Serializer):
     )
 
 
+class RecipeBatchSerializer(serializers.Serializer):
+    """Recipe ids for RecipeViewSet.batch"""
+
+    ids = serializers.ListField(
+        child=serializers.IntegerField(min_value=1),
+        allow_empty=False,
+        max_length=settings.RECIPE_BATCH_MAX_IDS,
+    )
+
+
+class ShoppingListRecipeSerializer(serializers.Serializer):
+    id = serializers.IntegerField(min_value=1)
+    factor = serializers.DecimalField(
+        max_digits=8, decimal_places=4, required=False, default=Decimal(1)
+    )
+
+    def validate_factor(self, value):
+        if not 0 < value <= settings.RECIPE_SCALE_MAX_FACTOR:
+            raise serializers.ValidationError(
+                f"Must be above 0 and at most "
+                f"{settings.RECIPE_SCALE_MAX_FACTOR}"
+            )
+        return value
+
+
+class ShoppingListSerializer(serializers.Serializer):
+    """Recipes (with optional scale factors) for RecipeViewSet.shopping_list"""
+
+    recipes = ShoppingListRecipeSerializer(
+        many=True,
+        allow_empty=False,
+        max_length=settings.RECIPE_BATCH_MAX_IDS,
+    )
+
+
+class RecipeScaleSerializer(serializers.Serializer):
+    """
+    How RecipeViewSet.scale resizes a recipe: by `factor`, from
+    `base_servings` to `servings`, or to a target `amount` (in `unit`, the
+    row's own unit by default) of one of its recipe ingredients.
+    """
+
+    factor = serializers.DecimalField(
+        max_digits=8, decimal_places=4, required=False
+    )
+    servings = serializers.IntegerField(min_value=1, required=False)
+    base_servings = serializers.IntegerField(min_value=1, required=False)
+    ingredient = serializers.IntegerField(min_value=1, required=False)
+    amount = serializers.DecimalField(
+        max_digits=10, decimal_places=4, required=False
+    )
+    unit = serializers.CharField(
+        max_length=200, required=False, allow_blank=True
+    )
+
+    def validate(self, data):
+        modes = [
+            "factor" in data,
+            "servings" in data or "base_servings" in data,
+            "ingredient" in data or "amount" in data,
+        ]
+        if sum(modes) != 1:
+            raise serializers.ValidationError(
+                "Give one of factor, servings and base_servings, "
+                "or ingredient and amount"
+            )
+        if modes[1] and not ("servings" in data and "base_servings" in data):
+            raise serializers.ValidationError(
+                "servings and base_servings go together"
+            )
+        if modes[2] and not ("ingredient" in data and "amount" in data):
+            raise serializers.ValidationError(
+                "ingredient and amount go together"
+            )
+        if "servings" in data:
+            factor = Decimal(data["servings"]) / data["base_servings"]
+            # validate_factor has already run, on the absent factor field
+            try:
+                data["factor"] = self.validate_factor(factor)
+            except serializers.ValidationError as e:
+                raise serializers.ValidationError({"servings": e.detail})
+        return data
+
+    def validate_factor(self, value):
+        if not 0 < value <= settings.RECIPE_SCALE_MAX_FACTOR:
+            raise serializers.ValidationError(
+                f"Must be above 0 and at most "
+                f"{settings.RECIPE_SCALE_MAX_FACTOR}"
+            )
+        return value
+
+    def validate_amount(self, value):
+        if value <= 0:
+            raise serializers.ValidationError("Must be above 0")
+        return value
+
+
+class IngredientParseSerializer(serializers.Serializer):
+    """Batch of free-text ingredient lines for IngredientViewSet.parse"""
+
+    lines = serializers.ListField(
+        child=serializers.CharField(allow_blank=True, trim_whitespace=False),
+        allow_empty=False,
+        max_length=settings.INGREDIENT_PARSE_MAX_LINES,
+    )
+
+
 class StepIngredientReferenceSerializer(serializers.Serializer):
     """References an ingredient by its index in the ingredients list"""
 
@@ -112,6 +400,21 @@ class RecipeManageSerializer(serializers.Serializer):
     ingredients = IngredientInputSerializer(many=True)
     steps = StepInputSerializer(many=True)
 
+    def validate(self, attrs):
+        """Step ingredient references must point into the ingredients list"""
+        count = len(attrs["ingredients"])
+        for step in attrs["steps"]:
+            for reference in step.get("ingredients", []):
+                if reference["ingredient_index"] >= count:
+                    raise serializers.ValidationError(
+                        {
+                            "steps": f"Step {step['order']} references "
+                            f"ingredient_index {reference['ingredient_index']}"
+                            f" but there are only {count} ingredients"
+                        }
+                    )
+        return attrs
+
     def create(self, validated_data):
         """
         Detailed implementation of atomic recipe creation.
@@ -0,0 +1,88 @@
+"""
+Shopping list for a set of recipes (a week's meal plan, say).
+
+All RecipeIngredient rows of the requested recipes are read in one query
+as plain tuples and summed in memory per ingredient and base unit, using
+the normalized quantities stored with each row (my_recipes.units). Amounts
+in units that don't convert to each other (cups of flour and grams of
+flour, or unknown units) stay on separate lines.
+"""
+
+from collections import defaultdict
+from decimal import Decimal
+from typing import Any, Dict, List, Tuple
+
+from . import units
+from .models import RecipeIngredient
+
+
+def shopping_list(factors: Dict[int, Decimal]) -> List[Dict[str, Any]]:
+    """
+    Lines of {"ingredient", "name", "amount", "unit", "display", "recipes"}
+    for recipe id -> scale factor, sorted by ingredient name.
+    """
+    rows = RecipeIngredient.objects.filter(
+        recipe_id__in=factors.keys()
+    ).values_list(
+        "recipe_id",
+        "ingredient_id",
+        "ingredient__name",
+        "amount",
+        "unit",
+        "normalized_unit",
+        "normalized_quantity",
+    )
+
+    # (ingredient id, base unit or raw unit text) -> running line
+    lines: Dict[Tuple[int, Any], Dict[str, Any]] = {}
+    recipes = defaultdict(set)
+    for (
+        recipe_id,
+        ingredient_id,
+        name,
+        amount,
+        unit,
+        normalized_unit,
+        normalized_quantity,
+    ) in rows:
+        factor = factors[recipe_id]
+        unit = unit.strip() if unit else unit
+        if normalized_unit is None:
+            key = (ingredient_id, ("raw", (unit or "").lower()))
+            quantity = amount * factor
+        else:
+            key = (ingredient_id, normalized_unit)
+            quantity = normalized_quantity * factor
+        line = lines.get(key)
+        if line is None:
+            line = lines[key] = {
+                "ingredient": ingredient_id,
+                "name": name,
+                "quantity": Decimal(0),
+                "unit": unit,
+                "largest": Decimal(-1),
+            }
+        line["quantity"] += quantity
+        # Shown in the unit of its biggest contribution: a list built from
+        # cups reads in cups, one built from ml in ml
+        if quantity > line["largest"]:
+            line["largest"], line["unit"] = quantity, unit
+        recipes[key].add(recipe_id)
+
+    results = []
+    for key, line in lines.items():
+        registered = units.lookup(line["unit"])
+        if isinstance(key[1], tuple) or registered is None:
+            amount = units.express_unknown(line["quantity"], line["unit"])
+        else:
+            amount = units.express(line["quantity"], registered, line["unit"])
+        results.append(
+            {
+                "ingredient": line["ingredient"],
+                "name": line["name"],
+                **amount,
+                "recipes": sorted(recipes[key]),
+            }
+        )
+    results.sort(key=lambda item: (item["name"], item["unit"] or ""))
+    return results
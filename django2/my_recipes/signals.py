@@ -0,0 +1,121 @@
+"""
+my_recipes/signals.py - Record recipe writes in the delta sync change log,
+publish them to the live change stream once they commit, queue the
+similar-recipe refresh and check for near-duplicates. Keep ingredient
+usage counters in step with RecipeIngredient rows.
+"""
+
+from django.db import transaction
+from django.db.models.signals import (
+    post_delete,
+    post_save,
+    pre_delete,
+    pre_save,
+)
+from django.dispatch import receiver
+
+from . import duplicates, similarity, usage
+from .events import publish_on_commit
+from .models import (
+    Ingredient,
+    Recipe,
+    RecipeChange,
+    RecipeIngredient,
+    SimilarRecipe,
+)
+
+
+@receiver(post_save, sender=Recipe)
+def record_recipe_saved(sender, instance, **kwargs):
+    """Create, update, restore and admin edits all save the Recipe row"""
+    # Same transaction as the write: rolled back together, never lost
+    change = RecipeChange.objects.create(
+        recipe_id=instance.pk, action=RecipeChange.UPSERT
+    )
+    publish_on_commit([change])
+    # Ingredients are written after the Recipe row; the refresh waits
+    recipe_id = instance.pk
+    transaction.on_commit(
+        lambda: similarity.schedule_refresh(touched=[recipe_id])
+    )
+    duplicates.index_on_commit([recipe_id])
+
+
+@receiver(pre_delete, sender=Recipe)
+def collect_similar_listings(sender, instance, **kwargs):
+    """The cascade drops this recipe from other lists, which need topping up"""
+    instance._listed_by = list(
+        SimilarRecipe.objects.filter(similar=instance).values_list(
+            "recipe_id", flat=True
+        )
+    )
+
+
+@receiver(post_delete, sender=Recipe)
+def record_recipe_deleted(sender, instance, **kwargs):
+    change = RecipeChange.objects.create(
+        recipe_id=instance.pk, action=RecipeChange.DELETE
+    )
+    publish_on_commit([change])
+    listed_by = getattr(instance, "_listed_by", [])
+    transaction.on_commit(
+        lambda: similarity.schedule_refresh(
+            touched=[change.recipe_id], stale=listed_by
+        )
+    )
+
+
+@receiver(pre_delete, sender=Ingredient)
+def collect_ingredient_recipes(sender, instance, **kwargs):
+    """Deleting a used ingredient takes it out of its recipes"""
+    instance._recipe_ids = list(
+        RecipeIngredient.objects.filter(ingredient=instance)
+        .values_list("recipe_id", flat=True)
+        .distinct()
+    )
+
+
+@receiver(post_delete, sender=Ingredient)
+def record_ingredient_deleted(sender, instance, **kwargs):
+    recipe_ids = getattr(instance, "_recipe_ids", [])
+    if not recipe_ids:
+        return
+    # Those recipes changed: sync clients, streams and cached filter
+    # results (keyed on the newest seq) must see it
+    changes = RecipeChange.objects.bulk_create(
+        RecipeChange(recipe_id=recipe_id, action=RecipeChange.UPSERT)
+        for recipe_id in recipe_ids
+    )
+    publish_on_commit(changes)
+    transaction.on_commit(
+        lambda: similarity.schedule_refresh(touched=recipe_ids)
+    )
+    duplicates.index_on_commit(recipe_ids)
+
+
+@receiver(pre_save, sender=RecipeIngredient)
+def collect_previous_ingredient(sender, instance, raw, **kwargs):
+    """An edit can repoint an existing row to another ingredient"""
+    if raw or instance._state.adding:
+        return
+    instance._previous_ingredient_id = (
+        RecipeIngredient.objects.filter(pk=instance.pk)
+        .values_list("ingredient_id", flat=True)
+        .first()
+    )
+
+
+@receiver(post_save, sender=RecipeIngredient)
+def count_ingredient_use(sender, instance, created, raw, **kwargs):
+    if raw:
+        return
+    previous = getattr(instance, "_previous_ingredient_id", None)
+    if created or (previous and previous != instance.ingredient_id):
+        usage.recount_on_commit([instance.ingredient_id], used=True)
+    if not created and previous and previous != instance.ingredient_id:
+        usage.recount_on_commit([previous])
+
+
+@receiver(post_delete, sender=RecipeIngredient)
+def uncount_ingredient_use(sender, instance, **kwargs):
+    usage.recount_on_commit([instance.ingredient_id])
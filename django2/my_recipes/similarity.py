@@ -0,0 +1,351 @@
+"""
+"Recipes like this one" from ingredient profiles.
+
+Every recipe is a sparse TF-IDF vector over ingredients: an ingredient
+weighs log((1 + N) / (1 + recipes using it)) + 1, so sharing saffron says
+more than sharing salt. The recipe x ingredient matrix is held as two
+postings maps (recipe -> ingredients, ingredient -> recipes), built from a
+single values_list query. Scoring one recipe against all others is a
+sparse matrix-vector product over the postings of its own ingredients:
+recipes with nothing in common are never touched.
+
+The SIMILAR_RECIPES_COUNT nearest neighbours of each recipe are stored as
+SimilarRecipe rows, so serving them is one indexed query. Writes don't
+rebuild the table: refresh() recomputes the lists of the recipes that were
+written, of recipes listing them, and of recipes they now outscore the
+last entry of. A background thread does this after commit, coalescing
+bursts such as a restore into one pass.
+
+Each worker process loads the index once and then keeps it in step: a
+refresh re-reads the ingredient rows of the recipes it was given and of
+those the change log (RecipeChange) shows other workers wrote since the
+last one, looking back SYNC_OVERLAP_SECONDS for late commits. Writing a
+list locks its recipe's row, so workers refreshing the same recipe take
+turns. IDF weights drift a little as the library grows;
+rebuild_similar_recipes recomputes everything.
+"""
+
+import heapq
+import math
+import threading
+import time
+from collections import Counter, defaultdict
+from concurrent.futures import ThreadPoolExecutor
+from datetime import timedelta
+from logging import getLogger
+from typing import Dict, Iterable, List, Optional, Set, Tuple
+
+from django.conf import settings
+from django.db import connections, transaction
+from django.db.models import Count, Max, Min, Q
+from django.utils import timezone
+
+from recipes.db import router
+
+from .models import Recipe, RecipeChange, RecipeIngredient, SimilarRecipe
+
+logger = getLogger(__name__)
+
+# Ids per ... WHERE recipe_id IN (...) (SQLite variable limits)
+DELETE_BATCH = 500
+
+
+class IngredientIndex:
+    """Sparse recipe x ingredient TF-IDF matrix"""
+
+    def __init__(self, pairs: Iterable[Tuple[int, int]]):
+        counts: Dict[int, Counter] = defaultdict(Counter)
+        self.postings: Dict[int, Set[int]] = defaultdict(set)
+        for recipe_id, ingredient_id in pairs:
+            counts[recipe_id][ingredient_id] += 1
+            self.postings[ingredient_id].add(recipe_id)
+
+        total = len(counts)
+        self.idf = {
+            ingredient_id: math.log((1 + total) / (1 + len(recipes))) + 1
+            for ingredient_id, recipes in self.postings.items()
+        }
+        self.vectors: Dict[int, Dict[int, float]] = {}
+        self.norms: Dict[int, float] = {}
+        for recipe_id, ingredient_counts in counts.items():
+            self._weigh(recipe_id, ingredient_counts)
+        # Position in the change log the index reflects (see sync())
+        self.seq = 0
+        self.synced_at = timezone.now()
+
+    def _weigh(self, recipe_id: int, ingredient_counts: Counter) -> None:
+        # An ingredient listed twice (e.g. in two components) counts a bit
+        # more, not twice as much
+        vector = {
+            ingredient_id: (1 + math.log(count)) * self.idf[ingredient_id]
+            for ingredient_id, count in ingredient_counts.items()
+        }
+        self.vectors[recipe_id] = vector
+        self.norms[recipe_id] = math.sqrt(sum(w * w for w in vector.values()))
+
+    @classmethod
+    def load(cls) -> "IngredientIndex":
+        # Read first: changes logged while the rows load are applied again
+        synced_at = timezone.now()
+        seq = RecipeChange.objects.aggregate(Max("seq"))["seq__max"] or 0
+        index = cls(
+            RecipeIngredient.objects.values_list(
+                "recipe_id", "ingredient_id"
+            ).iterator(chunk_size=5000)
+        )
+        index.seq, index.synced_at = seq, synced_at
+        return index
+
+    def replace(self, recipe_id: int, ingredient_ids: Iterable[int]) -> None:
+        """Swap in a recipe's current ingredients; none removes it"""
+        for ingredient_id in self.vectors.pop(recipe_id, ()):
+            self.postings[ingredient_id].discard(recipe_id)
+        self.norms.pop(recipe_id, None)
+        counts = Counter(ingredient_ids)
+        if not counts:
+            return
+        total = len(self.vectors) + 1
+        for ingredient_id in counts:
+            self.postings[ingredient_id].add(recipe_id)
+            if ingredient_id not in self.idf:
+                users = len(self.postings[ingredient_id])
+                self.idf[ingredient_id] = (
+                    math.log((1 + total) / (1 + users)) + 1
+                )
+        self._weigh(recipe_id, counts)
+
+    def reload(self, recipe_ids: Iterable[int]) -> None:
+        """Re-read the ingredient rows of ``recipe_ids``"""
+        ids = sorted(set(recipe_ids))
+        for start in range(0, len(ids), DELETE_BATCH):
+            batch = ids[start : start + DELETE_BATCH]
+            rows: Dict[int, List[int]] = defaultdict(list)
+            for recipe_id, ingredient_id in RecipeIngredient.objects.filter(
+                recipe_id__in=batch
+            ).values_list("recipe_id", "ingredient_id"):
+                rows[recipe_id].append(ingredient_id)
+            for recipe_id in batch:
+                self.replace(recipe_id, rows.get(recipe_id, ()))
+
+    def sync(self) -> Set[int]:
+        """
+        Recipes written since the last sync according to the change log,
+        including late commits from up to SYNC_OVERLAP_SECONDS before it
+        """
+        synced_at = timezone.now()
+        overlap = timedelta(seconds=settings.SYNC_OVERLAP_SECONDS)
+        changes = RecipeChange.objects.filter(
+            Q(seq__gt=self.seq) | Q(changed_at__gte=self.synced_at - overlap)
+        ).values_list("seq", "recipe_id")
+        changed = set()
+        for seq, recipe_id in changes.iterator(chunk_size=5000):
+            self.seq = max(self.seq, seq)
+            changed.add(recipe_id)
+        self.synced_at = synced_at
+        return changed
+
+    def __len__(self) -> int:
+        return len(self.vectors)
+
+    def __contains__(self, recipe_id: int) -> bool:
+        return recipe_id in self.vectors
+
+    def related(self, recipe_id: int) -> Set[int]:
+        """Recipes sharing at least one ingredient with ``recipe_id``"""
+        related = set()
+        for ingredient_id in self.vectors.get(recipe_id, ()):
+            related |= self.postings[ingredient_id]
+        related.discard(recipe_id)
+        return related
+
+    def similarity(self, a: int, b: int) -> float:
+        vector_a, vector_b = self.vectors.get(a), self.vectors.get(b)
+        if not vector_a or not vector_b:
+            return 0.0
+        if len(vector_b) < len(vector_a):
+            vector_a, vector_b = vector_b, vector_a
+        dot = sum(
+            weight * vector_b[ingredient_id]
+            for ingredient_id, weight in vector_a.items()
+            if ingredient_id in vector_b
+        )
+        # Rounding can put identical profiles a hair over 1
+        return min(dot / (self.norms[a] * self.norms[b]), 1.0)
+
+    def neighbours(self, recipe_id: int, k: int) -> List[Tuple[int, float]]:
+        """The ``k`` most similar recipes as (id, cosine), best first"""
+        vector = self.vectors.get(recipe_id)
+        if not vector:
+            return []
+        dots: Dict[int, float] = defaultdict(float)
+        for ingredient_id, weight in vector.items():
+            for other in self.postings[ingredient_id]:
+                dots[other] += weight * self.vectors[other][ingredient_id]
+        dots.pop(recipe_id, None)
+        norm = self.norms[recipe_id]
+        return heapq.nlargest(
+            k,
+            (
+                (other, min(dot / (norm * self.norms[other]), 1.0))
+                for other, dot in dots.items()
+            ),
+            # Ties go to the older recipe, so lists are stable
+            key=lambda item: (item[1], -item[0]),
+        )
+
+
+def _write(index: IngredientIndex, recipe_ids: Set[int]) -> int:
+    """Replace the stored neighbour lists of ``recipe_ids``"""
+    k = settings.SIMILAR_RECIPES_COUNT
+    rows = [
+        SimilarRecipe(recipe_id=recipe_id, similar_id=other, score=score)
+        for recipe_id in recipe_ids
+        if recipe_id in index
+        for other, score in index.neighbours(recipe_id, k)
+    ]
+    ids = sorted(recipe_ids)
+    with transaction.atomic():
+        for start in range(0, len(ids), DELETE_BATCH):
+            batch = ids[start : start + DELETE_BATCH]
+            # Another worker replacing the same lists waits here rather
+            # than interleave its rows with ours (unique_similar_recipe)
+            list(
+                Recipe.objects.select_for_update()
+                .filter(id__in=batch)
+                .order_by("id")
+                .values_list("id", flat=True)
+            )
+            SimilarRecipe.objects.filter(recipe_id__in=batch).delete()
+        SimilarRecipe.objects.bulk_create(rows, batch_size=1000)
+    return len(rows)
+
+
+def rebuild(index: Optional[IngredientIndex] = None) -> int:
+    """Recompute every neighbour list; returns the number of rows stored"""
+    index = index or IngredientIndex.load()
+    k = settings.SIMILAR_RECIPES_COUNT
+    rows = [
+        SimilarRecipe(recipe_id=recipe_id, similar_id=other, score=score)
+        for recipe_id in index.vectors
+        for other, score in index.neighbours(recipe_id, k)
+    ]
+    with transaction.atomic():
+        SimilarRecipe.objects.all().delete()
+        SimilarRecipe.objects.bulk_create(rows, batch_size=1000)
+    return len(rows)
+
+
+# Only refresh() on the single background thread touches it
+_index: Optional[IngredientIndex] = None
+
+
+def _current_index(touched: Set[int]) -> IngredientIndex:
+    """This process's index, brought up to date with recent writes"""
+    global _index
+    if _index is None:
+        _index = IngredientIndex.load()
+    else:
+        _index.reload(touched | _index.sync())
+    return _index
+
+
+def refresh(touched: Iterable[int], stale: Iterable[int] = ()) -> int:
+    """
+    Bring the neighbour lists up to date after writes to ``touched``
+    recipes (created, updated, restored or deleted). ``stale`` recipes
+    only need their own list recomputed, e.g. because a neighbour was
+    deleted. Returns the number of lists recomputed.
+    """
+    started = time.perf_counter()
+    touched = set(touched)
+    index = _current_index(touched)
+    if len(touched) * 2 >= len(index):
+        rebuild(index)
+        logger.info(f"Rebuilt all {len(index)} similar-recipe lists")
+        return len(index)
+
+    recompute = touched | set(stale)
+    recompute |= set(
+        SimilarRecipe.objects.filter(similar_id__in=touched).values_list(
+            "recipe_id", flat=True
+        )
+    )
+
+    # Any other recipe sharing an ingredient gains a touched recipe when it
+    # beats the last entry of its list, or when the list isn't full
+    candidates = set()
+    for recipe_id in touched:
+        candidates |= index.related(recipe_id)
+    candidates -= recompute
+    if candidates:
+        k = settings.SIMILAR_RECIPES_COUNT
+        lists = {}
+        ids = sorted(candidates)
+        for start in range(0, len(ids), DELETE_BATCH):
+            lists.update(
+                (row["recipe_id"], (row["count"], row["lowest"]))
+                for row in SimilarRecipe.objects.filter(
+                    recipe_id__in=ids[start : start + DELETE_BATCH]
+                )
+                .values("recipe_id")
+                .annotate(count=Count("id"), lowest=Min("score"))
+            )
+        for recipe_id in candidates:
+            count, lowest = lists.get(recipe_id, (0, 0.0))
+            if count < k or any(
+                index.similarity(recipe_id, other) > lowest for other in touched
+            ):
+                recompute.add(recipe_id)
+
+    _write(index, recompute)
+    logger.info(
+        f"Refreshed {len(recompute)} similar-recipe lists for "
+        f"{len(touched)} changed recipes in "
+        f"{(time.perf_counter() - started) * 1000:.0f}ms"
+    )
+    return len(recompute)
+
+
+_lock = threading.Lock()
+_pending_touched: Set[int] = set()
+_pending_stale: Set[int] = set()
+_scheduled = False
+_executor: Optional[ThreadPoolExecutor] = None
+
+
+def _drain() -> None:
+    global _scheduled
+    with _lock:
+        touched, stale = set(_pending_touched), set(_pending_stale)
+        _pending_touched.clear()
+        _pending_stale.clear()
+        _scheduled = False
+    # Reads the writes that scheduled it, which a replica may not have yet
+    router.pin_primary()
+    try:
+        refresh(touched, stale)
+    except Exception as e:
+        logger.error(f"Similar-recipe refresh failed: {e}")
+    finally:
+        # The worker thread keeps running; don't keep its connection open
+        connections.close_all()
+
+
+def schedule_refresh(touched: Iterable[int] = (), stale: Iterable[int] = ()):
+    """
+    Queue a refresh() on the background thread. Calls made while one is
+    queued are merged into it. Call once the writes have committed.
+    """
+    global _scheduled, _executor
+    with _lock:
+        _pending_touched.update(touched)
+        _pending_stale.update(stale)
+        if _scheduled or not (_pending_touched or _pending_stale):
+            return
+        _scheduled = True
+        # Created on first use, so gunicorn forks workers before any thread
+        if _executor is None:
+            _executor = ThreadPoolExecutor(
+                max_workers=1, thread_name_prefix="similar-recipes"
+            )
+    _executor.submit(_drain)
@@ -1,3 +1,210 @@
-from django.test import TestCase
+import io
+import json
+import os
+import tempfile
+import time
+from datetime import datetime
+from pathlib import Path
+from unittest import mock
 
-# Create your tests here.
+from django.contrib.auth.models import User
+from django.db import DatabaseError
+from django.test import SimpleTestCase, TestCase
+from rest_framework.test import APITestCase
+
+from .backup_store import (
+    GC_GRACE_SECONDS,
+    BackupStore,
+    checksum_path,
+    parse_name,
+)
+from .bulk_import import RecipeBulkImport, iter_payloads
+from .models import Recipe
+
+
+class RecipeBatchTests(APITestCase):
+    def setUp(self):
+        user = User.objects.create_user("cook", password="secret")
+        self.client.force_authenticate(user)
+
+    def test_invalid_id_is_a_validation_error(self):
+        # ListField errors are keyed by the item's int index
+        response = self.client.get("/api/recipes/batch/?ids=1,abc")
+        self.assertEqual(response.status_code, 400)
+        self.assertIn("1", response.json()["error"]["ids"])
+
+
+class BackupStoreTests(SimpleTestCase):
+    def setUp(self):
+        self.root = Path(self.enterContext(tempfile.TemporaryDirectory()))
+        self.store = BackupStore(self.root)
+
+    def save(self, created, recipes=({"name": "Soup"},), partial=False):
+        return self.store.save(list(recipes), created=created, partial=partial)
+
+    def age_blobs(self):
+        old = time.time() - GC_GRACE_SECONDS - 60
+        for path in self.store.blob_dir.glob("*/*.json"):
+            os.utime(path, (old, old))
+
+    def test_same_timestamp_gets_a_new_name(self):
+        created = datetime(2026, 3, 1, 12, 0, 0)
+        first = self.save(created)
+        second = self.save(created, [{"name": "Stew"}])
+        self.assertNotEqual(first, second)
+        self.assertEqual(len(self.store.manifests()), 2)
+        self.assertEqual(
+            self.store.read_manifest(first)["hashes"],
+            [self.store.put({"name": "Soup"})],
+        )
+
+    def test_parses_names_without_microseconds(self):
+        self.assertEqual(
+            parse_name("recipes_backup_20260301_120000"),
+            datetime(2026, 3, 1, 12, 0, 0),
+        )
+        self.assertIsNone(parse_name("recipes_backup_latest"))
+
+    def test_retained_keeps_newest_per_day_and_week(self):
+        # Newest first: two on Mar 10, one each on Mar 9 and Mar 2
+        for created in (
+            datetime(2026, 3, 10, 18),
+            datetime(2026, 3, 10, 6),
+            datetime(2026, 3, 9, 12),
+            datetime(2026, 3, 2, 12),
+        ):
+            self.save(created)
+        manifests = self.store.manifests()
+        kept = self.store.retained(manifests, keep_daily=1, keep_weekly=2)
+        self.assertEqual(
+            [m.created for m in kept],
+            [datetime(2026, 3, 10, 18), datetime(2026, 3, 2, 12)],
+        )
+
+    def test_retained_keeps_partial_backups_without_counting_them(self):
+        self.save(datetime(2026, 3, 10, 18), partial=True)
+        self.save(datetime(2026, 3, 10, 6))
+        self.save(datetime(2026, 3, 9, 12))
+        kept = self.store.retained(
+            self.store.manifests(), keep_daily=0, keep_weekly=0
+        )
+        # The partial one, plus the newest full backup whatever the policy
+        self.assertEqual(
+            [m.created for m in kept],
+            [datetime(2026, 3, 10, 18), datetime(2026, 3, 10, 6)],
+        )
+
+    def test_prune_deletes_dropped_backups_and_their_blobs(self):
+        old = self.save(datetime(2026, 3, 9, 12), [{"name": "Gone"}])
+        new = self.save(datetime(2026, 3, 10, 12))
+        self.age_blobs()
+        result = self.store.prune(keep_daily=1, keep_weekly=0)
+        self.assertEqual([m.path for m in result.removed], [old])
+        self.assertEqual(result.blobs_removed, 1)
+        self.assertFalse(old.exists())
+        self.assertFalse(checksum_path(old).exists())
+        self.assertTrue(new.exists())
+        self.assertEqual(self.store.missing(self.store.read_manifest(new)), [])
+
+    def test_prune_keeps_recent_blobs(self):
+        self.save(datetime(2026, 3, 9, 12), [{"name": "Fresh"}])
+        self.save(datetime(2026, 3, 10, 12))
+        result = self.store.prune(keep_daily=1, keep_weekly=0)
+        self.assertEqual(len(result.removed), 1)
+        self.assertEqual(result.blobs_removed, 0)
+        self.assertEqual(len(list(self.store.blob_dir.glob("*/*.json"))), 2)
+
+    def test_prune_dry_run_deletes_nothing(self):
+        old = self.save(datetime(2026, 3, 9, 12), [{"name": "Gone"}])
+        self.save(datetime(2026, 3, 10, 12))
+        self.age_blobs()
+        result = self.store.prune(keep_daily=1, keep_weekly=0, dry_run=True)
+        self.assertEqual(len(result.removed), 1)
+        self.assertEqual(result.blobs_removed, 1)
+        self.assertTrue(old.exists())
+        self.assertEqual(len(list(self.store.blob_dir.glob("*/*.json"))), 2)
+
+
+def _payloads(data, read_size=3):
+    with mock.patch("my_recipes.bulk_import.READ_SIZE", read_size):
+        return list(iter_payloads(io.BytesIO(data.encode())))
+
+
+class IterPayloadsTests(SimpleTestCase):
+    def test_array_values_split_across_reads(self):
+        items = [
+            {"name": "Crème brûlée", "note": "a ] and a , inside"},
+            3.5,
+            [1, [2, {"three": None}]],
+            "tail",
+            1234567,
+        ]
+        data = json.dumps(items, ensure_ascii=False)
+        for read_size in (1, 2, 3, 7, 64):
+            with self.subTest(read_size=read_size):
+                self.assertEqual(
+                    _payloads(data, read_size),
+                    [(i, item, None) for i, item in enumerate(items)],
+                )
+
+    def test_array_separators_and_whitespace(self):
+        self.assertEqual(
+            _payloads(" \n[ 1 ,\t2,3\r\n]  "),
+            [(0, 1, None), (1, 2, None), (2, 3, None)],
+        )
+        self.assertEqual(_payloads("[ ]"), [])
+
+    def test_missing_separator_ends_the_array(self):
+        payloads = _payloads("[1 2, 3]")
+        self.assertEqual(payloads[0], (0, 1, None))
+        self.assertEqual(payloads[1][:2], (1, None))
+        self.assertIn("expected ','", payloads[1][2])
+        self.assertEqual(len(payloads), 2)
+
+    def test_unterminated_array(self):
+        for data in ("[1, 2", "[1, 2,", '[{"name": "Soup"'):
+            with self.subTest(data=data):
+                index, value, error = _payloads(data)[-1]
+                self.assertIsNone(value)
+                self.assertTrue(error.startswith("Invalid JSON"), error)
+
+    def test_bad_ndjson_line_fails_only_that_item(self):
+        payloads = _payloads('{"a": 1}\nnot json\n\n{"b": 2}')
+        self.assertEqual(payloads[0], (0, {"a": 1}, None))
+        self.assertEqual(payloads[1][:2], (1, None))
+        self.assertIn("Invalid JSON", payloads[1][2])
+        self.assertEqual(payloads[2], (2, {"b": 2}, None))
+
+
+class RecipeBulkImportTests(TestCase):
+    def recipe(self, name):
+        return {
+            "name": name,
+            "ingredients": [{"name": "salt", "amount": "1", "unit": "tsp"}],
+            "steps": [{"order": 1, "step": "Season", "ingredients": []}],
+        }
+
+    def test_failed_chunk_is_retried_one_recipe_at_a_time(self):
+        create_recipes = RecipeBulkImport.create_recipes
+
+        def fail_on_bad(importer, payloads):
+            if any(data["name"] == "Bad" for data in payloads):
+                raise DatabaseError("simulated")
+            return create_recipes(importer, payloads)
+
+        lines = [self.recipe(name) for name in ("Soup", "Bad", "Stew")]
+        stream = io.BytesIO(
+            "\n".join(json.dumps(line) for line in lines).encode()
+        )
+        with mock.patch.object(RecipeBulkImport, "create_recipes", fail_on_bad):
+            results = RecipeBulkImport(chunk_size=10).run(stream)
+
+        self.assertEqual(
+            [result["status"] for result in results],
+            ["created", "failed", "created"],
+        )
+        self.assertEqual(results[1]["error"], "simulated")
+        self.assertEqual(
+            sorted(Recipe.objects.values_list("name", flat=True)),
+            ["Soup", "Stew"],
+        )
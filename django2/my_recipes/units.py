@@ -0,0 +1,217 @@
+"""
+Unit registry, quantity normalization and recipe scaling.
+
+Every canonical unit of the ingredient parser belongs to a dimension:
+volume and mass units convert through a base unit (ml, g), count units
+("clove", "can", "each" for a bare "2 eggs") only scale. A RecipeIngredient
+stores its raw amount and unit as entered plus the quantity in the base
+unit of its dimension (see normalize()), so quantities can be compared and
+summed without parsing unit text again.
+
+Scaling works on rows already in memory: the quantity is multiplied in base
+units, re-expressed in the most readable unit of its ladder (tsp -> tbsp ->
+cup, g -> kg, ...) and rounded to fractions a cook can measure. Standard
+library only.
+"""
+
+import re
+from decimal import ROUND_HALF_UP, Decimal
+from fractions import Fraction
+from typing import Any, Dict, Iterable, List, NamedTuple, Optional, Tuple
+
+from .ingredient_parser import CASE_SENSITIVE_UNITS, UNIT_ALIASES
+
+VOLUME = "volume"
+MASS = "mass"
+COUNT = "count"
+
+
+class Unit(NamedTuple):
+    name: str
+    dimension: str
+    # Base units (ml, g) in one of this unit; 1 for count units
+    factor: Decimal
+    # Denominators of the fractions amounts round to (1/8 tsp, 1/3 cup);
+    # empty for decimal units, which round to ``places`` decimals instead
+    fractions: Tuple[int, ...] = ()
+    places: int = 0
+
+    @property
+    def base(self) -> str:
+        return {VOLUME: "ml", MASS: "g"}.get(self.dimension, self.name)
+
+
+UNITS: Dict[str, Unit] = {
+    unit.name: unit
+    for unit in (
+        Unit("tsp", VOLUME, Decimal("4.92892159375"), fractions=(8,)),
+        Unit("tbsp", VOLUME, Decimal("14.78676478125"), fractions=(2,)),
+        Unit("cup", VOLUME, Decimal("236.5882365"), fractions=(4, 3)),
+        Unit("fl oz", VOLUME, Decimal("29.5735295625"), fractions=(2,)),
+        Unit("pint", VOLUME, Decimal("473.176473"), fractions=(4,)),
+        Unit("quart", VOLUME, Decimal("946.352946"), fractions=(4,)),
+        Unit("gallon", VOLUME, Decimal("3785.411784"), fractions=(4,)),
+        Unit("ml", VOLUME, Decimal(1)),
+        Unit("l", VOLUME, Decimal(1000), places=2),
+        Unit("mg", MASS, Decimal("0.001")),
+        Unit("g", MASS, Decimal(1)),
+        Unit("kg", MASS, Decimal(1000), places=2),
+        Unit("oz", MASS, Decimal("28.349523125"), fractions=(4,)),
+        Unit("lb", MASS, Decimal("453.59237"), fractions=(4,)),
+    )
+}
+# Every other parser unit counts things (pinch, clove, can, ...)
+UNITS.update(
+    (name, Unit(name, COUNT, Decimal(1), fractions=(4,)))
+    for name in (*UNIT_ALIASES, "each")
+    if name not in UNITS
+)
+
+# Units an amount may be promoted or demoted between when scaled, smallest
+# first, with the least amount (in that unit) worth switching to it for
+LADDERS: List[List[Tuple[str, Decimal]]] = [
+    [("tsp", Decimal(0)), ("tbsp", Decimal(1)), ("cup", Decimal("0.25"))],
+    [("ml", Decimal(0)), ("l", Decimal(1))],
+    [("mg", Decimal(0)), ("g", Decimal(1)), ("kg", Decimal(1))],
+    [("oz", Decimal(0)), ("lb", Decimal(1))],
+]
+_LADDER_OF = {name: ladder for ladder in LADDERS for name, _ in ladder}
+
+_ALIASES = {
+    alias.lower(): name
+    for name, aliases in UNIT_ALIASES.items()
+    for alias in aliases
+}
+_BASE_PLACES = Decimal("0.0001")
+
+
+def lookup(unit: Optional[str]) -> Optional[Unit]:
+    """
+    The registry entry for a unit as entered ("Tablespoons", "T", "g."),
+    "each" for no unit at all, or None when the unit isn't known.
+    """
+    text = re.sub(r"\s+", " ", (unit or "").strip()).rstrip(".")
+    if not text:
+        return UNITS["each"]
+    name = CASE_SENSITIVE_UNITS.get(text) or _ALIASES.get(text.lower())
+    return UNITS.get(name) if name else None
+
+
+def normalize(
+    amount: Optional[Decimal], unit: Optional[str]
+) -> Tuple[Optional[str], Optional[Decimal]]:
+    """(base unit, quantity in it) for a raw amount, (None, None) if unknown"""
+    registered = lookup(unit)
+    if registered is None or amount is None:
+        return None, None
+    return (
+        registered.base,
+        (Decimal(amount) * registered.factor).quantize(
+            _BASE_PLACES, ROUND_HALF_UP
+        ),
+    )
+
+
+def _round(quantity: Decimal, unit: Unit) -> Decimal:
+    """Nearest measurable amount, never rounding a non-zero amount to 0"""
+    if unit.fractions:
+        candidates = [
+            Decimal(round(quantity * denominator)) / denominator
+            for denominator in unit.fractions
+        ]
+        rounded = min(candidates, key=lambda value: abs(value - quantity))
+        if not rounded and quantity:
+            rounded = Decimal(1) / max(unit.fractions)
+        return rounded
+
+    places = unit.places
+    if places == 0 and quantity < 10:
+        places = 1
+    step = Decimal(1).scaleb(-places)
+    rounded = quantity.quantize(step, ROUND_HALF_UP)
+    if not rounded and quantity:
+        rounded = step
+    return rounded
+
+
+def display(amount: Decimal, unit: Optional[Unit]) -> str:
+    """'1 1/2', '1/3' for fractional units, '250', '1.25' for decimal ones"""
+    if unit is None or not unit.fractions:
+        return f"{amount.normalize():f}"
+    fraction = Fraction(amount).limit_denominator(max(unit.fractions) * 3)
+    whole, remainder = divmod(fraction, 1)
+    parts = []
+    if whole:
+        parts.append(str(whole))
+    if remainder:
+        parts.append(f"{remainder.numerator}/{remainder.denominator}")
+    return " ".join(parts) or "0"
+
+
+def express(
+    base_quantity: Decimal, unit: Unit, unit_text: Optional[str] = None
+) -> Dict[str, Any]:
+    """
+    {"amount", "unit", "display"} for a quantity in ``unit``'s base unit,
+    moved along ``unit``'s ladder and rounded. Count units keep
+    ``unit_text``, their spelling as entered ("cloves").
+    """
+    target = unit
+    for name, least in _LADDER_OF.get(unit.name, ()):
+        if base_quantity / UNITS[name].factor >= least:
+            target = UNITS[name]
+    scaled = _round(base_quantity / target.factor, target)
+    if unit.dimension == COUNT and unit_text is not None:
+        name = unit_text
+    else:
+        name = target.name
+    return {
+        "amount": str(scaled.quantize(Decimal("0.01"), ROUND_HALF_UP)),
+        "unit": name,
+        "display": display(scaled, target),
+    }
+
+
+def express_unknown(amount: Decimal, unit: Optional[str]) -> Dict[str, Any]:
+    """express() for a unit the registry doesn't know: the number only"""
+    rounded = _round(amount, UNITS["each"])
+    return {
+        "amount": str(rounded.quantize(Decimal("0.01"), ROUND_HALF_UP)),
+        "unit": unit,
+        "display": display(rounded, UNITS["each"]),
+    }
+
+
+def scale_quantity(
+    amount: Decimal,
+    unit: Optional[str],
+    factor: Decimal,
+    normalized_quantity: Optional[Decimal] = None,
+) -> Dict[str, Any]:
+    """
+    One scaled amount, see express(). ``normalized_quantity`` is the stored
+    base quantity, computed from the raw values when None.
+    """
+    registered = lookup(unit)
+    if registered is None:
+        return express_unknown(Decimal(amount) * factor, unit)
+    if normalized_quantity is None:
+        normalized_quantity = normalize(amount, unit)[1]
+    return express(Decimal(normalized_quantity) * factor, registered, unit)
+
+
+def scale_ingredients(
+    recipe_ingredients: Iterable[Any], factor: Decimal
+) -> Dict[int, Dict[str, Any]]:
+    """
+    Scaled amounts for RecipeIngredient rows, keyed by row id.
+
+    Pure computation over rows already loaded, so scaling a recipe costs
+    no queries beyond the one that fetched its ingredients.
+    """
+    return {
+        row.id: scale_quantity(
+            row.amount, row.unit, factor, row.normalized_quantity
+        )
+        for row in recipe_ingredients
+    }
@@ -0,0 +1,191 @@
+"""
+Denormalized ingredient usage: Ingredient.recipe_count and last_used_at.
+
+Sorting ingredients by popularity or finding unused ones would otherwise
+take a COUNT over RecipeIngredient on every request. Instead every write
+refreshes the counters of the ingredients it touches:
+
+- RecipeIngredient rows saved or deleted (create, update, restore, recipe
+  deletes, the admin) reach recount_on_commit() through the handlers in
+  my_recipes.signals. The ingredients are collected per transaction and
+  recounted together, one grouped query and one locked batch, once it
+  commits; a rolled back write leaves nothing to count
+- bulk_create and queryset updates send no signals: bulk import calls
+  add_recipes() and ingredient merges call recount()
+
+recipe_count counts recipes, not rows, so a recipe listing an ingredient in
+two components counts once. reconcile() (the reconcile_ingredient_usage
+command) finds and repairs drift, e.g. after writes made in raw SQL.
+"""
+
+import threading
+from collections import Counter, defaultdict
+from datetime import datetime
+from logging import getLogger
+from typing import Dict, Iterable, List, NamedTuple, Optional, Tuple
+
+from django.db import transaction
+from django.db.models import Count, F, Max
+from django.utils import timezone
+
+from .models import Ingredient, RecipeIngredient
+
+logger = getLogger(__name__)
+
+# Ids per UPDATE ... WHERE id IN (...) (SQLite variable limits)
+BATCH_SIZE = 500
+
+
+def add_recipes(pairs: Iterable[Tuple[int, int]]) -> None:
+    """
+    Count newly created recipes, as (recipe id, ingredient id) pairs, in one
+    UPDATE per distinct increment rather than one per ingredient.
+    """
+    increments = Counter(ingredient_id for _, ingredient_id in set(pairs))
+    by_increment: Dict[int, List[int]] = defaultdict(list)
+    for ingredient_id, increment in increments.items():
+        by_increment[increment].append(ingredient_id)
+    now = timezone.now()
+    for increment, ingredient_ids in by_increment.items():
+        for start in range(0, len(ingredient_ids), BATCH_SIZE):
+            Ingredient.objects.filter(
+                pk__in=ingredient_ids[start : start + BATCH_SIZE]
+            ).update(
+                recipe_count=F("recipe_count") + increment, last_used_at=now
+            )
+
+
+class Drift(NamedTuple):
+    id: int
+    name: str
+    stored: int
+    actual: int
+
+
+def _actual(
+    ingredient_ids: Optional[List[int]] = None,
+) -> Dict[int, Tuple[int, datetime]]:
+    """id -> (recipes using it, latest modified_at among them): one query"""
+    rows = RecipeIngredient.objects.all()
+    if ingredient_ids is not None:
+        rows = rows.filter(ingredient_id__in=ingredient_ids)
+    return {
+        ingredient_id: (count, latest)
+        for ingredient_id, count, latest in rows.values_list("ingredient_id")
+        .annotate(
+            count=Count("recipe_id", distinct=True),
+            latest=Max("recipe__modified_at"),
+        )
+        .values_list("ingredient_id", "count", "latest")
+    }
+
+
+def _repair(
+    ingredients: List[Ingredient], actual: Dict[int, Tuple[int, datetime]]
+) -> Tuple[List[Drift], List[Ingredient]]:
+    drift, changed = [], []
+    for ingredient in ingredients:
+        count, latest = actual.get(ingredient.id, (0, None))
+        # A used ingredient without a date gets its recipes' latest write
+        undated = count and ingredient.last_used_at is None
+        if ingredient.recipe_count == count and not undated:
+            continue
+        if ingredient.recipe_count != count:
+            drift.append(
+                Drift(
+                    ingredient.id,
+                    ingredient.name,
+                    ingredient.recipe_count,
+                    count,
+                )
+            )
+        ingredient.recipe_count = count
+        if undated:
+            ingredient.last_used_at = latest
+        changed.append(ingredient)
+    return drift, changed
+
+
+def recount(ingredient_ids: Iterable[int], used: Iterable[int] = ()) -> None:
+    """
+    Recompute the counters of a few ingredients from their rows; those in
+    ``used`` that any recipe still lists are stamped as used now
+    """
+    ids = sorted(set(ingredient_ids))
+    used = set(used)
+    now = timezone.now()
+    with transaction.atomic():
+        for start in range(0, len(ids), BATCH_SIZE):
+            batch = ids[start : start + BATCH_SIZE]
+            ingredients = list(
+                Ingredient.objects.select_for_update()
+                .filter(pk__in=batch)
+                .only("id", "name", "recipe_count", "last_used_at")
+            )
+            _, changed = _repair(ingredients, _actual(batch))
+            for ingredient in ingredients:
+                if ingredient.id in used and ingredient.recipe_count:
+                    ingredient.last_used_at = now
+                    if ingredient not in changed:
+                        changed.append(ingredient)
+            Ingredient.objects.bulk_update(
+                changed, ["recipe_count", "last_used_at"]
+            )
+
+
+_local = threading.local()
+
+
+def _flush() -> None:
+    ids = getattr(_local, "pending", None)
+    used = getattr(_local, "used", None)
+    _local.pending, _local.used = set(), set()
+    if not ids:
+        return
+    try:
+        recount(ids, used)
+    except Exception as e:
+        # Committed already; reconcile_ingredient_usage repairs the drift
+        logger.error(f"Ingredient usage recount failed: {e}")
+
+
+def recount_on_commit(
+    ingredient_ids: Iterable[int], used: bool = False
+) -> None:
+    """
+    Recount ingredients once the current transaction commits, ``used`` when
+    a recipe now lists them. Ingredients touched in the same transaction are
+    recounted together by the first callback; ids left over from a rolled
+    back one are recounted with the next.
+    """
+    pending = getattr(_local, "pending", None)
+    if pending is None:
+        pending = _local.pending = set()
+        _local.used = set()
+    pending.update(ingredient_ids)
+    if used:
+        _local.used.update(ingredient_ids)
+    transaction.on_commit(_flush)
+
+
+def reconcile(apply: bool = True) -> List[Drift]:
+    """
+    Compare every ingredient's recipe_count with its rows (one grouped
+    query) and, when ``apply``, store the actual values. Returns the
+    ingredients whose count had drifted.
+    """
+    with transaction.atomic():
+        ingredients = Ingredient.objects.only(
+            "id", "name", "recipe_count", "last_used_at"
+        )
+        if apply:
+            # Locked before counting: a write still adjusting a counter
+            # commits first and is counted, a later one waits and adds on
+            ingredients = ingredients.select_for_update()
+        ingredients = list(ingredients)
+        drift, changed = _repair(ingredients, _actual())
+        if apply:
+            Ingredient.objects.bulk_update(
+                changed, ["recipe_count", "last_used_at"], batch_size=BATCH_SIZE
+            )
+    return drift
@@ -2,6 +2,8 @@
 ASGI config for recipes project.
 
 It exposes the ASGI callable as a module-level variable named ``application``.
+Served by gunicorn's uvicorn workers when DJANGO_SERVER_INTERFACE=asgi, which
+the async views and the server-sent events stream need.
 
 For more information on this file, see
 https://docs.djangoproject.com/en/5.2/howto/deployment/asgi/
@@ -0,0 +1,74 @@
+"""
+PostgreSQL backend that instruments connection acquisition.
+
+Behaves exactly like django.db.backends.postgresql, except that the time
+spent in get_new_connection() - waiting for a slot in the psycopg pool, or
+opening a brand new connection when pooling is off - is recorded in
+``connection_wait_stats`` and slow acquisitions are logged.
+
+Stats are per process; under gunicorn every worker keeps its own.
+"""
+
+import logging
+import threading
+import time
+from typing import Any, Dict
+
+from django.conf import settings
+from django.db.backends.postgresql import base
+
+logger = logging.getLogger(__name__)
+
+
+class ConnectionWaitStats:
+    """Thread-safe counters for connection acquisition time, per alias."""
+
+    def __init__(self) -> None:
+        self._lock = threading.Lock()
+        self._stats: Dict[str, Dict[str, float]] = {}
+
+    def record(self, alias: str, seconds: float, slow: bool) -> None:
+        with self._lock:
+            stats = self._stats.setdefault(
+                alias, {"count": 0, "total_ms": 0.0, "max_ms": 0.0, "slow": 0}
+            )
+            elapsed_ms = seconds * 1000
+            stats["count"] += 1
+            stats["total_ms"] += elapsed_ms
+            stats["max_ms"] = max(stats["max_ms"], elapsed_ms)
+            stats["slow"] += int(slow)
+
+    def snapshot(self) -> Dict[str, Dict[str, Any]]:
+        with self._lock:
+            return {
+                alias: {
+                    "count": int(stats["count"]),
+                    "avg_ms": round(stats["total_ms"] / stats["count"], 3),
+                    "max_ms": round(stats["max_ms"], 3),
+                    "slow": int(stats["slow"]),
+                }
+                for alias, stats in self._stats.items()
+                if stats["count"]
+            }
+
+
+connection_wait_stats = ConnectionWaitStats()
+
+
+class DatabaseWrapper(base.DatabaseWrapper):
+    def get_new_connection(self, conn_params):
+        started = time.perf_counter()
+        connection = super().get_new_connection(conn_params)
+        waited = time.perf_counter() - started
+
+        warn_ms = getattr(settings, "DB_CONNECTION_WAIT_WARN_MS", 100)
+        slow = waited * 1000 >= warn_ms
+        connection_wait_stats.record(self.alias, waited, slow)
+        if slow:
+            pool = self.pool
+            logger.warning(
+                f"Acquiring a '{self.alias}' database connection took "
+                f"{waited * 1000:.1f}ms"
+                + (f" (pool stats: {pool.get_stats()})" if pool else "")
+            )
+        return connection
@@ -0,0 +1,64 @@
+"""
+Read replica routing.
+
+Every database alias besides ``default`` is a read replica of it (see
+POSTGRES_REPLICA_HOSTS in settings). Reads go to a replica, picked once
+per request so all of a request's reads see the same replica. Writes go
+to the primary, and so does every read after a request's first write,
+so a request reads back what it wrote rather than a replica that hasn't
+caught up yet. Reads inside transaction.atomic() (restores, recipe saves)
+also use the primary, whose transaction they belong to.
+
+The choice lives in a context variable: per thread under WSGI, per task
+under ASGI. ReplicaRoutingMiddleware starts every request unpinned;
+background threads that must see fresh writes call pin_primary().
+"""
+
+import random
+from contextvars import ContextVar
+from typing import Optional
+
+from django.conf import settings
+from django.db import connections
+
+PRIMARY = "default"
+
+_route: ContextVar[Optional[str]] = ContextVar("db_route", default=None)
+
+
+def start_request() -> None:
+    """Forget the previous request's replica or primary pin"""
+    _route.set(None)
+
+
+def pin_primary() -> None:
+    """Send this context's remaining reads to the primary"""
+    _route.set(PRIMARY)
+
+
+class ReplicaRouter:
+    def __init__(self) -> None:
+        self.replicas = [
+            alias for alias in settings.DATABASES if alias != PRIMARY
+        ]
+
+    def db_for_read(self, model, **hints) -> str:
+        if not self.replicas or connections[PRIMARY].in_atomic_block:
+            return PRIMARY
+        alias = _route.get()
+        if alias is None:
+            alias = random.choice(self.replicas)
+            _route.set(alias)
+        return alias
+
+    def db_for_write(self, model, **hints) -> str:
+        pin_primary()
+        return PRIMARY
+
+    def allow_relation(self, obj1, obj2, **hints) -> bool:
+        # Replicas hold the same rows as the primary
+        return True
+
+    def allow_migrate(self, db, app_label, model_name=None, **hints) -> bool:
+        # Replicas get schema changes through replication
+        return db == PRIMARY
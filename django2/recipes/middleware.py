@@ -0,0 +1,77 @@
+"""
+Response compression and read replica routing.
+
+gzip via Django's GZipMiddleware, plus Brotli for clients that accept it,
+only for responses of at least RESPONSE_COMPRESSION_MIN_SIZE bytes:
+below that the CPU spent costs more than the bytes saved.
+"""
+
+import brotli
+from django.conf import settings
+from django.middleware.gzip import GZipMiddleware
+from django.utils.cache import patch_vary_headers
+from django.utils.deprecation import MiddlewareMixin
+from django.utils.regex_helper import _lazy_re_compile
+
+from recipes.db import router
+
+SAFE_METHODS = ("GET", "HEAD", "OPTIONS")
+
+re_accepts_brotli = _lazy_re_compile(r"\bbr\b")
+
+
+class CompressionMiddleware(GZipMiddleware):
+    """
+    Brotli-or-gzip compression above a size threshold.
+
+    Brotli is used for complete responses when the client sends
+    `Accept-Encoding: br`; streaming responses and gzip-only clients fall
+    back to GZipMiddleware (which compresses streams chunk by chunk).
+    """
+
+    def process_response(self, request, response):
+        # gzip would hold events back until its buffer fills
+        if response.get("Content-Type", "").startswith("text/event-stream"):
+            return response
+        if not response.streaming and (
+            len(response.content) < settings.RESPONSE_COMPRESSION_MIN_SIZE
+        ):
+            return response
+        if response.has_header("Content-Encoding"):
+            return response
+
+        accept_encoding = request.META.get("HTTP_ACCEPT_ENCODING", "")
+        if response.streaming or not re_accepts_brotli.search(accept_encoding):
+            return super().process_response(request, response)
+
+        patch_vary_headers(response, ("Accept-Encoding",))
+        compressed = brotli.compress(
+            response.content,
+            quality=settings.RESPONSE_BROTLI_QUALITY,
+        )
+        if len(compressed) >= len(response.content):
+            return response
+        response.content = compressed
+        response.headers["Content-Length"] = str(len(compressed))
+        # A strong ETag no longer matches the encoded bytes (RFC 9110 8.8.1)
+        etag = response.get("ETag")
+        if etag and etag.startswith('"'):
+            response.headers["ETag"] = "W/" + etag
+        response.headers["Content-Encoding"] = "br"
+        return response
+
+
+class ReplicaRoutingMiddleware(MiddlewareMixin):
+    """
+    Reset recipes.db.router's choice at the start of every request.
+
+    Reads of safe requests go to a replica until the request writes.
+    Other methods read from the primary throughout, so an update or
+    delete never starts from a replica's stale copy of the row.
+    """
+
+    def process_request(self, request):
+        if request.method in SAFE_METHODS:
+            router.start_request()
+        else:
+            router.pin_primary()
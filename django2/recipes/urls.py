@@ -16,10 +16,18 @@ Including another URLconf
 """
 
 from django.contrib import admin
+from django.contrib.staticfiles.urls import staticfiles_urlpatterns
 from django.urls import include, path
 
+from . import health
+
 urlpatterns = [
+    path("healthz/", health.readiness, name="healthz"),
     path("admin/", admin.site.urls),
     path("api/", include("api.urls")),
     path("", include("my_recipes.urls")),
 ]
+
+# runserver serves static files itself; gunicorn needs the explicit patterns
+# (only active while DEBUG is on, same as runserver).
+urlpatterns += staticfiles_urlpatterns()
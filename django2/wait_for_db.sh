@@ -1,56 +1,30 @@
 #!/bin/sh
 set -e
 
-echo "Waiting for database to become available..."
-
-python - <<'PY'
-import os
-import sys
-import time
-import socket
-
-# Get PostgreSQL connection parameters from environment variables
-host = os.getenv('POSTGRES_HOST', 'postgres')  # Default to 'postgres' for Docker
-port = int(os.getenv('POSTGRES_PORT', 5432))
-user = os.getenv('POSTGRES_USER', 'admin_user')
-db = os.getenv('POSTGRES_DB', 'recipes')
-
-print(f'Attempting to connect to {user}@{host}:{port}/{db}')
-
-for i in range(60):
-    try:
-        s = socket.create_connection((host, port), timeout=3)
-        s.close()
-        print(f'Database reachable at {host}:{port}')
-        sys.exit(0)
-    except Exception as e:
-        print(f'Waiting for DB... attempt {i+1}/60')
-        time.sleep(1)
-
-print('Timed out waiting for DB after 60s')
-sys.exit(1)
-PY
-
-echo "Database is available. Running migrations..."
-python manage.py migrate --noinput
-
-echo "Creating superuser if it doesn't exist..."
-python manage.py shell <<'PYEOF'
-from django.contrib.auth import get_user_model
-import os
-
-User = get_user_model()
-username = os.getenv('DJ_SUPERUSER', 'admin')
-password = os.getenv('DJ_PASSWORD', 'admin')
-
-if not User.objects.filter(username=username).exists():
-    User.objects.create_superuser(username, 'admin@example.com', password)
-    print(f"Superuser '{username}' created successfully")
-else:
-    print(f"Superuser '{username}' already exists")
-PYEOF
+# One Django process waits for Postgres, applies migrations only when some
+# are pending and ensures the superuser exists, reporting per-phase timings.
+echo "Bootstrapping database..."
+python manage.py bootstrap --timeout 60
 
 echo "Startup complete. Starting application..."
 
-# Exec the CMD from Dockerfile (so runserver will start)
-exec "$@"
+# An explicit command (docker run ... <cmd>) always wins
+if [ "$#" -gt 0 ]; then
+    exec "$@"
+fi
+
+# Otherwise start the server for the selected serving profile
+case "${DJANGO_SERVER_MODE:-prod}" in
+    dev)
+        echo "Starting development server (runserver)"
+        exec python manage.py runserver 0.0.0.0:8000
+        ;;
+    prod)
+        echo "Starting production server (gunicorn, ${DJANGO_SERVER_INTERFACE:-wsgi})"
+        exec gunicorn --config gunicorn.conf.py
+        ;;
+    *)
+        echo "Unknown DJANGO_SERVER_MODE '${DJANGO_SERVER_MODE}' (expected dev or prod)"
+        exit 1
+        ;;
+esac
@@ -3,7 +3,7 @@
  * @module recipeUtils
  */
 
-import type { PaginatedIngredientResponse, Ingredient, PaginatedRecipeResponse, Recipe, ActionResponse, RecipeCreatePayload } from "~/types/recipe.types";
+import type { PaginatedIngredientResponse, Ingredient, IngredientFacet, PaginatedRecipeResponse, Recipe, RecipeBatchResponse, RecipeChangesResponse, ShoppingListResponse, SimilarRecipe, DuplicateRecipe, ActionResponse, RecipeCreatePayload } from "~/types/recipe.types";
 
 export const recipeUtils = () => {
     const { makeAuthRequest } = useAuth();
@@ -30,6 +30,62 @@ export const recipeUtils = () => {
         return response
     }
 
+    /**
+     * Fetches several recipes in one request
+     * @param ids - Recipe ids, up to the server's batch limit (500 by default)
+     * @returns Recipes in the requested order, plus the ids that were not found
+     */
+    const getRecipesByIds = async (ids: number[]): Promise<RecipeBatchResponse> => {
+        const url = '/recipes/batch/'
+        return await makeAuthRequest<RecipeBatchResponse>(url, "POST", { ids })
+    }
+
+    /**
+     * Fetches the recipes most like a given recipe by ingredients
+     * @param id - Recipe id
+     * @returns Similar recipes, best first
+     */
+    const getSimilarRecipes = async (id: number): Promise<SimilarRecipe[]> => {
+        const url = `/recipes/${id}/similar/`
+        const { results } = await makeAuthRequest<{ results: SimilarRecipe[] }>(url, "GET")
+        return results
+    }
+
+    /**
+     * Fetches the recipes flagged as near-duplicates of a given recipe
+     * @param id - Recipe id
+     * @returns Likely duplicates, best first
+     */
+    const getRecipeDuplicates = async (id: number): Promise<DuplicateRecipe[]> => {
+        const url = `/recipes/${id}/duplicates/`
+        const { results } = await makeAuthRequest<{ results: DuplicateRecipe[] }>(url, "GET")
+        return results
+    }
+
+    /**
+     * Builds one shopping list for several recipes
+     * @param recipes - Recipe ids, each with an optional scale factor (default 1)
+     * @returns Ingredient totals, one line per ingredient and unit, plus the ids that were not found
+     */
+    const getShoppingList = async (recipes: { id: number; factor?: number }[]): Promise<ShoppingListResponse> => {
+        const url = '/recipes/shopping_list/'
+        return await makeAuthRequest<ShoppingListResponse>(url, "POST", { recipes })
+    }
+
+    /**
+     * Fetches recipes created, updated or deleted since the last sync
+     * @param since - sync_token from the previous sync; omit for a full sync
+     * @returns Changes in order, the token for the next sync and whether more are waiting
+     */
+    const syncRecipes = async (since?: string): Promise<RecipeChangesResponse> => {
+        const params = new URLSearchParams()
+        if (since) {
+            params.append('since', since)
+        }
+        const url = `/recipes/changes/?${params.toString()}`
+        return await makeAuthRequest<RecipeChangesResponse>(url, "GET")
+    }
+
     const searchRecipes = async (ingredients: number[]): Promise<Recipe[]> => {
         console.log("Ingredients: ", ingredients);
 
@@ -42,6 +98,22 @@ export const recipeUtils = () => {
         return results
     }
 
+    /**
+     * Counts, per ingredient, the recipes containing all the given ingredients
+     * that also use it
+     * @param ingredients - Selected ingredient ids
+     * @returns Ingredients used by at least one matching recipe, most used first
+     */
+    const getIngredientFacets = async (ingredients: number[]): Promise<IngredientFacet[]> => {
+        const params = new URLSearchParams({ facets: 'ingredients', page_size: '1', fields: 'id' })
+        ingredients.forEach(id => {
+            params.append('ingredients', id.toString())
+        })
+        const url = `/recipes/?${params.toString()}`
+        const { facets } = await makeAuthRequest<PaginatedRecipeResponse>(url, "GET")
+        return facets?.ingredients ?? []
+    }
+
     const getIngredients = async (): Promise<Ingredient[]> => {
         const url = '/ingredients/'
         const { results } = await makeAuthRequest<PaginatedIngredientResponse>(url, "GET")
@@ -138,7 +210,13 @@ export const recipeUtils = () => {
     return {
         getRecipes,
         getRecipe,
+        getRecipesByIds,
+        syncRecipes,
+        getShoppingList,
+        getSimilarRecipes,
+        getRecipeDuplicates,
         searchRecipes,
+        getIngredientFacets,
         getIngredients,
         triggerBackup,
         triggerRestore,
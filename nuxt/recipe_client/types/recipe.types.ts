@@ -46,6 +46,104 @@ export interface PaginatedRecipeResponse {
     previous: string | null;
     /** Array of recipe objects for the current page */
     results: Recipe[];
+    /** Only with `?facets=ingredients` */
+    facets?: { ingredients: IngredientFacet[] };
+}
+
+/**
+ * How many recipes of a filtered list use an ingredient
+ * @interface IngredientFacet
+ */
+export interface IngredientFacet {
+    /** Ingredient id */
+    id: number;
+    name: string;
+    /** Matching recipes (all pages) that use it */
+    count: number;
+}
+
+/**
+ * Response of the batch retrieve endpoint
+ * @interface RecipeBatchResponse
+ */
+export interface RecipeBatchResponse {
+    /** Recipes in the order their ids were requested */
+    results: Recipe[];
+    /** Requested ids with no matching recipe */
+    missing: number[];
+}
+
+/**
+ * A recipe with similar ingredients
+ * @interface SimilarRecipe
+ */
+export interface SimilarRecipe {
+    id: number;
+    name: string;
+    /** Cosine similarity of the ingredient profiles, 0-1 */
+    score: number;
+}
+
+/**
+ * A recipe flagged as a near-duplicate of another
+ * @interface DuplicateRecipe
+ */
+export interface DuplicateRecipe {
+    id: number;
+    name: string;
+    /** Estimated share of step phrases and ingredients in common, 0-1 */
+    score: number;
+}
+
+/**
+ * One line of a shopping list: an ingredient's total in one unit
+ * @interface ShoppingListItem
+ */
+export interface ShoppingListItem {
+    /** Ingredient id */
+    ingredient: number;
+    name: string;
+    /** Total as a decimal string, e.g. "1.50" */
+    amount: string;
+    unit: string | null;
+    /** Total for people, e.g. "1 1/2" */
+    display: string;
+    /** Recipes that need this ingredient */
+    recipes: number[];
+}
+
+/**
+ * Response of the shopping list endpoint
+ * @interface ShoppingListResponse
+ */
+export interface ShoppingListResponse {
+    items: ShoppingListItem[];
+    /** Requested ids with no matching recipe */
+    missing: number[];
+}
+
+/**
+ * One entry of the delta sync feed: the current recipe, or a tombstone
+ * @interface RecipeChange
+ */
+export interface RecipeChange {
+    id: number;
+    action: "upsert" | "delete";
+    changed_at: string;
+    /** Present for upserts */
+    recipe?: Recipe;
+}
+
+/**
+ * Response of the delta sync endpoint
+ * @interface RecipeChangesResponse
+ */
+export interface RecipeChangesResponse {
+    changes: RecipeChange[];
+    /** Pass as `since` on the next sync */
+    sync_token: string;
+    /** More changes are waiting; sync again straight away */
+    has_more: boolean;
 }
 
 export interface Ingredient {
@@ -53,6 +151,10 @@ export interface Ingredient {
     id: number;
     // The name of the igredient
     name: string;
+    // Number of recipes using it (read-only, maintained by the server)
+    recipe_count?: number;
+    // When a recipe last added it, ISO 8601; null if none ever has
+    last_used_at?: string | null;
 }
 
 export interface RecipeIngredient {